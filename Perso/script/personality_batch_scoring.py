@@ -0,0 +1,166 @@
+"""
+Scoring in blocco di file CSV con il modello di previsione della personalità.
+Il CSV viene letto a blocchi, preprocessato in forma vettoriale e le previsioni
+vengono aggiunte al file di output man mano, con memoria limitata.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from personality_features import COLONNE_FEATURE, COLONNE_SI_NO, MAPPA_SI_NO
+
+
+def preprocessa_blocco(df):
+    """
+    Converte un blocco del CSV nella matrice float32 attesa dal modello.
+    Le risposte Sì/No mancanti o non riconosciute restano NaN, così la riga risulta
+    incompleta invece di essere valutata come un 'no'.
+
+    Returns:
+        tuple: (matrice delle feature, maschera delle righe complete)
+    """
+    X = np.empty((len(df), len(COLONNE_FEATURE)), dtype=np.float32)
+    for j, colonna in enumerate(COLONNE_FEATURE):
+        if colonna in COLONNE_SI_NO:
+            valori = df[colonna].astype(str).str.strip().str.lower().map(MAPPA_SI_NO)
+            X[:, j] = valori.to_numpy(dtype=np.float32, na_value=np.nan)
+        else:
+            X[:, j] = pd.to_numeric(df[colonna], errors='coerce').to_numpy(dtype=np.float32)
+    return X, ~np.isnan(X).any(axis=1)
+
+
+def carica_predittore(percorso_modello):
+    """
+    Carica un modello joblib (.pkl), ONNX (.onnx) o la cartella di una foresta NumPy
+    (personality_numpy_forest.py) e restituisce le classi e una funzione che, data la
+    matrice delle feature, restituisce etichette e probabilità.
+    """
+    if os.path.isdir(percorso_modello):
+        from personality_numpy_forest import ForestaNumPy
+
+        foresta = ForestaNumPy(percorso_modello)
+        return list(foresta.classi), foresta.predici
+
+    if percorso_modello.endswith(".onnx"):
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(percorso_modello)
+        nome_input = session.get_inputs()[0].name
+        nomi_output = [output.name for output in session.get_outputs()]
+
+        # Le etichette delle classi sono esportate come terzo output (output_class_labels)
+        if 'class_labels' in nomi_output:
+            classi = session.run(['class_labels'], {nome_input: np.zeros((1, len(COLONNE_FEATURE)), dtype=np.float32)})[0]
+        else:
+            classi = None
+
+        def predici(X):
+            etichette, probabilita = session.run(nomi_output[:2], {nome_input: X})
+            return np.asarray(etichette), np.asarray(probabilita)
+
+        return (list(classi) if classi is not None else None), predici
+
+    import joblib
+
+    modello = joblib.load(percorso_modello)
+
+    def predici(X):
+        # Il modello è stato addestrato su un DataFrame: si passano gli stessi nomi di colonna
+        df = pd.DataFrame(X, columns=COLONNE_FEATURE)
+        return modello.predict(df), modello.predict_proba(df)
+
+    return list(modello.classes_), predici
+
+
+def scora_csv(percorso_input, percorso_output, percorso_modello, righe_per_blocco=100_000, colonne_extra=None):
+    """
+    Applica il modello a tutte le righe del CSV e scrive le previsioni nel file di output.
+
+    Returns:
+        dict: righe lette, righe previste, righe incomplete e righe al secondo
+    """
+    classi, predici = carica_predittore(percorso_modello)
+    colonne_extra = colonne_extra or []
+
+    righe_totali = 0
+    righe_previste = 0
+    inizio = time.perf_counter()
+
+    lettore = pd.read_csv(percorso_input, usecols=COLONNE_FEATURE + colonne_extra,
+                          chunksize=righe_per_blocco, dtype={c: str for c in COLONNE_SI_NO})
+    for numero_blocco, blocco in enumerate(lettore):
+        X, complete = preprocessa_blocco(blocco)
+
+        uscita = blocco[colonne_extra].copy() if colonne_extra else pd.DataFrame(index=blocco.index)
+        previsioni = np.full(len(blocco), None, dtype=object)
+        probabilita = None
+        if complete.any():
+            etichette, prob_complete = predici(X[complete])
+            previsioni[complete] = etichette
+            if classi is None:
+                classi = [str(i) for i in range(prob_complete.shape[1])]
+            probabilita = np.full((len(blocco), prob_complete.shape[1]), np.nan, dtype=np.float32)
+            probabilita[complete] = prob_complete
+
+        uscita['Previsione'] = previsioni
+        for j, classe in enumerate(classi or []):
+            uscita[f'Probabilita_{classe}'] = probabilita[:, j] if probabilita is not None else np.nan
+
+        uscita.to_csv(percorso_output, mode='w' if numero_blocco == 0 else 'a',
+                      header=numero_blocco == 0, index=False, float_format='%.6f')
+
+        righe_totali += len(blocco)
+        righe_previste += int(complete.sum())
+        trascorso = time.perf_counter() - inizio
+        print(f"  Blocco {numero_blocco + 1}: {righe_totali:,} righe ({righe_totali / trascorso:,.0f} righe/s)")
+
+    durata = time.perf_counter() - inizio
+    return {
+        'righe': righe_totali,
+        'righe_previste': righe_previste,
+        'righe_incomplete': righe_totali - righe_previste,
+        'secondi': durata,
+        'righe_al_secondo': righe_totali / durata if durata else 0.0
+    }
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Applica il modello di personalità a tutte le righe di un file CSV.")
+    parser.add_argument("input", help="File CSV con le risposte al questionario.")
+    parser.add_argument("output", help="File CSV in cui scrivere previsioni e probabilità.")
+    parser.add_argument("--modello", "-m", default="modello_personalita.onnx",
+                        help="Modello ONNX (.onnx), joblib (.pkl) o cartella della foresta NumPy. "
+                             "Predefinito: modello_personalita.onnx.")
+    parser.add_argument("--righe-per-blocco", "-b", type=int, default=100_000,
+                        help="Righe lette ed elaborate per volta. Predefinito: 100000.")
+    parser.add_argument("--mantieni", nargs="+", default=[],
+                        help="Colonne del CSV di input da copiare nell'output (ad esempio un identificativo).")
+    args = parser.parse_args()
+
+    for percorso in (args.input, args.modello):
+        if not os.path.exists(percorso):
+            print(f"[ERRORE] Il file '{percorso}' non esiste.")
+            return 1
+
+    print(f"📦 Modello: {args.modello}")
+    print(f"📄 Scoring di: {args.input}")
+    try:
+        esito = scora_csv(args.input, args.output, args.modello, args.righe_per_blocco, args.mantieni)
+    except (ValueError, pd.errors.ParserError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+
+    print(f"\n✅ Previsioni salvate in: {args.output}")
+    print(f"Righe elaborate: {esito['righe']:,} (incomplete, senza previsione: {esito['righe_incomplete']:,})")
+    print(f"Tempo: {esito['secondi']:.2f} s → {esito['righe_al_secondo']:,.0f} righe/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
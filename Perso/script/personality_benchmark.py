@@ -0,0 +1,309 @@
+"""
+Benchmark di inferenza del modello di personalità: lo stesso stimatore scikit-learn chiamato
+con un DataFrame e, caricato con joblib, con un array NumPy, e ONNX Runtime (modello semplice
+e grafo completo), al variare della dimensione del batch, del numero di thread e del livello
+di ottimizzazione del grafo. Per impostazione predefinita misura il modello salvato in
+--cartella; con --modelli addestra ed esporta ogni tipo di modello (RF, LR, SVM) sullo split
+di addestramento ricostruito e li misura tutti.
+Prima delle misure verifica la parità di previsioni e probabilità su tutto il test set.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import platform
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from personality_batch_scoring import COLONNE_FEATURE, preprocessa_blocco
+
+DIMENSIONI_BATCH = [1, 10, 100, 1000, 10000, 100000]
+LIVELLI_OTTIMIZZAZIONE = ["disabilitata", "base", "estesa", "tutte"]
+
+
+def carica_test_set(percorso_csv, test_size=0.2, random_state=42):
+    """
+    Ricostruisce il test set dell'addestramento (stesso split stratificato di addestra_modelli)
+    e lo preprocessa scartando le righe incomplete.
+
+    Returns:
+        tuple: (matrice float32, etichette, DataFrame grezzo)
+    """
+    df = pd.read_csv(percorso_csv)
+    _, df_test = train_test_split(df, test_size=test_size, random_state=random_state, stratify=df['Personality'])
+    df_test = df_test.reset_index(drop=True)
+    X_test, complete = preprocessa_blocco(df_test)
+    df_test = df_test[complete].reset_index(drop=True)
+    return X_test[complete], df_test['Personality'].to_numpy(), df_test
+
+
+def livello_ort(nome):
+    """Converte il nome del livello di ottimizzazione nel valore di ONNX Runtime"""
+    import onnxruntime as ort
+
+    return {
+        "disabilitata": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "base": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "estesa": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "tutte": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }[nome]
+
+
+def crea_sessione(percorso, thread=0, ottimizzazione="tutte"):
+    """Crea una sessione ONNX Runtime con le opzioni indicate (thread 0 = scelta automatica)"""
+    import onnxruntime as ort
+
+    opzioni = ort.SessionOptions()
+    opzioni.intra_op_num_threads = thread
+    opzioni.inter_op_num_threads = 1
+    opzioni.graph_optimization_level = livello_ort(ottimizzazione)
+    return ort.InferenceSession(percorso, opzioni, providers=["CPUExecutionProvider"])
+
+
+def misura(funzione, dati, tempo_minimo=0.5, ripetizioni_massime=2000):
+    """
+    Esegue la funzione sui dati finché non sono passati almeno tempo_minimo secondi
+    (e almeno tre ripetizioni) e restituisce le durate delle singole chiamate.
+    """
+    funzione(dati)
+    durate = []
+    totale = 0.0
+    while (totale < tempo_minimo or len(durate) < 3) and len(durate) < ripetizioni_massime:
+        inizio = time.perf_counter()
+        funzione(dati)
+        durata = time.perf_counter() - inizio
+        durate.append(durata)
+        totale += durata
+    return np.array(durate)
+
+
+def prepara_modelli(percorso_csv, sigle, test_size, random_state, cartella):
+    """
+    Addestra ogni tipo di modello richiesto sullo stesso split di addestra_modelli, lo salva
+    con joblib ed esporta il modello ONNX semplice in cartella/<sigla>.
+
+    Returns:
+        list: tuple (sigla, cartella del modello, modello addestrato)
+    """
+    import joblib
+    from personality_predictor import (FILE_MODELLO, FILE_ONNX, MODELLI_DISPONIBILI,
+                                       esporta_modello_onnx, preprocessa_dati)
+
+    X, y = preprocessa_dati(pd.read_csv(percorso_csv))
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+    modelli = []
+    for sigla in sigle:
+        nome, costruttore = MODELLI_DISPONIBILI[sigla]
+        print(f"\n🏋️  Addestramento {nome} sullo split ricostruito...")
+        modello = costruttore(random_state).fit(X_train, y_train)
+        cartella_modello = os.path.join(cartella, sigla)
+        os.makedirs(cartella_modello, exist_ok=True)
+        joblib.dump(modello, os.path.join(cartella_modello, FILE_MODELLO))
+        esportato, _ = esporta_modello_onnx(modello, X, os.path.join(cartella_modello, FILE_ONNX))
+        if not esportato:
+            raise RuntimeError(f"Esportazione ONNX di {nome} non riuscita")
+        modelli.append((sigla, cartella_modello, modello))
+    return modelli
+
+
+def percorsi_inferenza(cartella, modello_sklearn, thread_list, livelli):
+    """
+    Prepara le funzioni da misurare. Ognuna riceve (X float32, df grezzo) e calcola
+    classe e probabilità come farebbe un client reale di quel percorso. I percorsi
+    sklearn_df e sklearn_numpy usano lo stesso stimatore (in memoria e ricaricato con
+    joblib): differiscono solo per l'input, DataFrame con i nomi delle colonne o array.
+
+    Returns:
+        list: tuple (nome, parametri, funzione, secondi di caricamento)
+    """
+    percorsi = []
+
+    def sklearn_dataframe(dati):
+        df = pd.DataFrame(dati[0], columns=COLONNE_FEATURE)
+        return modello_sklearn.predict(df), modello_sklearn.predict_proba(df)
+    percorsi.append(("sklearn_df", {}, sklearn_dataframe, 0.0))
+
+    import joblib
+    percorso_pkl = os.path.join(cartella, "modello_personalita.pkl")
+    inizio = time.perf_counter()
+    modello_joblib = joblib.load(percorso_pkl)
+    caricamento = time.perf_counter() - inizio
+
+    def joblib_numpy(dati):
+        # Array NumPy senza nomi di colonna: si evita il costo del DataFrame
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            return modello_joblib.predict(dati[0]), modello_joblib.predict_proba(dati[0])
+    percorsi.append(("sklearn_numpy", {}, joblib_numpy, caricamento))
+
+    for nome_file, nome, completo in (("modello_personalita.onnx", "onnx", False),
+                                      ("modello_personalita_completo.onnx", "onnx_completo", True)):
+        percorso = os.path.join(cartella, nome_file)
+        if not os.path.exists(percorso):
+            if not completo:
+                print(f"⚠️  {percorso} non trovato: percorso {nome} saltato")
+            continue
+        for thread in thread_list:
+            for livello in livelli:
+                inizio = time.perf_counter()
+                session = crea_sessione(percorso, thread, livello)
+                caricamento = time.perf_counter() - inizio
+                if completo:
+                    from personality_pipeline import input_onnx
+                    funzione = (lambda s: lambda dati: s.run(['label', 'probabilities'], input_onnx(dati[1])))(session)
+                else:
+                    nome_input = session.get_inputs()[0].name
+                    funzione = (lambda s, n: lambda dati: s.run(['label', 'probabilities'], {n: dati[0]}))(session, nome_input)
+                percorsi.append((nome, {'thread': thread, 'ottimizzazione': livello}, funzione, caricamento))
+
+    return percorsi
+
+
+def verifica_parita(percorsi, X_test, df_test, tolleranza=1e-4):
+    """Confronta classe e probabilità di ogni percorso con scikit-learn su tutto il test set"""
+    riferimento_classi, riferimento_prob = percorsi[0][2]((X_test, df_test))
+    riferimento_classi = np.asarray(riferimento_classi).astype(str)
+    ordinate = np.sort(riferimento_prob, axis=1)
+    pareggio = (ordinate[:, -1] - ordinate[:, -2]) <= 2 * tolleranza
+
+    esiti = []
+    visti = set()
+    for nome, parametri, funzione, _ in percorsi[1:]:
+        # Le opzioni di sessione non cambiano i risultati: basta un controllo per percorso e livello
+        chiave = (nome, parametri.get('ottimizzazione'))
+        if chiave in visti:
+            continue
+        visti.add(chiave)
+
+        classi, probabilita = funzione((X_test, df_test))
+        diverse = np.asarray(classi).astype(str) != riferimento_classi
+        esiti.append({
+            'percorso': nome,
+            'ottimizzazione': parametri.get('ottimizzazione', ''),
+            'righe': len(X_test),
+            'classi_diverse': int(np.sum(diverse & ~pareggio)),
+            'pareggi_risolti_diversamente': int(np.sum(diverse & pareggio)),
+            'differenza_probabilita_max': float(np.max(np.abs(np.asarray(probabilita) - riferimento_prob))),
+        })
+        esiti[-1]['ok'] = esiti[-1]['classi_diverse'] == 0 and esiti[-1]['differenza_probabilita_max'] <= tolleranza
+    return esiti
+
+
+def esegui_benchmark(percorsi, X_pool, df_pool, dimensioni_batch, tempo_minimo, seme=0, modello=""):
+    """Misura latenza e throughput di ogni percorso per ogni dimensione di batch"""
+    rng = np.random.default_rng(seme)
+    risultati = []
+    for dimensione in dimensioni_batch:
+        indici = rng.integers(0, len(X_pool), dimensione)
+        dati = (np.ascontiguousarray(X_pool[indici]), df_pool.iloc[indici].reset_index(drop=True))
+        for nome, parametri, funzione, caricamento in percorsi:
+            durate = misura(funzione, dati, tempo_minimo)
+            voce = {
+                'modello': modello,
+                'percorso': nome,
+                'thread': parametri.get('thread', ''),
+                'ottimizzazione': parametri.get('ottimizzazione', ''),
+                'batch': dimensione,
+                'ripetizioni': len(durate),
+                'latenza_ms_mediana': round(float(np.median(durate)) * 1000, 4),
+                'latenza_ms_p95': round(float(np.percentile(durate, 95)) * 1000, 4),
+                'righe_al_secondo': round(dimensione / float(np.median(durate)), 1),
+                'caricamento_ms': round(caricamento * 1000, 2),
+            }
+            risultati.append(voce)
+            opzioni = f"thread={voce['thread']} ott={voce['ottimizzazione']}" if parametri else ""
+            print(f"  {modello:<6} batch {dimensione:>6}  {nome:<14} {opzioni:<26} "
+                  f"{voce['latenza_ms_mediana']:>10.3f} ms  {voce['righe_al_secondo']:>14,.0f} righe/s")
+    return risultati
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Benchmark di inferenza sklearn / ONNX Runtime.")
+    parser.add_argument("csv", help="Dataset usato per l'addestramento (serve a ricostruire il test set).")
+    parser.add_argument("--cartella", "-c", default=".",
+                        help="Cartella con modello_personalita.pkl e i modelli ONNX. Predefinito: cartella corrente.")
+    parser.add_argument("--modelli", nargs="+", choices=["rf", "lr", "svm"],
+                        help="Addestra ed esporta questi tipi di modello sullo split ricostruito e li misura tutti, "
+                             "invece del solo modello salvato in --cartella. I file vanno in --cartella/benchmark_modelli.")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Frazione di test usata in addestramento. Predefinito: 0.2.")
+    parser.add_argument("--seed", type=int, default=42, help="Seme usato in addestramento. Predefinito: 42.")
+    parser.add_argument("--batch", nargs="+", type=int, default=DIMENSIONI_BATCH,
+                        help="Dimensioni dei batch. Predefinito: 1 10 100 1000 10000 100000.")
+    parser.add_argument("--thread", nargs="+", type=int, default=[1, 0],
+                        help="Thread intra-op di ONNX Runtime (0 = automatico). Predefinito: 1 0.")
+    parser.add_argument("--ottimizzazione", nargs="+", choices=LIVELLI_OTTIMIZZAZIONE, default=["disabilitata", "tutte"],
+                        help="Livelli di ottimizzazione del grafo. Predefinito: disabilitata tutte.")
+    parser.add_argument("--tempo-minimo", type=float, default=0.5,
+                        help="Secondi minimi di misura per ogni combinazione. Predefinito: 0.5.")
+    parser.add_argument("--output", "-o", default="benchmark_inferenza",
+                        help="Prefisso dei report .csv e .json. Predefinito: benchmark_inferenza.")
+    args = parser.parse_args()
+
+    import joblib
+
+    print("⏱️  BENCHMARK INFERENZA MODELLO PERSONALITÀ")
+    print("=" * 60)
+    manifest = {}
+    percorso_manifest = os.path.join(args.cartella, "manifest_addestramento.json")
+    if os.path.exists(percorso_manifest):
+        with open(percorso_manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        args.test_size = manifest['configurazione']['test_size']
+        args.seed = manifest['configurazione']['random_state']
+        print(f"📋 Split di test dal manifest: test_size={args.test_size}, seed={args.seed}")
+
+    X_test, _, df_test = carica_test_set(args.csv, args.test_size, args.seed)
+    print(f"Test set: {len(X_test)} righe")
+
+    if args.modelli:
+        modelli = prepara_modelli(args.csv, args.modelli, args.test_size, args.seed,
+                                  os.path.join(args.cartella, "benchmark_modelli"))
+    else:
+        modelli = [("salvato", args.cartella, joblib.load(os.path.join(args.cartella, "modello_personalita.pkl")))]
+
+    parita, risultati = [], []
+    for sigla, cartella_modello, modello_sklearn in modelli:
+        print(f"\n📦 Modello {sigla}: {type(modello_sklearn).__name__}")
+        percorsi = percorsi_inferenza(cartella_modello, modello_sklearn, args.thread, args.ottimizzazione)
+
+        print("🔍 Parità con scikit-learn su tutto il test set:")
+        for esito in verifica_parita(percorsi, X_test, df_test):
+            simbolo = "✅" if esito['ok'] else "❌"
+            print(f"  {simbolo} {esito['percorso']:<14} {esito['ottimizzazione']:<12} classi diverse: {esito['classi_diverse']}, "
+                  f"differenza probabilità max: {esito['differenza_probabilita_max']:.2e}")
+            parita.append({'modello': sigla, **esito})
+
+        print("🚀 Misure:")
+        risultati.extend(esegui_benchmark(percorsi, X_test, df_test, args.batch, args.tempo_minimo, modello=sigla))
+
+    report = {
+        'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'sistema': platform.platform(),
+        'cpu': os.cpu_count(),
+        'modelli': {sigla: type(modello).__name__ for sigla, _, modello in modelli},
+        'manifest': manifest.get('hash_dataset'),
+        'parita': parita,
+        'risultati': risultati,
+    }
+    with open(f"{args.output}.json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    with open(f"{args.output}.csv", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(risultati[0]))
+        writer.writeheader()
+        writer.writerows(risultati)
+    print(f"\n💾 Report salvati in: {args.output}.csv e {args.output}.json")
+
+    return 0 if all(esito['ok'] for esito in parita) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
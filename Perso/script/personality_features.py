@@ -0,0 +1,18 @@
+"""
+Colonne del questionario e codifica delle risposte Sì/No, condivise dagli script di
+inferenza. Il modulo non importa nulla, così anche i predittori leggeri possono usarlo.
+"""
+
+# Colonne usate dal modello, nell'ordine del dataset di addestramento
+COLONNE_FEATURE = [
+    'Time_spent_Alone', 'Stage_fear', 'Social_event_attendance', 'Going_outside',
+    'Drained_after_socializing', 'Friends_circle_size', 'Post_frequency'
+]
+COLONNE_SI_NO = ['Stage_fear', 'Drained_after_socializing']
+
+# Stessa mappatura di preprocessa_dati in personality_predictor.py
+MAPPA_SI_NO = {
+    'yes': 1, 'no': 0, 'sì': 1, 'si': 1,
+    'true': 1, 'false': 0, '1': 1, '0': 0,
+    '1.0': 1, '0.0': 0
+}
@@ -0,0 +1,312 @@
+"""
+Addestramento fuori memoria del modello di personalità, per CSV più grandi della RAM.
+
+Il CSV viene letto a blocchi e non viene mai caricato per intero:
+- lo split di test è deciso da un hash del numero di riga, quindi è riproducibile e non
+  dipende dalla dimensione dei blocchi né richiede di tenere in memoria il test set;
+- in modalità 'sgd' una prima passata calcola media e varianza (StandardScaler.partial_fit)
+  e raccoglie le classi, poi le epoche aggiornano uno SGDClassifier con partial_fit;
+- in modalità 'reservoir' un campione uniforme di dimensione fissa delle righe di
+  addestramento (reservoir sampling) viene usato per addestrare un modello classico.
+Durante la lettura vengono riportati la memoria residente (RSS) corrente e il picco.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from personality_batch_scoring import COLONNE_FEATURE, COLONNE_SI_NO, preprocessa_blocco
+
+FILE_REPORT_INCREMENTALE = "addestramento_incrementale.json"
+MODALITA = ("sgd", "reservoir")
+
+
+def rss_corrente_mb():
+    """Memoria residente attuale del processo in MB (Linux), altrimenti il picco"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return rss_picco_mb()
+
+
+def rss_picco_mb():
+    """Picco di memoria residente del processo in MB (ru_maxrss è in KB su Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def maschera_test(indici_riga, test_size, seme):
+    """
+    Assegna le righe al test set con un hash splitmix64 del numero di riga globale:
+    la stessa riga finisce sempre nella stessa parte, qualunque sia la dimensione dei blocchi.
+    """
+    with np.errstate(over='ignore'):
+        z = indici_riga.astype(np.uint64) + np.uint64(seme) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+def leggi_blocchi(percorso_csv, righe_per_blocco, test_size, seme):
+    """
+    Legge il CSV a blocchi e restituisce, per ogni blocco, le feature float32, le etichette
+    e la maschera del test set, considerando solo le righe complete.
+    """
+    lettore = pd.read_csv(percorso_csv, usecols=COLONNE_FEATURE + ['Personality'],
+                          chunksize=righe_per_blocco, dtype={c: str for c in COLONNE_SI_NO + ['Personality']})
+    inizio = 0
+    for blocco in lettore:
+        indici = np.arange(inizio, inizio + len(blocco))
+        inizio += len(blocco)
+        X, complete = preprocessa_blocco(blocco)
+        y = blocco['Personality'].to_numpy(dtype=object)
+        complete &= pd.notna(y)
+        yield X[complete], y[complete].astype(str), maschera_test(indici[complete], test_size, seme)
+
+
+class MonitorMemoria:
+    """Raccoglie l'RSS dopo ogni blocco e lo stampa periodicamente"""
+    def __init__(self, ogni=10):
+        self.ogni = ogni
+        self.campioni = []
+        self.fase = None
+        self.blocchi_fase = 0
+        self.ultimo = self.inizio_fase = time.perf_counter()
+
+    def registra(self, fase, righe):
+        rss = rss_corrente_mb()
+        self.campioni.append(rss)
+        if fase != self.fase:
+            # La nuova fase è iniziata quando è terminato l'ultimo blocco della precedente
+            self.fase, self.blocchi_fase, self.inizio_fase = fase, 0, self.ultimo
+        self.blocchi_fase += 1
+        self.ultimo = time.perf_counter()
+        if self.blocchi_fase % self.ogni == 1:
+            trascorso = time.perf_counter() - self.inizio_fase
+            print(f"  [{fase}] {righe:>12,} righe  RSS {rss:7.1f} MB  ({righe / max(trascorso, 1e-9):,.0f} righe/s)")
+
+    def riepilogo(self):
+        return {
+            'rss_mb_min': round(min(self.campioni), 1) if self.campioni else None,
+            'rss_mb_max': round(max(self.campioni), 1) if self.campioni else None,
+            'rss_picco_mb': round(rss_picco_mb(), 1),
+        }
+
+
+def addestra_sgd(percorso_csv, righe_per_blocco, test_size, seme, epoche, monitor):
+    """Scaler e SGDClassifier (regressione logistica) aggiornati blocco per blocco"""
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seme)
+    scaler = StandardScaler()
+    classi = set()
+    righe_train = 0
+    print("📏 Passata 1: statistiche per la standardizzazione e classi")
+    for X, y, test in leggi_blocchi(percorso_csv, righe_per_blocco, test_size, seme):
+        classi.update(np.unique(y))
+        if (~test).any():
+            scaler.partial_fit(pd.DataFrame(X[~test], columns=COLONNE_FEATURE))
+            righe_train += int((~test).sum())
+        monitor.registra("statistiche", righe_train)
+    if righe_train == 0 or len(classi) < 2:
+        raise ValueError("Servono righe di addestramento con almeno due classi")
+
+    classi = np.array(sorted(classi))
+    classificatore = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=seme)
+    for epoca in range(1, epoche + 1):
+        print(f"🔁 Epoca {epoca}/{epoche}")
+        righe = 0
+        for X, y, test in leggi_blocchi(percorso_csv, righe_per_blocco, test_size, seme):
+            if not (~test).any():
+                continue
+            # Le righe del blocco vengono mescolate: i CSV esportati sono spesso ordinati
+            ordine = rng.permutation(int((~test).sum()))
+            X_train = scaler.transform(pd.DataFrame(X[~test], columns=COLONNE_FEATURE))[ordine]
+            classificatore.partial_fit(X_train, y[~test][ordine], classes=classi)
+            righe += len(ordine)
+            monitor.registra(f"epoca {epoca}", righe)
+
+    return Pipeline([('scaler', scaler), ('classificatore', classificatore)]), righe_train
+
+
+def addestra_reservoir(percorso_csv, righe_per_blocco, test_size, seme, campioni, sigla_modello, monitor):
+    """Campione uniforme di al massimo 'campioni' righe di addestramento, poi addestramento classico"""
+    from personality_predictor import MODELLI_DISPONIBILI
+
+    rng = np.random.default_rng(seme)
+    X_campione = np.empty((campioni, len(COLONNE_FEATURE)), dtype=np.float32)
+    y_campione = np.empty(campioni, dtype=object)
+    viste = 0
+    print(f"🎲 Reservoir sampling di {campioni:,} righe di addestramento")
+    for X, y, test in leggi_blocchi(percorso_csv, righe_per_blocco, test_size, seme):
+        X, y = X[~test], y[~test]
+        # Algoritmo R vettoriale: la riga numero i (da 0) sostituisce una posizione casuale
+        # in [0, i] se questa cade nel campione; con posizioni ripetute vince l'ultima, come
+        # nella versione sequenziale
+        posizioni = np.arange(viste, viste + len(X))
+        riempimento = posizioni < campioni
+        X_campione[posizioni[riempimento]] = X[riempimento]
+        y_campione[posizioni[riempimento]] = y[riempimento]
+        scelte = rng.integers(0, posizioni[~riempimento] + 1) if (~riempimento).any() else np.array([], dtype=int)
+        sostituzioni = scelte < campioni
+        X_campione[scelte[sostituzioni]] = X[~riempimento][sostituzioni]
+        y_campione[scelte[sostituzioni]] = y[~riempimento][sostituzioni]
+        viste += len(X)
+        monitor.registra("campionamento", viste)
+
+    righe = min(viste, campioni)
+    if righe == 0:
+        raise ValueError("Nessuna riga di addestramento nel file")
+    nome, crea_modello = MODELLI_DISPONIBILI[sigla_modello]
+    print(f"🌲 Addestramento di {nome} su {righe:,} righe campionate su {viste:,}")
+    modello = crea_modello(seme)
+    modello.fit(pd.DataFrame(X_campione[:righe], columns=COLONNE_FEATURE), y_campione[:righe].astype(str))
+    return modello, viste
+
+
+def valuta_hold_out(modello, percorso_csv, righe_per_blocco, test_size, seme, monitor):
+    """Accuratezza e matrice di confusione sulle righe di test, calcolate blocco per blocco"""
+    classi = [str(c) for c in modello.classes_]
+    indice_classi = pd.Index(classi)
+    confusione = np.zeros((len(classi), len(classi)), dtype=np.int64)
+    righe = 0
+    for X, y, test in leggi_blocchi(percorso_csv, righe_per_blocco, test_size, seme):
+        if not test.any():
+            continue
+        previsioni = modello.predict(pd.DataFrame(X[test], columns=COLONNE_FEATURE)).astype(str)
+        vere, previste = indice_classi.get_indexer(y[test]), indice_classi.get_indexer(previsioni)
+        # Le classi assenti dall'addestramento valgono -1 e restano fuori dalla matrice
+        note = vere >= 0
+        np.add.at(confusione, (vere[note], previste[note]), 1)
+        righe += int(test.sum())
+        monitor.registra("valutazione", righe)
+    totale = int(confusione.sum())
+    return {
+        'righe_test': righe,
+        'accuratezza': float(np.trace(confusione) / totale) if totale else None,
+        'classi': classi,
+        'matrice_confusione': confusione.tolist(),
+    }
+
+
+def addestra_incrementale(percorso_csv, cartella_output=".", test_size=0.2, random_state=42,
+                          modalita="sgd", righe_per_blocco=200_000, epoche=3, campioni=200_000,
+                          sigla_modello="rf", esporta_onnx=True):
+    """
+    Addestra il modello leggendo il CSV a blocchi e salva modello, ONNX e report nella cartella.
+
+    Returns:
+        tuple: (modello, report)
+    """
+    if not os.path.exists(percorso_csv):
+        raise FileNotFoundError(f"Il file '{percorso_csv}' non esiste.")
+    if modalita not in MODALITA:
+        raise ValueError(f"Modalità non valida: {modalita} (ammesse: {', '.join(MODALITA)})")
+    if not 0 <= test_size < 1:
+        raise ValueError(f"test_size deve essere compreso tra 0 (incluso) e 1 (escluso), non {test_size}")
+
+    os.makedirs(cartella_output, exist_ok=True)
+    monitor = MonitorMemoria()
+    inizio = time.perf_counter()
+    if modalita == "sgd":
+        modello, righe_train = addestra_sgd(percorso_csv, righe_per_blocco, test_size, random_state, epoche, monitor)
+    else:
+        modello, righe_train = addestra_reservoir(percorso_csv, righe_per_blocco, test_size, random_state,
+                                                  campioni, sigla_modello, monitor)
+    durata_addestramento = time.perf_counter() - inizio
+
+    print("🧪 Valutazione sul test set (hold-out con hash delle righe)")
+    valutazione = valuta_hold_out(modello, percorso_csv, righe_per_blocco, test_size, random_state, monitor)
+    if valutazione['accuratezza'] is None:
+        print("⚠️  Nessuna riga di test: accuratezza non disponibile")
+    else:
+        print(f"Accuratezza: {valutazione['accuratezza']:.4f} su {valutazione['righe_test']:,} righe di test")
+
+    import joblib
+    from personality_predictor import FILE_MODELLO, FILE_ONNX, esporta_modello_onnx
+
+    artefatti = [FILE_MODELLO]
+    joblib.dump(modello, os.path.join(cartella_output, FILE_MODELLO))
+    if esporta_onnx:
+        riuscita, _ = esporta_modello_onnx(modello, np.zeros((1, len(COLONNE_FEATURE)), dtype=np.float32),
+                                           os.path.join(cartella_output, FILE_ONNX))
+        if riuscita:
+            artefatti.append(FILE_ONNX)
+
+    report = {
+        'dataset': os.path.abspath(percorso_csv),
+        'modalita': modalita,
+        'modello': type(modello).__name__ if modalita == "reservoir" else "StandardScaler + SGDClassifier",
+        'configurazione': {
+            'test_size': test_size,
+            'random_state': random_state,
+            'righe_per_blocco': righe_per_blocco,
+            'epoche': epoche if modalita == "sgd" else None,
+            'campioni': campioni if modalita == "reservoir" else None,
+        },
+        'righe_addestramento': righe_train,
+        **valutazione,
+        'secondi_addestramento': round(durata_addestramento, 2),
+        'secondi_totali': round(time.perf_counter() - inizio, 2),
+        'memoria': monitor.riepilogo(),
+        'artefatti': artefatti,
+        'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(os.path.join(cartella_output, FILE_REPORT_INCREMENTALE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    memoria = report['memoria']
+    print(f"📈 RSS durante la lettura: {memoria['rss_mb_min']} - {memoria['rss_mb_max']} MB (picco {memoria['rss_picco_mb']} MB)")
+    print(f"📋 Report salvato in: {os.path.join(cartella_output, FILE_REPORT_INCREMENTALE)}")
+    return modello, report
+
+
+def frazione_test(testo):
+    """Tipo argparse per --test-size: frazione in [0, 1)"""
+    valore = float(testo)
+    if not 0 <= valore < 1:
+        raise argparse.ArgumentTypeError(f"deve essere compreso tra 0 (incluso) e 1 (escluso), non {testo}")
+    return valore
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Addestramento fuori memoria da CSV più grandi della RAM.")
+    parser.add_argument("csv", help="File CSV con le risposte e la colonna 'Personality'.")
+    parser.add_argument("--output-dir", "-o", default=".",
+                        help="Cartella in cui salvare modello, ONNX e report. Predefinito: cartella corrente.")
+    parser.add_argument("--modalita", choices=MODALITA, default="sgd",
+                        help="sgd: SGDClassifier con partial_fit; reservoir: campione uniforme e modello classico. "
+                             "Predefinito: sgd.")
+    parser.add_argument("--righe-per-blocco", "-b", type=int, default=200_000,
+                        help="Righe lette per volta. Predefinito: 200000.")
+    parser.add_argument("--epoche", type=int, default=3, help="Passate di addestramento in modalità sgd. Predefinito: 3.")
+    parser.add_argument("--campioni", type=int, default=200_000,
+                        help="Righe del campione in modalità reservoir. Predefinito: 200000.")
+    parser.add_argument("--modello", choices=["rf", "lr", "svm"], default="rf",
+                        help="Modello addestrato sul campione in modalità reservoir. Predefinito: rf.")
+    parser.add_argument("--test-size", type=frazione_test, default=0.2, help="Frazione di righe nel test set. Predefinito: 0.2.")
+    parser.add_argument("--seed", type=int, default=42, help="Seme casuale. Predefinito: 42.")
+    parser.add_argument("--no-onnx", action="store_true", help="Non esportare il modello in ONNX.")
+    args = parser.parse_args()
+
+    try:
+        addestra_incrementale(args.csv, args.output_dir, args.test_size, args.seed, args.modalita,
+                              args.righe_per_blocco, args.epoche, args.campioni, args.modello, not args.no_onnx)
+    except (OSError, ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Tabella delle previsioni per tutte le combinazioni di risposte del questionario.
+
+Il questionario ammette solo interi in intervalli piccoli, quindi le combinazioni possibili
+sono 12 * 2 * 11 * 8 * 2 * 16 * 11 = 743.424: la tabella le precalcola tutte e la previsione
+diventa una lettura in memoria, senza caricare il modello.
+
+Formato del file binario (little-endian), pensato per essere mappato in memoria anche da Kotlin:
+
+    offset  tipo        campo
+    0       8 byte      magic "PERSOLUT"
+    8       uint32      versione del formato (1)
+    12      uint32      numero di feature (7)
+    16      uint32      numero di classi C
+    20      7 x uint32  numero di valori di ogni feature, nell'ordine di COLONNE_FEATURE
+    48      uint64      offset dell'array delle classi previste
+    56      uint64      offset dell'array delle probabilità
+    64      C x 32 byte nomi delle classi in UTF-8, completati con byte nulli
+    ...     N x uint8   indice della classe prevista per ogni combinazione
+    ...     N x C float32  probabilità di ogni classe, riga per riga
+
+L'indice di una combinazione è mixed-radix con l'ultima feature che varia più velocemente:
+    indice = ((((((alone * 2 + paura) * 11 + eventi) * 8 + uscite) * 2 + stanchezza) * 16 + amici) * 11 + post)
+con paura e stanchezza codificate come 1 = Sì, 0 = No.
+"""
+
+import os
+import sys
+import struct
+import argparse
+
+import numpy as np
+
+from personality_features import COLONNE_FEATURE, COLONNE_SI_NO, MAPPA_SI_NO
+
+# Numero di valori ammessi per ogni feature (da 0 al massimo del questionario)
+DIMENSIONI = (12, 2, 11, 8, 2, 16, 11)
+NUMERO_COMBINAZIONI = int(np.prod(DIMENSIONI))
+
+MAGIC = b"PERSOLUT"
+VERSIONE_FORMATO = 1
+FORMATO_INTESTAZIONE = "<8sIII7IQQ"
+DIMENSIONE_INTESTAZIONE = struct.calcsize(FORMATO_INTESTAZIONE)
+LUNGHEZZA_NOME_CLASSE = 32
+
+FILE_TABELLA = "tabella_personalita.bin"
+FILE_TABELLA_NPZ = "tabella_personalita.npz"
+
+
+def indice_combinazione(valori):
+    """Calcola l'indice mixed-radix di una combinazione di valori interi"""
+    indice = 0
+    for valore, dimensione in zip(valori, DIMENSIONI):
+        if not 0 <= valore < dimensione:
+            raise ValueError(f"Valore {valore} fuori dall'intervallo 0-{dimensione - 1}")
+        indice = indice * dimensione + valore
+    return indice
+
+
+def tutte_le_combinazioni():
+    """Restituisce la matrice float32 (N, 7) di tutte le combinazioni, nell'ordine degli indici"""
+    return np.indices(DIMENSIONI, dtype=np.uint8).reshape(len(DIMENSIONI), -1).T.astype(np.float32)
+
+
+def costruisci_tabella(percorso_modello, righe_per_blocco=100_000):
+    """
+    Calcola previsione e probabilità del modello per tutte le combinazioni.
+
+    Returns:
+        tuple: (classi, indici delle classi previste uint8, probabilità float32)
+    """
+    from personality_batch_scoring import carica_predittore
+
+    classi, predici = carica_predittore(percorso_modello)
+    combinazioni = tutte_le_combinazioni()
+
+    probabilita = None
+    previste = np.empty(NUMERO_COMBINAZIONI, dtype=np.uint8)
+    for inizio in range(0, NUMERO_COMBINAZIONI, righe_per_blocco):
+        etichette, prob_blocco = predici(combinazioni[inizio:inizio + righe_per_blocco])
+        if probabilita is None:
+            probabilita = np.empty((NUMERO_COMBINAZIONI, prob_blocco.shape[1]), dtype=np.float32)
+            classi = classi or [str(i) for i in range(prob_blocco.shape[1])]
+        probabilita[inizio:inizio + len(prob_blocco)] = prob_blocco
+        posizioni = {str(classe): i for i, classe in enumerate(classi)}
+        previste[inizio:inizio + len(etichette)] = [posizioni[str(e)] for e in etichette]
+
+    return [str(c) for c in classi], previste, probabilita
+
+
+def salva_tabella(classi, previste, probabilita, percorso_bin=FILE_TABELLA, percorso_npz=FILE_TABELLA_NPZ):
+    """Salva la tabella in formato npz e nel formato binario mappabile descritto sopra"""
+    np.savez_compressed(percorso_npz, dimensioni=np.array(DIMENSIONI), colonne=np.array(COLONNE_FEATURE),
+                        classi=np.array(classi), previste=previste, probabilita=probabilita)
+
+    offset_previste = DIMENSIONE_INTESTAZIONE + LUNGHEZZA_NOME_CLASSE * len(classi)
+    # Le probabilità float32 partono da un offset allineato a 4 byte
+    offset_probabilita = (offset_previste + NUMERO_COMBINAZIONI + 3) // 4 * 4
+
+    with open(percorso_bin, "wb") as f:
+        f.write(struct.pack(FORMATO_INTESTAZIONE, MAGIC, VERSIONE_FORMATO, len(DIMENSIONI), len(classi),
+                            *DIMENSIONI, offset_previste, offset_probabilita))
+        for classe in classi:
+            nome = classe.encode("utf-8")[:LUNGHEZZA_NOME_CLASSE]
+            f.write(nome.ljust(LUNGHEZZA_NOME_CLASSE, b"\0"))
+        f.write(previste.astype("<u1").tobytes())
+        f.write(b"\0" * (offset_probabilita - offset_previste - NUMERO_COMBINAZIONI))
+        f.write(probabilita.astype("<f4").tobytes())
+
+
+class TabellaPrevisioni:
+    """
+    Predittore a tempo costante basato sul file binario della tabella, mappato in memoria.
+    """
+    def __init__(self, percorso=FILE_TABELLA):
+        with open(percorso, "rb") as f:
+            intestazione = struct.unpack(FORMATO_INTESTAZIONE, f.read(DIMENSIONE_INTESTAZIONE))
+            magic, versione, n_feature, n_classi = intestazione[:4]
+            dimensioni = tuple(intestazione[4:4 + n_feature])
+            offset_previste, offset_probabilita = intestazione[-2:]
+            if magic != MAGIC or versione != VERSIONE_FORMATO or dimensioni != DIMENSIONI:
+                raise ValueError(f"File tabella non valido o di una versione diversa: {percorso}")
+            self.classi = [f.read(LUNGHEZZA_NOME_CLASSE).rstrip(b"\0").decode("utf-8") for _ in range(n_classi)]
+
+        self.previste = np.memmap(percorso, dtype="<u1", mode="r", offset=offset_previste,
+                                  shape=(NUMERO_COMBINAZIONI,))
+        self.probabilita = np.memmap(percorso, dtype="<f4", mode="r", offset=offset_probabilita,
+                                     shape=(NUMERO_COMBINAZIONI, n_classi))
+
+    def valori_da_dati(self, dati_utente):
+        """Converte un dizionario con le colonne del dataset negli interi della combinazione"""
+        valori = []
+        for colonna in COLONNE_FEATURE:
+            valore = dati_utente[colonna]
+            if colonna in COLONNE_SI_NO and isinstance(valore, str):
+                if valore.strip().lower() not in MAPPA_SI_NO:
+                    raise ValueError(f"{colonna}: risposta non riconosciuta '{valore}'")
+                valore = MAPPA_SI_NO[valore.strip().lower()]
+            valore = float(valore)
+            if not valore.is_integer():
+                raise ValueError(f"{colonna}: la tabella contiene solo valori interi")
+            valori.append(int(valore))
+        return valori
+
+    def prevedi(self, dati_utente):
+        """
+        Restituisce classe prevista e probabilità per le risposte dell'utente.
+        Solleva ValueError se le risposte sono fuori dagli intervalli del questionario.
+        """
+        indice = indice_combinazione(self.valori_da_dati(dati_utente))
+        return self.classi[self.previste[indice]], np.array(self.probabilita[indice])
+
+    def predici(self, X):
+        """
+        Restituisce etichette e probabilità per una matrice di valori interi (Sì = 1, No = 0),
+        come i predittori di personality_batch_scoring.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        valori = X.astype(np.int64)
+        if X.ndim != 2 or X.shape[1] != len(DIMENSIONI) or (valori != X).any() \
+                or (valori < 0).any() or (valori >= np.array(DIMENSIONI)).any():
+            raise ValueError("La tabella contiene solo valori interi negli intervalli del questionario")
+        indici = np.ravel_multi_index(valori.T, DIMENSIONI)
+        return np.array(self.classi)[self.previste[indici]], np.array(self.probabilita[indici])
+
+    def verifica(self, modello, campioni=2000, seme=0):
+        """Confronta la tabella con un modello sklearn su combinazioni casuali; restituisce la frazione concorde"""
+        import pandas as pd
+
+        indici = np.random.default_rng(seme).integers(0, NUMERO_COMBINAZIONI, campioni)
+        valori = np.stack(np.unravel_index(indici, DIMENSIONI), axis=1).astype(np.float32)
+        previsioni = modello.predict(pd.DataFrame(valori, columns=COLONNE_FEATURE))
+        attese = np.array(self.classi)[self.previste[indici]]
+        return float(np.mean(previsioni.astype(str) == attese))
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Tabella precalcolata delle previsioni del questionario.")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True)
+
+    costruisci = sottocomandi.add_parser("costruisci", help="Calcola la tabella per tutte le combinazioni.")
+    costruisci.add_argument("--modello", "-m", default="modello_personalita.onnx",
+                            help="Modello ONNX (.onnx) o joblib (.pkl). Predefinito: modello_personalita.onnx.")
+    costruisci.add_argument("--output", "-o", default=FILE_TABELLA,
+                            help=f"File binario della tabella (accanto viene salvato il .npz). Predefinito: {FILE_TABELLA}.")
+
+    prevedi = sottocomandi.add_parser("prevedi", help="Legge dalla tabella la previsione per una combinazione.")
+    prevedi.add_argument("valori", nargs=len(COLONNE_FEATURE), help=" ".join(COLONNE_FEATURE))
+    prevedi.add_argument("--tabella", "-t", default=FILE_TABELLA, help=f"File della tabella. Predefinito: {FILE_TABELLA}.")
+
+    args = parser.parse_args()
+
+    if args.comando == "costruisci":
+        if not os.path.exists(args.modello):
+            print(f"[ERRORE] Il file '{args.modello}' non esiste.")
+            return 1
+        print(f"🧮 Calcolo delle previsioni per {NUMERO_COMBINAZIONI:,} combinazioni con {args.modello}...")
+        classi, previste, probabilita = costruisci_tabella(args.modello)
+        percorso_npz = os.path.splitext(args.output)[0] + ".npz"
+        salva_tabella(classi, previste, probabilita, args.output, percorso_npz)
+        print(f"✅ Tabella salvata in: {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB) e {percorso_npz}")
+        for i, classe in enumerate(classi):
+            print(f"  {classe}: {np.mean(previste == i):.1%} delle combinazioni")
+        return 0
+
+    try:
+        tabella = TabellaPrevisioni(args.tabella)
+        previsione, probabilita = tabella.prevedi(dict(zip(COLONNE_FEATURE, args.valori)))
+    except (OSError, ValueError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+
+    print(f"🔮 Tipo di personalità previsto: {previsione}")
+    for classe, prob in zip(tabella.classi, probabilita):
+        print(f"  {classe}: {prob:.4f} ({prob*100:.2f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
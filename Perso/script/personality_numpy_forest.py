@@ -0,0 +1,217 @@
+"""
+Esportazione della Random Forest in array NumPy e valutatore vettoriale che non richiede
+scikit-learn: all'avvio basta mappare in memoria i file .npy con np.load(mmap_mode='r').
+
+Tutti gli alberi sono concatenati in un unico insieme di array, con indici globali dei nodi:
+
+    feature.npy   int32   (N,)    feature confrontata dal nodo (0 per le foglie)
+    soglia.npy    float32 (N,)    soglia: si va a sinistra se valore <= soglia
+    figli.npy     int32   (N, 2)  figlio sinistro e destro; per le foglie il nodo stesso
+    valori.npy    float32 (N, C)  probabilità delle classi nelle foglie
+    radici.npy    int32   (T,)    radice di ogni albero
+    metadati.json                 classi, colonne, profondità massima e versione del formato
+
+Le foglie puntano a sé stesse, quindi ogni riga può scendere per un numero fisso di passi
+(la profondità massima) senza controlli. Le soglie di scikit-learn sono float64: vengono
+arrotondate per difetto al float32, così il confronto con input float32 resta identico.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+FORMATO_FORESTA = 1
+CARTELLA_FORESTA = "foresta_personalita"
+ARRAY_FORESTA = ('feature', 'soglia', 'figli', 'valori', 'radici')
+
+
+def esporta_foresta(modello, cartella=CARTELLA_FORESTA, colonne=None):
+    """
+    Appiattisce una RandomForestClassifier addestrata negli array descritti sopra.
+
+    Returns:
+        dict: metadati salvati
+    """
+    if not hasattr(modello, 'estimators_') or not all(hasattr(albero, 'tree_') for albero in modello.estimators_):
+        raise ValueError(f"{type(modello).__name__} non è una foresta di alberi di decisione")
+
+    alberi = [albero.tree_ for albero in modello.estimators_]
+    numero_nodi = sum(albero.node_count for albero in alberi)
+    n_classi = len(modello.classes_)
+
+    feature = np.zeros(numero_nodi, dtype=np.int32)
+    soglia = np.zeros(numero_nodi, dtype=np.float32)
+    figli = np.empty((numero_nodi, 2), dtype=np.int32)
+    valori = np.zeros((numero_nodi, n_classi), dtype=np.float32)
+    radici = np.empty(len(alberi), dtype=np.int32)
+
+    inizio = 0
+    for i, albero in enumerate(alberi):
+        fine = inizio + albero.node_count
+        indici = np.arange(inizio, fine, dtype=np.int32)
+        foglia = albero.children_left == -1
+        radici[i] = inizio
+
+        feature[inizio:fine] = np.where(foglia, 0, albero.feature)
+        # Arrotondamento per difetto: x <= soglia64 equivale a x <= soglia32 per ogni x float32
+        soglia32 = albero.threshold.astype(np.float32)
+        troppo_alte = soglia32.astype(np.float64) > albero.threshold
+        soglia32[troppo_alte] = np.nextafter(soglia32[troppo_alte], np.float32(-np.inf))
+        soglia[inizio:fine] = np.where(foglia, 0.0, soglia32)
+        figli[inizio:fine, 0] = np.where(foglia, indici, albero.children_left + inizio)
+        figli[inizio:fine, 1] = np.where(foglia, indici, albero.children_right + inizio)
+
+        # value contiene conteggi o frazioni a seconda della versione di scikit-learn
+        conteggi = albero.value[:, 0, :]
+        valori[inizio:fine] = conteggi / conteggi.sum(axis=1, keepdims=True)
+        inizio = fine
+
+    os.makedirs(cartella, exist_ok=True)
+    for nome, array in zip(ARRAY_FORESTA, (feature, soglia, figli, valori, radici)):
+        np.save(os.path.join(cartella, f"{nome}.npy"), array)
+
+    metadati = {
+        'formato': FORMATO_FORESTA,
+        'classi': [str(c) for c in modello.classes_],
+        'colonne': list(colonne if colonne is not None else getattr(modello, 'feature_names_in_', [])),
+        'n_feature': int(modello.n_features_in_),
+        'alberi': len(alberi),
+        'nodi': int(numero_nodi),
+        'profondita_massima': int(max(albero.max_depth for albero in alberi)),
+    }
+    with open(os.path.join(cartella, "metadati.json"), 'w', encoding='utf-8') as f:
+        json.dump(metadati, f, ensure_ascii=False, indent=4)
+    return metadati
+
+
+class ForestaNumPy:
+    """
+    Valutatore vettoriale della foresta esportata. Gli array sono mappati in memoria in sola
+    lettura: più processi che caricano la stessa foresta condividono le pagine del sistema.
+    """
+    def __init__(self, cartella=CARTELLA_FORESTA, mmap=True):
+        with open(os.path.join(cartella, "metadati.json"), 'r', encoding='utf-8') as f:
+            self.metadati = json.load(f)
+        if self.metadati.get('formato') != FORMATO_FORESTA:
+            raise ValueError(f"Formato della foresta non supportato: {self.metadati.get('formato')}")
+
+        modo = 'r' if mmap else None
+        for nome in ARRAY_FORESTA:
+            setattr(self, nome, np.load(os.path.join(cartella, f"{nome}.npy"), mmap_mode=modo))
+        self.classi = self.metadati['classi']
+        self.profondita = self.metadati['profondita_massima']
+        # Vista piatta dei figli: il figlio di un nodo è figli_piatti[2 * nodo + va_a_destra]
+        self.figli_piatti = self.figli.reshape(-1)
+
+    def predict_proba(self, X, righe_per_blocco=1024):
+        """Probabilità medie delle classi sugli alberi, per ogni riga di X"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.metadati['n_feature']:
+            raise ValueError(f"Attese {self.metadati['n_feature']} colonne, ricevuta forma {X.shape}")
+        if np.isnan(X).any():
+            raise ValueError("La foresta NumPy non gestisce valori mancanti")
+
+        n_feature = X.shape[1]
+        probabilita = np.empty((len(X), len(self.classi)), dtype=np.float32)
+        # Blocchi piccoli tengono la matrice (righe x alberi) dei nodi correnti nella cache
+        for inizio in range(0, len(X), righe_per_blocco):
+            blocco = np.ascontiguousarray(X[inizio:inizio + righe_per_blocco])
+            piatto = blocco.reshape(-1)
+            base = (np.arange(len(blocco), dtype=np.int32) * n_feature)[:, None]
+            nodi = np.broadcast_to(self.radici, (len(blocco), len(self.radici)))
+            for _ in range(self.profondita):
+                a_destra = piatto.take(base + self.feature.take(nodi)) > self.soglia.take(nodi)
+                nodi = self.figli_piatti.take(2 * nodi + a_destra)
+            probabilita[inizio:inizio + len(blocco)] = self.valori.take(nodi, axis=0).mean(axis=1)
+        return probabilita
+
+    def predict(self, X):
+        """Classe con la probabilità più alta per ogni riga di X"""
+        return self.predici(X)[0]
+
+    def predici(self, X):
+        """Restituisce etichette e probabilità, come i predittori di personality_batch_scoring"""
+        probabilita = self.predict_proba(X)
+        return np.array(self.classi)[np.argmax(probabilita, axis=1)], probabilita
+
+
+def verifica_foresta(modello, foresta, X):
+    """
+    Confronta foresta NumPy e modello scikit-learn sulle righe di X.
+
+    Returns:
+        dict: righe, classi diverse e massima differenza di probabilità
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(X, columns=foresta.metadati['colonne'] or None)
+    etichette_attese = np.asarray(modello.predict(df)).astype(str)
+    etichette, probabilita = foresta.predici(X)
+    differenza = float(np.max(np.abs(probabilita - modello.predict_proba(df))))
+    classi_diverse = int(np.sum(etichette != etichette_attese))
+    return {
+        'righe': len(X),
+        'classi_diverse': classi_diverse,
+        'differenza_probabilita_max': differenza,
+        'ok': classi_diverse == 0 and differenza <= 1e-5,
+    }
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Random Forest in array NumPy, valutata senza scikit-learn.")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True)
+
+    esporta = sottocomandi.add_parser("esporta", help="Converte il modello joblib in array NumPy.")
+    esporta.add_argument("--modello", "-m", default="modello_personalita.pkl",
+                         help="Modello joblib con la Random Forest. Predefinito: modello_personalita.pkl.")
+    esporta.add_argument("--output", "-o", default=CARTELLA_FORESTA,
+                         help=f"Cartella degli array. Predefinito: {CARTELLA_FORESTA}.")
+
+    prevedi = sottocomandi.add_parser("prevedi", help="Prevede la personalità per una riga di valori numerici.")
+    prevedi.add_argument("valori", nargs="+", type=float, help="Valori delle feature, nell'ordine del dataset (Sì = 1, No = 0).")
+    prevedi.add_argument("--foresta", "-f", default=CARTELLA_FORESTA,
+                         help=f"Cartella della foresta esportata. Predefinito: {CARTELLA_FORESTA}.")
+
+    args = parser.parse_args()
+
+    if args.comando == "esporta":
+        if not os.path.exists(args.modello):
+            print(f"[ERRORE] Il file '{args.modello}' non esiste.")
+            return 1
+        import joblib
+
+        modello = joblib.load(args.modello)
+        try:
+            metadati = esporta_foresta(modello, args.output)
+        except ValueError as e:
+            print(f"[ERRORE] {e}")
+            return 1
+        print(f"🌲 Foresta esportata in {args.output}: {metadati['alberi']} alberi, {metadati['nodi']:,} nodi, "
+              f"profondità massima {metadati['profondita_massima']}")
+
+        campioni = np.random.default_rng(0).integers(0, 16, (5000, metadati['n_feature'])).astype(np.float32)
+        esito = verifica_foresta(modello, ForestaNumPy(args.output), campioni)
+        simbolo = "✅" if esito['ok'] else "❌"
+        print(f"{simbolo} Parità con scikit-learn su {esito['righe']} righe casuali: {esito['classi_diverse']} classi diverse, "
+              f"differenza massima di probabilità {esito['differenza_probabilita_max']:.2e}")
+        return 0 if esito['ok'] else 1
+
+    try:
+        foresta = ForestaNumPy(args.foresta)
+        etichette, probabilita = foresta.predici(np.array([args.valori]))
+    except (OSError, ValueError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+
+    print(f"🔮 Tipo di personalità previsto: {etichette[0]}")
+    for classe, prob in zip(foresta.classi, probabilita[0]):
+        print(f"  {classe}: {prob:.4f} ({prob*100:.2f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+Ottimizzazione del modello ONNX esportato per i client Android e desktop.
+
+Le fasi, applicate in ordine, sono:
+1. pulizia e compattazione della foresta (TreeEnsembleClassifier): si eliminano gli attributi
+   con il valore predefinito e i pesi nulli, le foglie sorelle con le stesse distribuzioni di
+   classe (entro la tolleranza) vengono unite nel nodo padre e i nodi vengono rinumerati.
+   In una Random Forest cresciuta fino in fondo (impostazioni predefinite di scikit-learn) le
+   foglie sono pure e due foglie sorelle predicono sempre classi diverse: nessuna foglia viene
+   unita e la fase si limita a rimuovere i pesi nulli;
+2. ottimizzazione offline del grafo con ONNX Runtime, salvata su file così che i client non
+   debbano ripeterla a ogni avvio;
+3. quantizzazione dinamica dei pesi, solo se il grafo contiene operatori quantizzabili
+   (MatMul, Gemm, ...): alberi, LinearClassifier e SVMClassifier non ne hanno.
+
+Per ogni fase vengono misurate dimensione, accuratezza sul test set e latenza; il modello
+finale è il più piccolo tra quelli che non perdono più accuratezza della soglia indicata.
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+from collections import deque
+
+import numpy as np
+
+FILE_ONNX_OTTIMIZZATO = "modello_personalita_ottimizzato.onnx"
+FILE_REPORT_OTTIMIZZAZIONE = "ottimizzazione_onnx.json"
+
+# Operatori su cui quantize_dynamic interviene
+OPERATORI_QUANTIZZABILI = {'MatMul', 'Gemm', 'Conv', 'Attention', 'LSTM', 'GRU', 'Gather', 'EmbedLayerNormalization'}
+
+
+def _attributi(nodo):
+    """Restituisce gli attributi di un nodo ONNX come dizionario di valori Python"""
+    from onnx import helper
+
+    return {attributo.name: helper.get_attribute_value(attributo) for attributo in nodo.attribute}
+
+
+def _compatta_albero(nodi, foglie, radice, tolleranza, numero_alberi):
+    """
+    Unisce ricorsivamente (dal basso) le foglie sorelle le cui distribuzioni di classe nel
+    singolo albero differiscono al massimo della tolleranza per ogni classe.
+
+    Args:
+        nodi: {id: (modo, feature, soglia, id vero, id falso)}
+        foglie: {id: {classe: peso}}, aggiornato sul posto
+        numero_alberi: alberi della foresta, per cui sono divisi i pesi
+
+    Returns:
+        int: numero di coppie di foglie unite
+    """
+    unite = 0
+    # Visita in post-ordine senza ricorsione: gli alberi profondi superano il limite di Python
+    ordine = []
+    pila = [radice]
+    while pila:
+        nodo = pila.pop()
+        ordine.append(nodo)
+        if nodi[nodo][0] != b'LEAF':
+            pila.extend(nodi[nodo][3:5])
+
+    for nodo in reversed(ordine):
+        modo, _, _, vero, falso = nodi[nodo]
+        if modo == b'LEAF' or nodi[vero][0] != b'LEAF' or nodi[falso][0] != b'LEAF':
+            continue
+        pesi_vero, pesi_falso = foglie[vero], foglie[falso]
+        classi = set(pesi_vero) | set(pesi_falso)
+        # I pesi di skl2onnx sono le probabilità della foglia divise per il numero di alberi
+        # (nel caso binario solo quella della seconda classe): moltiplicati per numero_alberi
+        # tornano le probabilità del singolo albero
+        if all(abs(pesi_vero.get(c, 0.0) - pesi_falso.get(c, 0.0)) * numero_alberi <= tolleranza for c in classi):
+            nodi[nodo] = (b'LEAF', 0, 0.0, 0, 0)
+            foglie[nodo] = {c: (pesi_vero.get(c, 0.0) + pesi_falso.get(c, 0.0)) / 2 for c in classi}
+            unite += 1
+    return unite
+
+
+def compatta_foresta(modello_onnx, tolleranza=0.0):
+    """
+    Compatta i TreeEnsembleClassifier del modello. Con tolleranza 0 le previsioni restano
+    identiche; una tolleranza positiva (sulla probabilità del singolo albero, minore di 1)
+    unisce anche foglie quasi uguali, a scapito di un po' di accuratezza.
+
+    Returns:
+        tuple: (modello compattato, statistiche) oppure (modello, None) se non ci sono alberi
+    """
+    import onnx
+    from onnx import helper
+
+    # Due foglie pure di classi diverse distano esattamente 1: con tolleranza 1 ogni albero
+    # si ridurrebbe a una sola foglia
+    if not 0 <= tolleranza < 1:
+        raise ValueError(f"La tolleranza deve essere compresa tra 0 (incluso) e 1 (escluso), non {tolleranza}")
+
+    modello = onnx.ModelProto()
+    modello.CopyFrom(modello_onnx)
+    statistiche = None
+
+    for indice, nodo in enumerate(modello.graph.node):
+        if nodo.op_type != 'TreeEnsembleClassifier':
+            continue
+        a = _attributi(nodo)
+        numero_alberi = len(set(a['nodes_treeids']))
+
+        alberi = {}
+        for i, (albero, id_nodo) in enumerate(zip(a['nodes_treeids'], a['nodes_nodeids'])):
+            alberi.setdefault(albero, {})[id_nodo] = (a['nodes_modes'][i], a['nodes_featureids'][i], a['nodes_values'][i],
+                                                      a['nodes_truenodeids'][i], a['nodes_falsenodeids'][i])
+        foglie = {}
+        for albero, id_nodo, classe, peso in zip(a['class_treeids'], a['class_nodeids'], a['class_ids'], a['class_weights']):
+            foglie.setdefault(albero, {}).setdefault(id_nodo, {})
+            foglie[albero][id_nodo][classe] = foglie[albero][id_nodo].get(classe, 0.0) + peso
+
+        unite = 0
+        nuovi = {nome: [] for nome in ('nodes_treeids', 'nodes_nodeids', 'nodes_modes', 'nodes_featureids',
+                                       'nodes_values', 'nodes_truenodeids', 'nodes_falsenodeids',
+                                       'class_treeids', 'class_nodeids', 'class_ids', 'class_weights')}
+        for albero in sorted(alberi):
+            nodi = alberi[albero]
+            foglie_albero = foglie.get(albero, {})
+            radice = min(nodi)
+            unite += _compatta_albero(nodi, foglie_albero, radice, tolleranza, numero_alberi)
+
+            # Rinumerazione in ampiezza dei soli nodi ancora raggiungibili
+            nuovo_id = {}
+            coda = deque([radice])
+            while coda:
+                id_nodo = coda.popleft()
+                nuovo_id[id_nodo] = len(nuovo_id)
+                if nodi[id_nodo][0] != b'LEAF':
+                    coda.extend(nodi[id_nodo][3:5])
+
+            for id_nodo, id_compatto in nuovo_id.items():
+                modo, feature, soglia, vero, falso = nodi[id_nodo]
+                foglia = modo == b'LEAF'
+                nuovi['nodes_treeids'].append(albero)
+                nuovi['nodes_nodeids'].append(id_compatto)
+                nuovi['nodes_modes'].append(modo)
+                nuovi['nodes_featureids'].append(0 if foglia else feature)
+                nuovi['nodes_values'].append(0.0 if foglia else soglia)
+                nuovi['nodes_truenodeids'].append(0 if foglia else nuovo_id[vero])
+                nuovi['nodes_falsenodeids'].append(0 if foglia else nuovo_id[falso])
+                if foglia:
+                    for classe, peso in sorted(foglie_albero.get(id_nodo, {}).items()):
+                        if peso != 0.0:  # un peso nullo non contribuisce al punteggio
+                            nuovi['class_treeids'].append(albero)
+                            nuovi['class_nodeids'].append(id_compatto)
+                            nuovi['class_ids'].append(classe)
+                            nuovi['class_weights'].append(peso)
+
+        # Ricostruzione del nodo: nodes_hitrates e nodes_missing_value_tracks_true vengono
+        # omessi quando contengono solo i valori predefiniti
+        attributi = {nome: valore for nome, valore in a.items() if nome not in nuovi}
+        if all(v == 1.0 for v in a.get('nodes_hitrates', [])):
+            attributi.pop('nodes_hitrates', None)
+        if not any(a.get('nodes_missing_value_tracks_true', [])):
+            attributi.pop('nodes_missing_value_tracks_true', None)
+        attributi.update(nuovi)
+        nuovo_nodo = helper.make_node(nodo.op_type, list(nodo.input), list(nodo.output),
+                                      name=nodo.name, domain=nodo.domain, **attributi)
+        modello.graph.node.remove(nodo)
+        modello.graph.node.insert(indice, nuovo_nodo)
+
+        statistiche = {
+            'alberi': numero_alberi,
+            'nodi_prima': len(a['nodes_nodeids']),
+            'nodi_dopo': len(nuovi['nodes_nodeids']),
+            'foglie_unite': unite,
+            'pesi_prima': len(a['class_weights']),
+            'pesi_dopo': len(nuovi['class_weights']),
+        }
+
+    onnx.checker.check_model(modello)
+    return modello, statistiche
+
+
+def ottimizza_grafo(percorso_input, percorso_output, livello="base"):
+    """
+    Applica offline le ottimizzazioni di grafo di ONNX Runtime e salva il risultato.
+    Il livello predefinito 'base' produce un grafo portabile; 'tutte' può introdurre
+    operatori specifici dell'hardware su cui viene eseguita l'ottimizzazione.
+    """
+    import onnxruntime as ort
+    from personality_benchmark import livello_ort
+
+    opzioni = ort.SessionOptions()
+    opzioni.graph_optimization_level = livello_ort(livello)
+    opzioni.optimized_model_filepath = percorso_output
+    ort.InferenceSession(percorso_input, opzioni, providers=["CPUExecutionProvider"])
+    return percorso_output
+
+
+def quantizza_se_applicabile(percorso_input, percorso_output):
+    """
+    Quantizza dinamicamente i pesi in int8 se il grafo ha operatori quantizzabili.
+
+    Returns:
+        bool: True se il modello quantizzato è stato scritto
+    """
+    import onnx
+
+    operatori = {nodo.op_type for nodo in onnx.load(percorso_input).graph.node}
+    if not operatori & OPERATORI_QUANTIZZABILI:
+        return False
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(percorso_input, percorso_output, weight_type=QuantType.QInt8)
+    return True
+
+
+def valuta_modello(percorso, X_test, y_test, riferimento=None, tempo_minimo=0.3):
+    """
+    Misura dimensione, accuratezza e latenza di un modello ONNX e, se è indicato il riferimento
+    (etichette, probabilità), la concordanza delle previsioni con quello.
+
+    Returns:
+        tuple: (valutazione, etichette, probabilità)
+    """
+    from personality_benchmark import crea_sessione, misura
+
+    session = crea_sessione(percorso, thread=1)
+    nome_input = session.get_inputs()[0].name
+    etichette, probabilita = session.run(['label', 'probabilities'], {nome_input: X_test})
+    etichette = np.asarray(etichette).astype(str)
+
+    valutazione = {
+        'byte': os.path.getsize(percorso),
+        'accuratezza': float(np.mean(etichette == np.asarray(y_test).astype(str))),
+    }
+    if riferimento is not None:
+        valutazione['concordanza'] = float(np.mean(etichette == riferimento[0]))
+        valutazione['differenza_probabilita_max'] = float(np.max(np.abs(probabilita - riferimento[1])))
+    for dimensione in (1, 1000):
+        dati = np.ascontiguousarray(X_test[np.arange(dimensione) % len(X_test)])
+        durate = misura(lambda X: session.run(['label', 'probabilities'], {nome_input: X}), dati, tempo_minimo)
+        valutazione[f'latenza_ms_batch_{dimensione}'] = round(float(np.median(durate)) * 1000, 4)
+    return valutazione, etichette, probabilita
+
+
+def ottimizza_modello_onnx(percorso_onnx, X_test, y_test, cartella_output=".", tolleranza=0.0,
+                           livello="base", quantizza=True, perdita_massima=0.0):
+    """
+    Esegue le fasi di ottimizzazione, salva il modello finale e il report con dimensioni,
+    accuratezze e latenze di ogni fase.
+
+    Returns:
+        dict: report dell'ottimizzazione
+    """
+    import onnx
+
+    X_test = np.ascontiguousarray(X_test, dtype=np.float32)
+    fasi = []
+    originale, *riferimento = valuta_modello(percorso_onnx, X_test, y_test)
+    fasi.append({'fase': 'originale', **originale})
+    print(f"  originale:   {originale['byte'] / 1024:8.1f} KB  accuratezza {originale['accuratezza']:.4f}  "
+          f"latenza {originale['latenza_ms_batch_1']:.3f} ms (1 riga)")
+
+    percorso_finale = percorso_onnx
+    statistiche_foresta = None
+    with tempfile.TemporaryDirectory() as cartella_temporanea:
+        candidati = []
+
+        compattato, statistiche_foresta = compatta_foresta(onnx.load(percorso_onnx), tolleranza)
+        if statistiche_foresta:
+            percorso = os.path.join(cartella_temporanea, "compattato.onnx")
+            onnx.save(compattato, percorso)
+            if statistiche_foresta['foglie_unite']:
+                candidati.append(('compattato', percorso))
+                print(f"  🌲 Foresta: {statistiche_foresta['nodi_prima']:,} → {statistiche_foresta['nodi_dopo']:,} nodi, "
+                      f"{statistiche_foresta['foglie_unite']:,} coppie di foglie unite, "
+                      f"{statistiche_foresta['pesi_prima']:,} → {statistiche_foresta['pesi_dopo']:,} pesi")
+            else:
+                candidati.append(('pesi_nulli_rimossi', percorso))
+                print(f"  🌲 Foresta: nessuna coppia di foglie sorelle da unire (foglie pure), "
+                      f"pesi {statistiche_foresta['pesi_prima']:,} → {statistiche_foresta['pesi_dopo']:,}")
+
+        percorso = os.path.join(cartella_temporanea, "ottimizzato.onnx")
+        ottimizza_grafo(candidati[-1][1] if candidati else percorso_onnx, percorso, livello)
+        candidati.append((f'ort_{livello}', percorso))
+
+        if quantizza:
+            percorso = os.path.join(cartella_temporanea, "quantizzato.onnx")
+            if quantizza_se_applicabile(candidati[-1][1], percorso):
+                candidati.append(('quantizzato', percorso))
+            else:
+                print("  ℹ️  Quantizzazione non applicabile: nessun operatore quantizzabile nel grafo")
+
+        for nome, percorso in candidati:
+            valutazione, _, _ = valuta_modello(percorso, X_test, y_test, riferimento)
+            perdita = originale['accuratezza'] - valutazione['accuratezza']
+            fase = {'fase': nome, **valutazione, 'delta_accuratezza': round(valutazione['accuratezza'] - originale['accuratezza'], 6),
+                    'accettata': perdita <= perdita_massima}
+            fasi.append(fase)
+            simbolo = "✅" if fase['accettata'] else "❌"
+            print(f"  {simbolo} {nome:<11} {valutazione['byte'] / 1024:8.1f} KB  accuratezza {valutazione['accuratezza']:.4f} "
+                  f"(Δ {fase['delta_accuratezza']:+.4f})  latenza {valutazione['latenza_ms_batch_1']:.3f} ms (1 riga)")
+            if fase['accettata'] and valutazione['byte'] <= os.path.getsize(percorso_finale):
+                percorso_finale = percorso
+
+        destinazione = os.path.join(cartella_output, FILE_ONNX_OTTIMIZZATO)
+        with open(percorso_finale, "rb") as sorgente, open(destinazione, "wb") as f:
+            f.write(sorgente.read())
+
+    report = {
+        'modello_originale': os.path.basename(percorso_onnx),
+        'modello_ottimizzato': FILE_ONNX_OTTIMIZZATO,
+        'righe_test': len(X_test),
+        'tolleranza_foglie': tolleranza,
+        'livello_ort': livello,
+        'perdita_massima': perdita_massima,
+        'foresta': statistiche_foresta,
+        'fasi': fasi,
+    }
+    with open(os.path.join(cartella_output, FILE_REPORT_OTTIMIZZAZIONE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"✅ Modello ottimizzato: {destinazione} ({os.path.getsize(destinazione) / 1024:.1f} KB, "
+          f"originale {originale['byte'] / 1024:.1f} KB)")
+    return report
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Compatta, ottimizza e (se possibile) quantizza il modello ONNX.")
+    parser.add_argument("csv", help="Dataset usato per l'addestramento (serve a ricostruire il test set).")
+    parser.add_argument("--modello", "-m", default="modello_personalita.onnx",
+                        help="Modello ONNX da ottimizzare. Predefinito: modello_personalita.onnx.")
+    parser.add_argument("--output-dir", "-o", default=".",
+                        help="Cartella del modello ottimizzato e del report. Predefinito: cartella corrente.")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Frazione di test usata in addestramento. Predefinito: 0.2.")
+    parser.add_argument("--seed", type=int, default=42, help="Seme usato in addestramento. Predefinito: 42.")
+    parser.add_argument("--tolleranza", type=float, default=0.0,
+                        help="Differenza massima di probabilità tra foglie sorelle da unire, minore di 1. "
+                             "Predefinito: 0 (senza perdita).")
+    parser.add_argument("--livello", choices=["base", "estesa", "tutte"], default="base",
+                        help="Livello di ottimizzazione del grafo di ONNX Runtime. Predefinito: base.")
+    parser.add_argument("--perdita-massima", type=float, default=0.0,
+                        help="Perdita di accuratezza accettata per una fase. Predefinito: 0.")
+    parser.add_argument("--no-quantizzazione", action="store_true", help="Non tentare la quantizzazione dinamica.")
+    args = parser.parse_args()
+
+    if not 0 <= args.tolleranza < 1:
+        print(f"[ERRORE] La tolleranza deve essere compresa tra 0 (incluso) e 1 (escluso), non {args.tolleranza}")
+        return 1
+    for percorso in (args.csv, args.modello):
+        if not os.path.exists(percorso):
+            print(f"[ERRORE] Il file '{percorso}' non esiste.")
+            return 1
+
+    from personality_benchmark import carica_test_set
+
+    X_test, y_test, _ = carica_test_set(args.csv, args.test_size, args.seed)
+    print(f"🛠️  Ottimizzazione di {args.modello} (test set: {len(X_test)} righe)")
+    os.makedirs(args.output_dir, exist_ok=True)
+    ottimizza_modello_onnx(args.modello, X_test, y_test, args.output_dir, args.tolleranza,
+                           args.livello, not args.no_quantizzazione, args.perdita_massima)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Pipeline scikit-learn con il preprocessing incluso e sua esportazione come unico grafo ONNX.
+
+Il grafo riceve direttamente i campi grezzi del questionario, un input per colonna:
+le colonne numeriche come float [N, 1] e quelle Sì/No come stringhe [N, 1].
+La codifica Sì/No è convertita in ONNX con Reshape -> LabelEncoder -> Reshape, così
+Kotlin, web e Python condividono lo stesso preprocessing: come in personality_batch_scoring.py
+le risposte sono confrontate senza distinguere maiuscole e minuscole e ignorando gli spazi
+attorno, e quelle non riconosciute diventano NaN (valore mancante) invece che "No".
+Come nello scoring batch, le righe con un valore mancante non hanno una previsione valida:
+scikit-learn e ONNX Runtime instradano i NaN negli alberi in modo diverso, quindi chi usa il
+grafo deve scartare la previsione delle righe con risposte non riconosciute.
+StringNormalizer non viene usato perché ONNX Runtime lo inizializza con la locale en_US.UTF-8,
+che non è installata ovunque: tutte le combinazioni di maiuscole, con o senza uno spazio prima
+e dopo, sono invece elencate direttamente nelle chiavi del LabelEncoder. Nel grafo quindi
+più spazi o tabulazioni attorno alla risposta non sono riconosciuti.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+
+from personality_features import COLONNE_FEATURE, COLONNE_SI_NO, MAPPA_SI_NO
+
+FILE_PIPELINE = "modello_personalita_pipeline.pkl"
+FILE_ONNX_COMPLETO = "modello_personalita_completo.onnx"
+
+
+def varianti(risposta):
+    """Tutte le combinazioni di maiuscole e minuscole della risposta, con o senza uno spazio attorno"""
+    for lettere in itertools.product(*({c.lower(), c.upper()} for c in risposta)):
+        for prima, dopo in itertools.product(("", " "), repeat=2):
+            yield prima + "".join(lettere) + dopo
+
+
+VARIANTI_SI_NO = {variante: valore for chiave, valore in MAPPA_SI_NO.items() for variante in varianti(chiave)}
+
+
+class CodificaSiNo(BaseEstimator, TransformerMixin):
+    """
+    Converte le risposte Sì/No in 1/0 come personality_batch_scoring.preprocessa_blocco.
+    Le risposte mancanti o non riconosciute diventano NaN.
+    """
+    def fit(self, X, y=None):
+        self.n_features_in_ = np.shape(X)[1]
+        return self
+
+    def transform(self, X):
+        df = pd.DataFrame(np.asarray(X, dtype=object))
+        codificato = df.apply(lambda colonna: colonna.astype(str).str.strip().str.lower().map(MAPPA_SI_NO))
+        return codificato.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(input_features if input_features is not None else COLONNE_SI_NO, dtype=object)
+
+
+def costruisci_pipeline(classificatore):
+    """
+    Crea la pipeline preprocessing + classificatore. Le colonne escono nell'ordine del
+    dataset, quindi il classificatore vede le stesse feature del modello semplice.
+    """
+    trasformazioni = [
+        (colonna, CodificaSiNo() if colonna in COLONNE_SI_NO else 'passthrough', [colonna])
+        for colonna in COLONNE_FEATURE
+    ]
+    return Pipeline([
+        ('preprocessing', ColumnTransformer(trasformazioni)),
+        ('classificatore', clone(classificatore)),
+    ])
+
+
+def _forma_codifica_si_no(operator):
+    """Calcolatore di forma per skl2onnx: una colonna float per ogni colonna in ingresso"""
+    from skl2onnx.common.data_types import FloatTensorType
+
+    n = operator.inputs[0].get_first_dimension()
+    operator.outputs[0].type = FloatTensorType([n, operator.raw_operator.n_features_in_])
+
+
+def _converti_codifica_si_no(scope, operator, container):
+    """Convertitore skl2onnx: Reshape [-1] -> LabelEncoder -> Reshape [-1, C]"""
+    from onnx import TensorProto
+
+    colonne = operator.raw_operator.n_features_in_
+    forma_piatta = scope.get_unique_variable_name('forma_piatta')
+    forma_uscita = scope.get_unique_variable_name('forma_uscita')
+    container.add_initializer(forma_piatta, TensorProto.INT64, [1], [-1])
+    container.add_initializer(forma_uscita, TensorProto.INT64, [2], [-1, colonne])
+
+    # Le risposte di tutte le colonne vengono codificate insieme come vettore piatto
+    piatto = scope.get_unique_variable_name('si_no_piatto')
+    codici = scope.get_unique_variable_name('si_no_codici')
+    container.add_node('Reshape', [operator.inputs[0].full_name, forma_piatta], piatto,
+                       name=scope.get_unique_operator_name('Reshape'))
+    container.add_node('LabelEncoder', [piatto], codici, op_domain='ai.onnx.ml', op_version=2,
+                       keys_strings=list(VARIANTI_SI_NO), values_floats=[float(v) for v in VARIANTI_SI_NO.values()],
+                       default_float=float('nan'), name=scope.get_unique_operator_name('LabelEncoder'))
+    container.add_node('Reshape', [codici, forma_uscita], operator.outputs[0].full_name,
+                       name=scope.get_unique_operator_name('Reshape'))
+
+
+def registra_convertitore():
+    """Registra in skl2onnx il convertitore di CodificaSiNo"""
+    from skl2onnx import update_registered_converter
+
+    update_registered_converter(CodificaSiNo, "PersoCodificaSiNo",
+                                _forma_codifica_si_no, _converti_codifica_si_no)
+
+
+def tipi_input():
+    """Tipi degli input del grafo completo: uno per colonna del questionario"""
+    from skl2onnx.common.data_types import FloatTensorType, StringTensorType
+
+    return [(colonna, StringTensorType([None, 1]) if colonna in COLONNE_SI_NO else FloatTensorType([None, 1]))
+            for colonna in COLONNE_FEATURE]
+
+
+def input_onnx(df):
+    """Prepara il dizionario di input del grafo completo da un DataFrame con i campi grezzi"""
+    return {
+        colonna: (df[colonna].astype(str).to_numpy(dtype=object) if colonna in COLONNE_SI_NO
+                  else df[colonna].to_numpy(dtype=np.float32)).reshape(-1, 1)
+        for colonna in COLONNE_FEATURE
+    }
+
+
+def esporta_pipeline_onnx(pipeline, nome_file=FILE_ONNX_COMPLETO):
+    """Esporta la pipeline completa in un unico grafo ONNX con le stesse opzioni del modello semplice"""
+    from skl2onnx import convert_sklearn
+
+    registra_convertitore()
+    onnx_model = convert_sklearn(
+        pipeline,
+        initial_types=tipi_input(),
+        options={id(pipeline.named_steps['classificatore']): {"zipmap": False, "output_class_labels": True}},
+        target_opset={'': 15, 'ai.onnx.ml': 2}
+    )
+    with open(nome_file, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+    return onnx_model
+
+
+def verifica_parita_pipeline(pipeline, nome_file_onnx, df_test, tolleranza=1e-4):
+    """
+    Confronta previsioni e probabilità di pipeline e grafo ONNX sulle righe di test valide,
+    cioè senza valori mancanti o risposte Sì/No non riconosciute.
+
+    Returns:
+        dict: righe, righe scartate, classi diverse e massima differenza di probabilità
+    """
+    import onnxruntime as ort
+
+    valide = ~np.isnan(pipeline.named_steps['preprocessing'].transform(df_test[COLONNE_FEATURE])).any(axis=1)
+    scartate = int(np.sum(~valide))
+    df_test = df_test[valide]
+    session = ort.InferenceSession(nome_file_onnx)
+    etichette_onnx, prob_onnx = session.run(['label', 'probabilities'], input_onnx(df_test))
+
+    etichette = pipeline.predict(df_test[COLONNE_FEATURE])
+    probabilita = pipeline.predict_proba(df_test[COLONNE_FEATURE])
+    differenza = float(np.max(np.abs(probabilita - prob_onnx))) if len(df_test) else 0.0
+
+    # Con probabilità a pari merito (ad esempio 0.5/0.5 in una foresta) l'arrotondamento
+    # float32 di ONNX può scegliere l'altra classe: questi casi sono contati a parte
+    diverse = etichette.astype(str) != np.asarray(etichette_onnx).astype(str)
+    ordinate = np.sort(probabilita, axis=1)
+    pareggio = (ordinate[:, -1] - ordinate[:, -2]) <= 2 * tolleranza
+    classi_diverse = int(np.sum(diverse & ~pareggio))
+    return {
+        'righe': len(df_test),
+        'righe_scartate': scartate,
+        'classi_diverse': classi_diverse,
+        'pareggi_risolti_diversamente': int(np.sum(diverse & pareggio)),
+        'differenza_probabilita_max': differenza,
+        'ok': classi_diverse == 0 and differenza <= tolleranza,
+    }
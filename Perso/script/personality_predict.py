@@ -0,0 +1,161 @@
+"""
+Predittore leggero del tipo di personalità, solo per l'inferenza.
+
+Dipende da NumPy e, per i modelli .onnx, da onnxruntime: non importa pandas né scikit-learn
+e non addestra nulla, quindi parte in una frazione del tempo di personality_predictor.py.
+Il modello viene caricato una sola volta, alla prima previsione, e può essere:
+- un modello ONNX (.onnx), ad esempio modello_personalita.onnx o la versione ottimizzata;
+- la cartella della foresta NumPy (personality_numpy_forest.py);
+- la tabella precalcolata (.bin, personality_lookup.py).
+
+Le risposte si passano come argomenti oppure una riga per volta sullo standard input,
+separate da spazi, virgole o punti e virgola, nell'ordine delle colonne del dataset:
+
+    python personality_predict.py 4 No 6 5 No 9 5
+    cat risposte.txt | python personality_predict.py --json
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from personality_features import COLONNE_FEATURE, COLONNE_SI_NO, MAPPA_SI_NO
+
+SEPARATORI = re.compile(r"[\s,;]+")
+INDICI_SI_NO = {COLONNE_FEATURE.index(colonna) for colonna in COLONNE_SI_NO}
+MASSIMO_FLOAT32 = float(np.finfo(np.float32).max)
+
+
+def valori_da_campi(campi):
+    """Converte i campi di una riga di risposte nel vettore float32 atteso dal modello"""
+    if len(campi) != len(COLONNE_FEATURE):
+        raise ValueError(f"Servono {len(COLONNE_FEATURE)} valori ({', '.join(COLONNE_FEATURE)}), ricevuti {len(campi)}")
+    valori = np.empty(len(COLONNE_FEATURE), dtype=np.float32)
+    for i, campo in enumerate(campi):
+        if i in INDICI_SI_NO:
+            risposta = campo.strip().lower()
+            if risposta not in MAPPA_SI_NO:
+                raise ValueError(f"{COLONNE_FEATURE[i]}: risposta non riconosciuta '{campo}'")
+            valori[i] = MAPPA_SI_NO[risposta]
+        else:
+            try:
+                numero = float(campo)
+            except ValueError:
+                raise ValueError(f"{COLONNE_FEATURE[i]}: valore non numerico '{campo}'") from None
+            # nan e inf darebbero probabilità NaN (JSON non valido) e valori oltre float32 diventerebbero inf
+            if not np.isfinite(numero) or abs(numero) > MASSIMO_FLOAT32:
+                raise ValueError(f"{COLONNE_FEATURE[i]}: valore non finito '{campo}'")
+            valori[i] = numero
+    return valori
+
+
+class PredittoreLeggero:
+    """
+    Carica pigramente il modello alla prima previsione e lo riusa per tutte le successive.
+    """
+    def __init__(self, percorso="modello_personalita.onnx"):
+        self.percorso = percorso
+        self.classi = None
+        self._predici = None
+
+    def _carica(self):
+        """Sceglie il motore di inferenza in base al tipo di artefatto"""
+        if not os.path.exists(self.percorso):
+            raise FileNotFoundError(f"Il modello '{self.percorso}' non esiste.")
+
+        if os.path.isdir(self.percorso):
+            from personality_numpy_forest import ForestaNumPy
+
+            motore = ForestaNumPy(self.percorso)
+            self.classi, self._predici = list(motore.classi), motore.predici
+        elif self.percorso.endswith(".bin"):
+            from personality_lookup import TabellaPrevisioni
+
+            motore = TabellaPrevisioni(self.percorso)
+            self.classi, self._predici = list(motore.classi), motore.predici
+        else:
+            import onnxruntime as ort
+
+            session = ort.InferenceSession(self.percorso, providers=["CPUExecutionProvider"])
+            nome_input = session.get_inputs()[0].name
+            nomi_output = [output.name for output in session.get_outputs()]
+            if 'class_labels' in nomi_output:
+                vuoto = np.zeros((1, len(COLONNE_FEATURE)), dtype=np.float32)
+                self.classi = [str(c) for c in session.run(['class_labels'], {nome_input: vuoto})[0]]
+
+            def predici(X):
+                etichette, probabilita = session.run(nomi_output[:2], {nome_input: X})
+                return np.asarray(etichette), np.asarray(probabilita)
+            self._predici = predici
+
+    def predici(self, X):
+        """Restituisce etichette e probabilità per la matrice float32 delle risposte"""
+        if self._predici is None:
+            self._carica()
+        etichette, probabilita = self._predici(np.asarray(X, dtype=np.float32).reshape(-1, len(COLONNE_FEATURE)))
+        if self.classi is None:
+            self.classi = [str(i) for i in range(probabilita.shape[1])]
+        return etichette, probabilita
+
+
+def formatta(etichetta, probabilita, classi, come_json=False):
+    """Formatta una previsione come testo tabulato o come oggetto JSON su una riga"""
+    if come_json:
+        return json.dumps({'previsione': str(etichetta),
+                           'probabilita': {c: round(float(p), 6) for c, p in zip(classi, probabilita)}},
+                          ensure_ascii=False)
+    return "\t".join([str(etichetta)] + [f"{c}={p:.4f}" for c, p in zip(classi, probabilita)])
+
+
+def ciclo_stdin(predittore, come_json=False, ingresso=sys.stdin, uscita=sys.stdout):
+    """
+    Risponde a una riga di risposte per volta finché lo standard input resta aperto.
+    Le righe non valide producono un errore su stderr senza interrompere il ciclo.
+
+    Returns:
+        int: numero di righe non valide
+    """
+    errori = 0
+    for riga in ingresso:
+        campi = [campo for campo in SEPARATORI.split(riga.strip()) if campo]
+        if not campi:
+            continue
+        try:
+            etichette, probabilita = predittore.predici(valori_da_campi(campi))
+        except ValueError as e:
+            errori += 1
+            print(f"[ERRORE] {e}", file=sys.stderr, flush=True)
+            continue
+        print(formatta(etichette[0], probabilita[0], predittore.classi, come_json), file=uscita, flush=True)
+    return errori
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Previsione leggera del tipo di personalità (solo inferenza).")
+    parser.add_argument("valori", nargs="*",
+                        help=f"Risposte nell'ordine {' '.join(COLONNE_FEATURE)}. Senza valori legge le righe dallo stdin.")
+    parser.add_argument("--modello", "-m", default="modello_personalita.onnx",
+                        help="Modello ONNX, cartella della foresta NumPy o tabella .bin. Predefinito: modello_personalita.onnx.")
+    parser.add_argument("--json", action="store_true", help="Scrive ogni previsione come oggetto JSON.")
+    args = parser.parse_args()
+
+    predittore = PredittoreLeggero(args.modello)
+    try:
+        if not args.valori:
+            return 1 if ciclo_stdin(predittore, args.json) else 0
+
+        etichette, probabilita = predittore.predici(valori_da_campi(args.valori))
+        print(formatta(etichette[0], probabilita[0], predittore.classi, args.json))
+    except (OSError, ValueError) as e:
+        print(f"[ERRORE] {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,13 @@ from sklearn.metrics import accuracy_score, classification_report, confusion_mat
 from sklearn.preprocessing import LabelEncoder
 import joblib
 import os
+import csv
+import time
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime
 
 # Aggiunta per ONNX
 try:
@@ -20,6 +27,37 @@ except ImportError:
     ONNX_AVAILABLE = False
     print("[ATTENZIONE] skl2onnx o onnxruntime non installati. L'esportazione ONNX non sarà disponibile.")
 
+# Modelli candidati: sigla per la riga di comando -> (nome, costruttore)
+MODELLI_DISPONIBILI = {
+    'rf': ('Random Forest', lambda seed: RandomForestClassifier(n_estimators=100, random_state=seed)),
+    'lr': ('Logistic Regression', lambda seed: LogisticRegression(random_state=seed, max_iter=1000)),
+    'svm': ('SVM', lambda seed: SVC(random_state=seed, probability=True)),
+}
+
+# Iperparametri esplorati dalla selezione con validazione incrociata
+GRIGLIE_IPERPARAMETRI = {
+    'rf': {
+        'n_estimators': [100, 300],
+        'max_depth': [None, 8, 16],
+        'min_samples_leaf': [1, 4],
+        'max_features': ['sqrt', None],
+    },
+    'lr': {
+        'C': [0.01, 0.1, 1.0, 10.0, 100.0],
+    },
+    'svm': {
+        'C': [0.1, 1.0, 10.0],
+        'gamma': ['scale', 0.01, 0.1],
+    },
+}
+
+# Nomi dei file prodotti dall'addestramento
+FILE_MODELLO = "modello_personalita.pkl"
+FILE_ONNX = "modello_personalita.onnx"
+FILE_INFO = "info_modello.txt"
+FILE_MANIFEST = "manifest_addestramento.json"
+FILE_TEMPI_SELEZIONE = "tempi_selezione.csv"
+
 def carica_dati_da_file():
     """Carica i dati da un file CSV"""
     while True:
@@ -59,6 +97,18 @@ def carica_dati_da_file():
         if riprova.lower() not in ['si', 'sì', 's', 'yes', 'y']:
             return None
 
+def carica_dati_da_percorso(percorso_file):
+    """Carica i dati da un file CSV senza interazione, sollevando un'eccezione in caso di errore"""
+    if not os.path.exists(percorso_file):
+        raise FileNotFoundError(f"Il file '{percorso_file}' non esiste.")
+    
+    df = pd.read_csv(percorso_file)
+    if 'Personality' not in df.columns:
+        raise ValueError(f"Il file deve contenere una colonna 'Personality' (colonne trovate: {list(df.columns)})")
+    
+    print(f"Dataset caricato con successo: {df.shape[0]} righe, {df.shape[1]} colonne")
+    return df
+
 def preprocessa_dati(df):
     """Preprocessa i dati per il machine learning"""
     # Copia del dataframe
@@ -91,17 +141,16 @@ def preprocessa_dati(df):
     
     return X, y
 
-def addestra_modelli(X, y):
+def addestra_modelli(X, y, test_size=0.2, random_state=42, sigle_modelli=None):
     """Addestra diversi modelli di machine learning"""
     # Dividi i dati in training e test
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
     
     # Definisci i modelli
-    modelli = {
-        'Random Forest': RandomForestClassifier(n_estimators=100, random_state=42),
-        'Logistic Regression': LogisticRegression(random_state=42, max_iter=1000),
-        'SVM': SVC(random_state=42, probability=True)
-    }
+    modelli = {}
+    for sigla in (sigle_modelli or MODELLI_DISPONIBILI):
+        nome, costruttore = MODELLI_DISPONIBILI[sigla]
+        modelli[nome] = costruttore(random_state)
     
     risultati = {}
     
@@ -139,6 +188,113 @@ def addestra_modelli(X, y):
     
     return miglior_modello, risultati, X_train, X_test, y_train, y_test
 
+def seleziona_modello_cv(X, y, test_size=0.2, random_state=42, sigle_modelli=None,
+                         fold=5, processi=-1, file_tempi=None):
+    """
+    Seleziona modello e iperparametri con validazione incrociata a k fold.
+    Per ogni modello le configurazioni sono valutate in parallelo su tutti i core con
+    successive halving: a ogni turno solo il terzo migliore prosegue con più campioni.
+    """
+    # Import ritardato: la ricerca a dimezzamenti è ancora sperimentale in scikit-learn
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV, StratifiedKFold, ParameterGrid
+    
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+    divisione = StratifiedKFold(n_splits=fold, shuffle=True, random_state=random_state)
+    
+    risultati = {}
+    tempi_candidati = []
+    
+    print(f"\n=== SELEZIONE MODELLI ({fold}-fold CV, successive halving) ===")
+    for sigla in (sigle_modelli or MODELLI_DISPONIBILI):
+        nome, costruttore = MODELLI_DISPONIBILI[sigla]
+        ricerca = HalvingGridSearchCV(costruttore(random_state), GRIGLIE_IPERPARAMETRI[sigla],
+                                      cv=divisione, factor=3, scoring='accuracy',
+                                      n_jobs=processi, random_state=random_state)
+        
+        print(f"\nRicerca {nome}: {len(ParameterGrid(GRIGLIE_IPERPARAMETRI[sigla]))} configurazioni...")
+        inizio = time.perf_counter()
+        ricerca.fit(X_train, y_train)
+        durata = time.perf_counter() - inizio
+        
+        y_pred = ricerca.best_estimator_.predict(X_test)
+        accuratezza = accuracy_score(y_test, y_pred)
+        risultati[nome] = {
+            'modello': ricerca.best_estimator_,
+            'accuratezza': accuratezza,
+            'accuratezza_cv': ricerca.best_score_,
+            'dev_std_cv': float(ricerca.cv_results_['std_test_score'][ricerca.best_index_]),
+            'parametri': ricerca.best_params_,
+            'secondi': durata,
+            'y_test': y_test,
+            'y_pred': y_pred
+        }
+        tempi_candidati.extend(_tempi_per_candidato(nome, ricerca.cv_results_, fold))
+        
+        print(f"Turni: {ricerca.n_iterations_}, campioni per turno: {ricerca.n_resources_}")
+        print(f"Migliori parametri: {ricerca.best_params_}")
+        print(f"Accuratezza CV: {ricerca.best_score_:.4f}, sul test: {accuratezza:.4f} ({durata:.1f} s)")
+    
+    stampa_tempi_candidati(tempi_candidati)
+    if file_tempi:
+        with open(file_tempi, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(tempi_candidati[0]))
+            writer.writeheader()
+            writer.writerows(tempi_candidati)
+        print(f"💾 Tempi per candidato salvati in: {file_tempi}")
+    
+    # A parità di accuratezza CV vince il modello più stabile tra i fold, poi il più veloce:
+    # il test set serve solo per il report finale
+    miglior_modello_nome = max(risultati.keys(), key=lambda x: (risultati[x]['accuratezza_cv'],
+                                                               -risultati[x]['dev_std_cv'], -risultati[x]['secondi']))
+    miglior_modello = risultati[miglior_modello_nome]['modello']
+    
+    print(f"\n🏆 Miglior modello: {miglior_modello_nome} (Accuratezza CV: {risultati[miglior_modello_nome]['accuratezza_cv']:.4f})")
+    print("Classification Report sul test:")
+    print(classification_report(y_test, risultati[miglior_modello_nome]['y_pred']))
+    
+    return miglior_modello, risultati, X_train, X_test, y_train, y_test
+
+def _tempi_per_candidato(nome_modello, cv_results, fold):
+    """Riassume i turni di successive halving per ogni configurazione candidata"""
+    candidati = {}
+    for i, parametri in enumerate(cv_results['params']):
+        chiave = json.dumps(parametri, sort_keys=True, default=str)
+        voce = candidati.setdefault(chiave, {
+            'modello': nome_modello,
+            'parametri': chiave,
+            'turni': 0,
+            'campioni_ultimo_turno': 0,
+            'accuratezza_cv': 0.0,
+            'secondi_addestramento': 0.0,
+            'secondi_valutazione': 0.0,
+        })
+        voce['turni'] += 1
+        voce['campioni_ultimo_turno'] = int(cv_results['n_resources'][i])
+        voce['accuratezza_cv'] = round(float(cv_results['mean_test_score'][i]), 4)
+        # I tempi di cv_results sono medie sui fold
+        voce['secondi_addestramento'] += float(cv_results['mean_fit_time'][i]) * fold
+        voce['secondi_valutazione'] += float(cv_results['mean_score_time'][i]) * fold
+    
+    for voce in candidati.values():
+        voce['secondi_addestramento'] = round(voce['secondi_addestramento'], 4)
+        voce['secondi_valutazione'] = round(voce['secondi_valutazione'], 4)
+    return list(candidati.values())
+
+def stampa_tempi_candidati(tempi_candidati, massimo=15):
+    """Stampa i candidati che hanno raggiunto i turni finali con i relativi tempi"""
+    ordinati = sorted(tempi_candidati, key=lambda v: (-v['turni'], -v['accuratezza_cv']))
+    print(f"\n⏱️  TEMPI PER CANDIDATO (primi {min(massimo, len(ordinati))} di {len(ordinati)}):")
+    print(f"{'Modello':<20} {'Turni':>5} {'Campioni':>9} {'Acc. CV':>8} {'Fit (s)':>9} {'Score (s)':>9}  Parametri")
+    for voce in ordinati[:massimo]:
+        print(f"{voce['modello']:<20} {voce['turni']:>5} {voce['campioni_ultimo_turno']:>9} "
+              f"{voce['accuratezza_cv']:>8.4f} {voce['secondi_addestramento']:>9.3f} "
+              f"{voce['secondi_valutazione']:>9.3f}  {voce['parametri']}")
+    
+    for nome in dict.fromkeys(v['modello'] for v in tempi_candidati):
+        totale = sum(v['secondi_addestramento'] + v['secondi_valutazione'] for v in tempi_candidati if v['modello'] == nome)
+        print(f"  Tempo CPU totale {nome}: {totale:.1f} s")
+
 def esporta_modello_onnx(modello, X, nome_file="modello_personalita.onnx"):
     """Esporta il modello in formato ONNX con opzioni ottimizzate per Kotlin"""
     if not ONNX_AVAILABLE:
@@ -193,6 +349,42 @@ def esporta_modello_onnx(modello, X, nome_file="modello_personalita.onnx"):
         traceback.print_exc()
         return False, None
 
+def esporta_pipeline_completa(modello, df, test_size=0.2, random_state=42, cartella_output="."):
+    """
+    Addestra la pipeline preprocessing + modello sugli stessi dati del modello scelto,
+    la esporta come unico grafo ONNX che riceve i campi grezzi e verifica la parità
+    con scikit-learn su tutto il test set.
+    
+    Returns:
+        dict: esito della verifica di parità (None se ONNX non è disponibile)
+    """
+    if not ONNX_AVAILABLE:
+        print("[ERRORE] Librerie ONNX non disponibili")
+        return None
+    
+    from personality_pipeline import (COLONNE_FEATURE, FILE_PIPELINE, FILE_ONNX_COMPLETO,
+                                      costruisci_pipeline, esporta_pipeline_onnx, verifica_parita_pipeline)
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[COLONNE_FEATURE], df['Personality'], test_size=test_size, random_state=random_state, stratify=df['Personality'])
+    
+    print(f"\n📦 Esportazione pipeline completa (preprocessing + {type(modello).__name__})...")
+    pipeline = costruisci_pipeline(modello).fit(X_train, y_train)
+    joblib.dump(pipeline, os.path.join(cartella_output, FILE_PIPELINE))
+    percorso_onnx = os.path.join(cartella_output, FILE_ONNX_COMPLETO)
+    esporta_pipeline_onnx(pipeline, percorso_onnx)
+    print(f"✅ Grafo completo esportato: {percorso_onnx} (input: {', '.join(COLONNE_FEATURE)})")
+    
+    esito = verifica_parita_pipeline(pipeline, percorso_onnx, X_test)
+    simbolo = "✅" if esito['ok'] else "⚠️ "
+    print(f"{simbolo} Parità sklearn/ONNX su {esito['righe']} righe di test: "
+          f"{esito['classi_diverse']} classi diverse, differenza massima di probabilità {esito['differenza_probabilita_max']:.2e}")
+    if esito['righe_scartate']:
+        print(f"   ({esito['righe_scartate']} righe con valori mancanti o risposte non riconosciute escluse dal confronto)")
+    if esito['pareggi_risolti_diversamente']:
+        print(f"   ({esito['pareggi_risolti_diversamente']} righe a pari merito risolte in modo diverso)")
+    return esito
+
 def testa_modello_onnx(nome_file="modello_personalita.onnx", classi_modello=None):
     """Testa il modello ONNX per verificare l'output"""
     if not ONNX_AVAILABLE:
@@ -327,17 +519,47 @@ def converti_risposta_questionario(risposte):
     
     return dati_convertiti
 
-def prevedi_personalita(modello, dati_utente):
-    """Fai una previsione sulla personalità dell'utente"""
-    # Converti in DataFrame
-    df_utente = pd.DataFrame([dati_utente])
+def carica_tabella_previsioni(modello, percorso="tabella_personalita.bin"):
+    """Carica la tabella precalcolata delle previsioni, se esiste ed è coerente con il modello"""
+    if not os.path.exists(percorso):
+        return None
+    
+    try:
+        from personality_lookup import TabellaPrevisioni
+        tabella = TabellaPrevisioni(percorso)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"[ATTENZIONE] Tabella delle previsioni non utilizzabile: {e}")
+        return None
     
-    # Fai la previsione
-    previsione = modello.predict(df_utente)[0]
-    probabilita = modello.predict_proba(df_utente)[0]
+    if tabella.verifica(modello) < 1.0:
+        print("[ATTENZIONE] La tabella delle previsioni non corrisponde al modello addestrato.")
+        print("   Ricostruiscila con: python personality_lookup.py costruisci")
+        return None
     
-    # Ottieni le classi
-    classi = modello.classes_
+    print(f"⚡ Tabella delle previsioni caricata: {percorso}")
+    return tabella
+
+def prevedi_personalita(modello, dati_utente, tabella=None):
+    """Fai una previsione sulla personalità dell'utente"""
+    previsione = None
+    if tabella is not None:
+        # Lettura diretta dalla tabella; le risposte fuori dal questionario passano al modello
+        try:
+            previsione, probabilita = tabella.prevedi(dati_utente)
+            classi = tabella.classi
+        except (ValueError, KeyError):
+            previsione = None
+    
+    if previsione is None:
+        # Converti in DataFrame
+        df_utente = pd.DataFrame([dati_utente])
+        
+        # Fai la previsione
+        previsione = modello.predict(df_utente)[0]
+        probabilita = modello.predict_proba(df_utente)[0]
+        
+        # Ottieni le classi
+        classi = modello.classes_
     
     print(f"\n🔮 PREVISIONE PERSONALITÀ:")
     print(f"Tipo di personalità previsto: {previsione}")
@@ -420,6 +642,165 @@ def salva_info_modello(modello, classi_modello, nome_file="info_modello.txt"):
     except Exception as e:
         print(f"[ERRORE] Impossibile salvare info modello: {e}")
 
+def calcola_hash_file(percorso_file):
+    """Calcola lo SHA-256 di un file leggendolo a blocchi"""
+    sha = hashlib.sha256()
+    with open(percorso_file, 'rb') as f:
+        for blocco in iter(lambda: f.read(1 << 20), b''):
+            sha.update(blocco)
+    return sha.hexdigest()
+
+def artefatti_aggiornati(cartella_output, hash_dataset, configurazione):
+    """Restituisce il manifest se gli artefatti salvati corrispondono a dataset e configurazione"""
+    percorso_manifest = os.path.join(cartella_output, FILE_MANIFEST)
+    try:
+        with open(percorso_manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    
+    if manifest.get('hash_dataset') != hash_dataset or manifest.get('configurazione') != configurazione:
+        return None
+    if not all(os.path.exists(os.path.join(cartella_output, nome)) for nome in manifest.get('artefatti', [])):
+        return None
+    return manifest
+
+def addestra_da_csv(percorso_csv, cartella_output=".", test_size=0.2, random_state=42,
+                    sigle_modelli=None, esporta_onnx=True, forza=False, fold=None, processi=-1,
+                    ottimizza_onnx=False):
+    """
+    Addestra i modelli da un file CSV senza interazione e salva gli artefatti nella cartella di output.
+    Con fold impostato il modello è scelto con validazione incrociata e ricerca degli iperparametri.
+    Con ottimizza_onnx viene salvata anche la versione compattata e ottimizzata del modello ONNX.
+    Se il manifest indica che dataset e configurazione non sono cambiati, l'addestramento viene saltato.
+    
+    Returns:
+        tuple: (miglior modello, manifest)
+    """
+    configurazione = {
+        'test_size': test_size,
+        'random_state': random_state,
+        'modelli': [sigla for sigla in MODELLI_DISPONIBILI if sigla in (sigle_modelli or MODELLI_DISPONIBILI)],
+        'onnx': bool(esporta_onnx and ONNX_AVAILABLE),
+        'fold': fold,
+        'pipeline_completa': bool(esporta_onnx and ONNX_AVAILABLE),
+        'onnx_ottimizzato': bool(ottimizza_onnx and esporta_onnx and ONNX_AVAILABLE),
+    }
+    hash_dataset = calcola_hash_file(percorso_csv)
+    os.makedirs(cartella_output, exist_ok=True)
+    percorso_modello = os.path.join(cartella_output, FILE_MODELLO)
+    
+    manifest = None if forza else artefatti_aggiornati(cartella_output, hash_dataset, configurazione)
+    if manifest:
+        print(f"♻️  Artefatti già aggiornati per questo dataset e configurazione (addestrati il {manifest['data']})")
+        return joblib.load(percorso_modello), manifest
+    
+    df = carica_dati_da_percorso(percorso_csv)
+    X, y = preprocessa_dati(df)
+    artefatti = [FILE_MODELLO, FILE_INFO]
+    if fold:
+        miglior_modello, risultati, X_train, X_test, y_train, y_test = seleziona_modello_cv(
+            X, y, test_size, random_state, configurazione['modelli'], fold, processi,
+            os.path.join(cartella_output, FILE_TEMPI_SELEZIONE))
+        artefatti.append(FILE_TEMPI_SELEZIONE)
+    else:
+        miglior_modello, risultati, X_train, X_test, y_train, y_test = addestra_modelli(
+            X, y, test_size, random_state, configurazione['modelli'])
+    
+    joblib.dump(miglior_modello, percorso_modello)
+    print(f"\n💾 Modello salvato come '{percorso_modello}'")
+    
+    if configurazione['onnx']:
+        percorso_onnx = os.path.join(cartella_output, FILE_ONNX)
+        onnx_success, _ = esporta_modello_onnx(miglior_modello, X, percorso_onnx)
+        if not onnx_success:
+            raise RuntimeError("Esportazione ONNX non riuscita")
+        artefatti.append(FILE_ONNX)
+        
+        esito = esporta_pipeline_completa(miglior_modello, df, test_size, random_state, cartella_output)
+        if not esito or not esito['ok']:
+            raise RuntimeError("La pipeline ONNX completa non corrisponde al modello scikit-learn")
+        from personality_pipeline import FILE_PIPELINE, FILE_ONNX_COMPLETO
+        artefatti.extend([FILE_PIPELINE, FILE_ONNX_COMPLETO])
+    
+    if configurazione['onnx_ottimizzato']:
+        from personality_onnx_optimizer import FILE_ONNX_OTTIMIZZATO, FILE_REPORT_OTTIMIZZAZIONE, ottimizza_modello_onnx
+        
+        print(f"\n🛠️  Ottimizzazione del modello ONNX...")
+        ottimizza_modello_onnx(percorso_onnx, X_test.to_numpy(dtype=np.float32), y_test.to_numpy(), cartella_output)
+        artefatti.extend([FILE_ONNX_OTTIMIZZATO, FILE_REPORT_OTTIMIZZAZIONE])
+    if isinstance(miglior_modello, RandomForestClassifier):
+        from personality_numpy_forest import CARTELLA_FORESTA, ForestaNumPy, esporta_foresta, verifica_foresta
+        
+        # Foresta in array NumPy per gli host che non devono importare scikit-learn
+        cartella_foresta = os.path.join(cartella_output, CARTELLA_FORESTA)
+        metadati = esporta_foresta(miglior_modello, cartella_foresta, list(X.columns))
+        esito = verifica_foresta(miglior_modello, ForestaNumPy(cartella_foresta), X_test.to_numpy(dtype=np.float32))
+        if not esito['ok']:
+            raise RuntimeError("La foresta NumPy non corrisponde al modello scikit-learn")
+        print(f"🌲 Foresta NumPy salvata in: {cartella_foresta} ({metadati['nodi']:,} nodi, parità verificata su {esito['righe']} righe)")
+        artefatti.append(CARTELLA_FORESTA)
+    salva_info_modello(miglior_modello, miglior_modello.classes_, os.path.join(cartella_output, FILE_INFO))
+    
+    nome_migliore = next(nome for nome, r in risultati.items() if r['modello'] is miglior_modello)
+    manifest = {
+        'hash_dataset': hash_dataset,
+        'dataset': os.path.abspath(percorso_csv),
+        'configurazione': configurazione,
+        'miglior_modello': nome_migliore,
+        'accuratezze': {nome: r['accuratezza'] for nome, r in risultati.items()},
+        'parametri': {nome: r['parametri'] for nome, r in risultati.items() if 'parametri' in r},
+        'classi': [str(c) for c in miglior_modello.classes_],
+        'artefatti': artefatti,
+        'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(os.path.join(cartella_output, FILE_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    print(f"📋 Manifest salvato in: {os.path.join(cartella_output, FILE_MANIFEST)}")
+    
+    return miglior_modello, manifest
+
+def main_batch(argv=None):
+    """Punto di ingresso non interattivo, pensato per i job pianificati"""
+    parser = argparse.ArgumentParser(description="Addestra il modello di previsione della personalità da un file CSV.")
+    parser.add_argument("csv", help="File CSV con le risposte e la colonna 'Personality'.")
+    parser.add_argument("--output-dir", "-o", default=".",
+                        help="Cartella in cui salvare modello, ONNX, info e manifest. Predefinito: cartella corrente.")
+    parser.add_argument("--test-size", type=float, default=0.2,
+                        help="Frazione del dataset usata per il test. Predefinito: 0.2.")
+    parser.add_argument("--seed", type=int, default=42, help="Seme casuale. Predefinito: 42.")
+    parser.add_argument("--modelli", nargs="+", choices=list(MODELLI_DISPONIBILI), default=list(MODELLI_DISPONIBILI),
+                        help="Modelli candidati. Predefinito: tutti.")
+    parser.add_argument("--no-onnx", action="store_true", help="Non esportare il modello in ONNX.")
+    parser.add_argument("--ottimizza-onnx", action="store_true",
+                        help="Salva anche il modello ONNX compattato e ottimizzato, con il report di confronto.")
+    parser.add_argument("--cv", type=int, metavar="FOLD",
+                        help="Seleziona modello e iperparametri con validazione incrociata a FOLD fold "
+                             "e successive halving, invece del singolo split.")
+    parser.add_argument("--processi", "-j", type=int, default=-1,
+                        help="Processi per la selezione con --cv. Predefinito: tutti i core.")
+    parser.add_argument("--forza", action="store_true",
+                        help="Riaddestra anche se esistono artefatti per lo stesso dataset e configurazione.")
+    parser.add_argument("--fuori-memoria", choices=["sgd", "reservoir"],
+                        help="Legge il CSV a blocchi senza caricarlo in memoria: SGDClassifier incrementale oppure "
+                             "campione reservoir addestrato con il primo dei --modelli "
+                             "(opzioni avanzate in personality_incremental_training.py).")
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.fuori_memoria:
+            from personality_incremental_training import addestra_incrementale
+            
+            addestra_incrementale(args.csv, args.output_dir, args.test_size, args.seed, args.fuori_memoria,
+                                  sigla_modello=args.modelli[0], esporta_onnx=not args.no_onnx)
+            return 0
+        addestra_da_csv(args.csv, args.output_dir, args.test_size, args.seed,
+                        args.modelli, not args.no_onnx, args.forza, args.cv, args.processi, args.ottimizza_onnx)
+    except (OSError, ValueError, RuntimeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+    return 0
+
 def main():
     """Funzione principale"""
     print("🧠 SISTEMA DI PREVISIONE PERSONALITÀ")
@@ -451,6 +832,9 @@ def main():
             # Confronta predizioni
             confronta_predizioni_sklearn_onnx(miglior_modello)
         
+        # Grafo unico con il preprocessing, che riceve direttamente le risposte Sì/No
+        esporta_pipeline_completa(miglior_modello, df)
+        
         # Salva informazioni per Kotlin
         salva_info_modello(miglior_modello, classi_modello)
         
@@ -461,6 +845,9 @@ def main():
         print("\n📋 ONNX non disponibile, ma salvo le informazioni del modello...")
         salva_info_modello(miglior_modello, miglior_modello.classes_)
     
+    # Tabella precalcolata per le risposte del questionario (personality_lookup.py)
+    tabella = carica_tabella_previsioni(miglior_modello)
+    
     # Menu interattivo
     while True:
         print("\n" + "="*60)
@@ -476,11 +863,11 @@ def main():
         if scelta == '1':
             dati_utente = questionario_e_previsione()
             if dati_utente:
-                prevedi_personalita(miglior_modello, dati_utente)
+                prevedi_personalita(miglior_modello, dati_utente, tabella)
         
         elif scelta == '2':
             dati_manuali = input_dati_manuali()
-            prevedi_personalita(miglior_modello, dati_manuali)
+            prevedi_personalita(miglior_modello, dati_manuali, tabella)
         
         elif scelta == '3':
             if onnx_success:
@@ -502,4 +889,7 @@ def main():
             print("❌ Scelta non valida!")
 
 if __name__ == "__main__":
+    # Con argomenti: addestramento non interattivo; senza: menu interattivo
+    if len(sys.argv) > 1:
+        sys.exit(main_batch())
     main()
\ No newline at end of file
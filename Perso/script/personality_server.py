@@ -0,0 +1,405 @@
+"""
+Server locale di inferenza per il modello di personalità, via HTTP o socket Unix.
+
+Il server tiene aperta una sola sessione del modello. Le richieste concorrenti vengono
+raccolte da un thread dedicato in micro-batch (entro una piccola finestra di tempo) e
+valutate con una sola chiamata al modello. GET /stats espone latenze e throughput.
+
+Esempi:
+    python personality_server.py serve --modello modello_personalita.onnx --porta 8765
+    python personality_server.py serve --socket /tmp/personalita.sock
+    python personality_server.py carico --url http://127.0.0.1:8765 --client 16 --richieste 2000
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import random
+import argparse
+import threading
+import http.client
+import socketserver
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from personality_batch_scoring import carica_predittore
+from personality_features import COLONNE_FEATURE, COLONNE_SI_NO, MAPPA_SI_NO
+
+MASSIMO_FLOAT32 = float(np.finfo(np.float32).max)
+
+# Valori massimi delle risposte del questionario, usati dal generatore di carico
+MASSIMI_QUESTIONARIO = (11, 1, 10, 7, 1, 15, 10)
+
+
+def riga_da_json(voce):
+    """
+    Converte un'istanza JSON (lista di 7 numeri o dizionario con le colonne del dataset) in una riga.
+    Valori NaN, infiniti o fuori dal range float32 sollevano ValueError (risposta 400).
+    """
+    if isinstance(voce, dict):
+        riga = []
+        for colonna in COLONNE_FEATURE:
+            valore = voce[colonna]
+            if colonna in COLONNE_SI_NO and isinstance(valore, str):
+                valore = MAPPA_SI_NO[valore.strip().lower()]
+            riga.append(float(valore))
+    else:
+        if len(voce) != len(COLONNE_FEATURE):
+            raise ValueError(f"Ogni istanza deve avere {len(COLONNE_FEATURE)} valori")
+        riga = [float(valore) for valore in voce]
+
+    # nan e inf darebbero probabilità NaN (JSON non valido) e valori oltre float32 diventerebbero inf
+    if not (np.isfinite(riga) & (np.abs(riga) <= MASSIMO_FLOAT32)).all():
+        raise ValueError("i valori devono essere numeri finiti")
+    return riga
+
+
+class StatisticheServer:
+    """
+    Contatori e latenze recenti del server, aggiornati dai thread delle richieste e dal batcher.
+    """
+    def __init__(self, campioni=10000):
+        self.lock = threading.Lock()
+        self.avvio = time.monotonic()
+        self.richieste = 0
+        self.righe = 0
+        self.batch = 0
+        self.errori = 0
+        self.latenze = deque(maxlen=campioni)
+        self.attese = deque(maxlen=campioni)
+        self.dimensioni_batch = deque(maxlen=campioni)
+
+    def registra_richiesta(self, righe, latenza):
+        with self.lock:
+            self.richieste += 1
+            self.righe += righe
+            self.latenze.append(latenza)
+
+    def registra_batch(self, richieste, attesa_massima):
+        with self.lock:
+            self.batch += 1
+            self.dimensioni_batch.append(richieste)
+            self.attese.append(attesa_massima)
+
+    def registra_errore(self):
+        with self.lock:
+            self.errori += 1
+
+    def riepilogo(self):
+        """Restituisce le statistiche come dizionario serializzabile in JSON"""
+        with self.lock:
+            trascorso = time.monotonic() - self.avvio
+            latenze = np.array(self.latenze) * 1000
+            attese = np.array(self.attese) * 1000
+            return {
+                'secondi_attivo': round(trascorso, 1),
+                'richieste': self.richieste,
+                'righe': self.righe,
+                'batch': self.batch,
+                'errori': self.errori,
+                'richieste_al_secondo': round(self.richieste / trascorso, 1) if trascorso else 0.0,
+                'righe_al_secondo': round(self.righe / trascorso, 1) if trascorso else 0.0,
+                'richieste_per_batch_media': round(float(np.mean(self.dimensioni_batch)), 2) if self.dimensioni_batch else 0.0,
+                'latenza_ms': {
+                    f'p{p}': round(float(np.percentile(latenze, p)), 3) for p in (50, 95, 99)
+                } if len(latenze) else {},
+                'attesa_in_coda_ms_p95': round(float(np.percentile(attese, 95)), 3) if len(attese) else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    Raccoglie le richieste in arrivo e le valuta a gruppi con una sola chiamata al modello.
+    Il primo elemento apre una finestra di finestra_ms millisecondi; il batch parte alla
+    chiusura della finestra o quando raggiunge righe_massime righe.
+    """
+    def __init__(self, predici, statistiche, finestra_ms=2.0, righe_massime=4096):
+        self.predici = predici
+        self.statistiche = statistiche
+        self.finestra = finestra_ms / 1000
+        self.righe_massime = righe_massime
+        self.coda = queue.Queue()
+        self.thread = threading.Thread(target=self.ciclo, daemon=True)
+        self.thread.start()
+
+    def invia(self, X):
+        """Accoda una matrice di righe e restituisce un Future con (etichette, probabilità)"""
+        futuro = Future()
+        self.coda.put((X, futuro, time.monotonic()))
+        return futuro
+
+    def ciclo(self):
+        while True:
+            elementi = [self.coda.get()]
+            righe = len(elementi[0][0])
+            scadenza = time.monotonic() + self.finestra
+            while righe < self.righe_massime:
+                rimanente = scadenza - time.monotonic()
+                if rimanente <= 0:
+                    break
+                try:
+                    elemento = self.coda.get(timeout=rimanente)
+                except queue.Empty:
+                    break
+                elementi.append(elemento)
+                righe += len(elemento[0])
+
+            inizio = time.monotonic()
+            self.statistiche.registra_batch(len(elementi), inizio - min(e[2] for e in elementi))
+            try:
+                X = np.concatenate([e[0] for e in elementi]) if len(elementi) > 1 else elementi[0][0]
+                etichette, probabilita = self.predici(X)
+            except Exception as e:
+                if len(elementi) == 1:
+                    elementi[0][1].set_exception(e)
+                else:
+                    self.valuta_singolarmente(elementi)
+                continue
+
+            posizione = 0
+            for X_richiesta, futuro, _ in elementi:
+                fine = posizione + len(X_richiesta)
+                futuro.set_result((etichette[posizione:fine], probabilita[posizione:fine]))
+                posizione = fine
+
+    def valuta_singolarmente(self, elementi):
+        """Se un batch fallisce ogni richiesta viene rivalutata da sola, così l'errore resta a chi l'ha causato"""
+        for X, futuro, _ in elementi:
+            try:
+                futuro.set_result(self.predici(X))
+            except Exception as e:
+                futuro.set_exception(e)
+
+
+class GestoreRichieste(BaseHTTPRequestHandler):
+    """Gestisce POST /predict, GET /stats e GET /health"""
+    protocol_version = "HTTP/1.1"
+    # Intestazioni e corpo partono in scritture separate: senza TCP_NODELAY il ritardo
+    # dell'ACK aggiungerebbe circa 40 ms a ogni risposta
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        if self.server.address_family == socket.AF_UNIX:
+            self.disable_nagle_algorithm = False
+        super().setup()
+
+    def rispondi(self, codice, contenuto):
+        corpo = json.dumps(contenuto, ensure_ascii=False).encode("utf-8")
+        self.send_response(codice)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.rispondi(200, self.server.statistiche.riepilogo())
+        elif self.path == "/health":
+            self.rispondi(200, {'stato': 'ok', 'classi': self.server.classi})
+        else:
+            self.rispondi(404, {'errore': f"percorso sconosciuto: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.rispondi(404, {'errore': f"percorso sconosciuto: {self.path}"})
+            return
+
+        inizio = time.monotonic()
+        try:
+            lunghezza = int(self.headers.get("Content-Length", 0))
+            richiesta = json.loads(self.rfile.read(lunghezza))
+            istanze = richiesta['istanze'] if isinstance(richiesta, dict) and 'istanze' in richiesta else [richiesta]
+            X = np.array([riga_da_json(voce) for voce in istanze], dtype=np.float32)
+            if X.ndim != 2 or X.shape[0] == 0 or X.shape[1] != len(COLONNE_FEATURE):
+                raise ValueError(f"servono una o più istanze da {len(COLONNE_FEATURE)} valori")
+        except (ValueError, KeyError, TypeError) as e:
+            self.server.statistiche.registra_errore()
+            self.rispondi(400, {'errore': f"richiesta non valida: {e}"})
+            return
+
+        try:
+            etichette, probabilita = self.server.batcher.invia(X).result()
+        except Exception as e:
+            self.server.statistiche.registra_errore()
+            self.rispondi(500, {'errore': str(e)})
+            return
+
+        self.rispondi(200, {
+            'previsioni': [str(e) for e in etichette],
+            'probabilita': np.asarray(probabilita, dtype=float).round(6).tolist(),
+            'classi': self.server.classi,
+        })
+        self.server.statistiche.registra_richiesta(len(X), time.monotonic() - inizio)
+
+    def address_string(self):
+        # Sui socket Unix l'indirizzo del client è una stringa vuota
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, formato, *args):
+        # Nessun log per richiesta: sotto carico rallenterebbe il server
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Server HTTP con un thread per connessione su socket Unix"""
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+class ConnessioneUnix(http.client.HTTPConnection):
+    """Connessione HTTP su socket Unix, usata dal generatore di carico"""
+    def __init__(self, percorso):
+        super().__init__("localhost")
+        self.percorso = percorso
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.percorso)
+
+
+def avvia_server(percorso_modello, host="127.0.0.1", porta=8765, percorso_socket=None,
+                 finestra_ms=2.0, righe_massime=4096):
+    """Carica il modello una volta e serve le richieste fino a Ctrl+C"""
+    classi, predici = carica_predittore(percorso_modello)
+    statistiche = StatisticheServer()
+
+    if percorso_socket:
+        if os.path.exists(percorso_socket):
+            os.unlink(percorso_socket)
+        server = ThreadingUnixHTTPServer(percorso_socket, GestoreRichieste)
+        indirizzo = f"unix:{percorso_socket}"
+    else:
+        server = ThreadingHTTPServer((host, porta), GestoreRichieste)
+        indirizzo = f"http://{host}:{server.server_port}"
+
+    server.classi = [str(c) for c in classi] if classi is not None else None
+    server.statistiche = statistiche
+    server.batcher = MicroBatcher(predici, statistiche, finestra_ms, righe_massime)
+
+    print(f"🚀 Server in ascolto su {indirizzo} (modello: {percorso_modello}, finestra {finestra_ms} ms)")
+    print("   POST /predict, GET /stats, GET /health. Ctrl+C per fermare.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Server fermato")
+    finally:
+        server.server_close()
+        if percorso_socket and os.path.exists(percorso_socket):
+            os.unlink(percorso_socket)
+        print(json.dumps(statistiche.riepilogo(), indent=2, ensure_ascii=False))
+
+
+def genera_carico(url=None, percorso_socket=None, client=8, richieste=1000, righe_per_richiesta=1, seme=0):
+    """
+    Invia richieste concorrenti al server da più thread, ognuno con una connessione persistente,
+    e riporta latenze e throughput osservati dal client.
+    """
+    if url:
+        indirizzo = url.split("://", 1)[-1].rstrip("/")
+        host, _, porta = indirizzo.partition(":")
+        nuova_connessione = lambda: http.client.HTTPConnection(host, int(porta or 80))
+    else:
+        nuova_connessione = lambda: ConnessioneUnix(percorso_socket)
+
+    latenze = []
+    errori = [0]
+    lock = threading.Lock()
+
+    def lavoratore(indice):
+        rng = random.Random(seme + indice)
+        connessione = nuova_connessione()
+        locali = []
+        for _ in range(richieste // client):
+            istanze = [[rng.randint(0, massimo) for massimo in MASSIMI_QUESTIONARIO]
+                       for _ in range(righe_per_richiesta)]
+            # Il corpo in byte viene inviato insieme alle intestazioni in una sola scrittura
+            corpo = json.dumps({'istanze': istanze}).encode("utf-8")
+            inizio = time.perf_counter()
+            try:
+                connessione.request("POST", "/predict", corpo, {"Content-Type": "application/json"})
+                risposta = connessione.getresponse()
+                risposta.read()
+                if risposta.status != 200:
+                    raise RuntimeError(risposta.status)
+            except (OSError, RuntimeError, http.client.HTTPException):
+                with lock:
+                    errori[0] += 1
+                connessione.close()
+                connessione = nuova_connessione()
+                continue
+            locali.append(time.perf_counter() - inizio)
+        connessione.close()
+        with lock:
+            latenze.extend(locali)
+
+    inizio = time.perf_counter()
+    thread = [threading.Thread(target=lavoratore, args=(i,)) for i in range(client)]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+    durata = time.perf_counter() - inizio
+
+    latenze_ms = np.array(latenze) * 1000
+    return {
+        'richieste': len(latenze),
+        'errori': errori[0],
+        'secondi': round(durata, 3),
+        'richieste_al_secondo': round(len(latenze) / durata, 1),
+        'righe_al_secondo': round(len(latenze) * righe_per_richiesta / durata, 1),
+        'latenza_ms': {f'p{p}': round(float(np.percentile(latenze_ms, p)), 3) for p in (50, 95, 99)}
+        if len(latenze_ms) else {},
+    }
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Server di inferenza con micro-batching per il modello di personalità.")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True)
+
+    serve = sottocomandi.add_parser("serve", help="Avvia il server.")
+    serve.add_argument("--modello", "-m", default="modello_personalita.onnx",
+                       help="Modello ONNX (.onnx) o joblib (.pkl). Predefinito: modello_personalita.onnx.")
+    serve.add_argument("--host", default="127.0.0.1", help="Indirizzo HTTP. Predefinito: 127.0.0.1.")
+    serve.add_argument("--porta", "-p", type=int, default=8765, help="Porta HTTP. Predefinito: 8765.")
+    serve.add_argument("--socket", help="Ascolta su questo socket Unix invece che su HTTP/TCP.")
+    serve.add_argument("--finestra-ms", type=float, default=2.0,
+                       help="Attesa massima per riempire un micro-batch. Predefinito: 2 ms.")
+    serve.add_argument("--righe-massime", type=int, default=4096,
+                       help="Righe massime per micro-batch. Predefinito: 4096.")
+
+    carico = sottocomandi.add_parser("carico", help="Genera carico concorrente verso un server avviato.")
+    carico.add_argument("--url", default="http://127.0.0.1:8765", help="URL del server HTTP.")
+    carico.add_argument("--socket", help="Socket Unix del server (al posto di --url).")
+    carico.add_argument("--client", "-c", type=int, default=8, help="Client concorrenti. Predefinito: 8.")
+    carico.add_argument("--richieste", "-n", type=int, default=1000, help="Richieste totali. Predefinito: 1000.")
+    carico.add_argument("--righe", type=int, default=1, help="Righe per richiesta. Predefinito: 1.")
+
+    args = parser.parse_args()
+
+    if args.comando == "serve":
+        if not os.path.exists(args.modello):
+            print(f"[ERRORE] Il file '{args.modello}' non esiste.")
+            return 1
+        avvia_server(args.modello, args.host, args.porta, args.socket, args.finestra_ms, args.righe_massime)
+        return 0
+
+    destinazione = f"unix:{args.socket}" if args.socket else args.url
+    print(f"📈 {args.richieste} richieste da {args.client} client verso {destinazione}...")
+    esito = genera_carico(None if args.socket else args.url, args.socket, args.client, args.richieste, args.righe)
+    print(json.dumps(esito, indent=2, ensure_ascii=False))
+    return 0 if esito['richieste'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
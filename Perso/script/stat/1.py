@@ -1,8 +1,7 @@
-import pandas as pd
+from dataset_cache import carica_dataset
 
-# Leggi il file CSV
-file_path = "/home/ema/Scrivania/archive/personality_datasert.csv"
-df = pd.read_csv(file_path)
+# Leggi il dataset (dalla cache se il CSV non è cambiato)
+df = carica_dataset()
 
 # Conta i tipi di personalità
 personality_counts = df['Personality'].value_counts()
@@ -1,13 +1,12 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-# Leggi il file CSV
-file_path = "/home/ema/Scrivania/archive/personality_datasert.csv"
-df = pd.read_csv(file_path)
+from dataset_cache import carica_dataset
 
-# Pulisci i dati: converti valori strani in NaN e poi rimuovili
-df['Friends_circle_size'] = pd.to_numeric(df['Friends_circle_size'], errors='coerce')
+# Leggi il dataset (dalla cache se il CSV non è cambiato): i valori strani sono già NaN
+df = carica_dataset()
+
+# Pulisci i dati: rimuovi le righe senza Friends_circle_size
 df_clean = df.dropna(subset=['Friends_circle_size'])
 
 # Arrotonda i valori decimali a numeri interi (potrebbero essere errori di lettura)
@@ -1,8 +1,7 @@
-import pandas as pd
-import numpy as np
+from dataset_cache import carica_dataset
 
-# Leggi il file CSV
-df = pd.read_csv('/home/ema/Scrivania/archive/personality_datasert.csv')
+# Leggi il dataset (dalla cache se il CSV non è cambiato)
+df = carica_dataset()
 
 # Visualizza informazioni di base sul dataset
 print("=== INFORMAZIONI SUL DATASET ===")
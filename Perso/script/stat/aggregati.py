@@ -0,0 +1,499 @@
+"""
+Statistiche incrementali e unibili per il dataset di personalità, che cresce ogni giorno.
+
+Per ogni gruppo (predefinito: Personality) e colonna lo stato contiene conteggio, media e
+somma dei quadrati degli scarti (Welford, unite con la formula di Chan), minimo, massimo,
+istogramma dei valori arrotondati e uno sketch dei quantili con errore relativo limitato
+(stile DDSketch) per mediana e percentili; se una colonna contiene solo interi, come le
+risposte del questionario, i quantili si leggono esatti dall'istogramma. Tutte le parti si uniscono sommando, quindi:
+- 'aggiorna' legge dal CSV solo i byte aggiunti dopo l'ultimo aggiornamento (lo stato
+  ricorda l'offset), con un costo proporzionale alle nuove righe;
+- le nuove righe possono essere divise in intervalli elaborati da più processi;
+- 'unisci' combina gli stati calcolati su shard diversi.
+
+    python aggregati.py aggiorna --csv dataset.csv --processi 4
+    python aggregati.py rapporto
+    python aggregati.py unisci shard_1.json shard_2.json -o totale.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import SOGLIA_NUMERICA, cartella_cache_per, percorso_dataset
+from analisi import RISPOSTE_NO, RISPOSTE_SI
+
+VERSIONE_STATO = 1
+BYTE_PER_BLOCCO = 32 * 1024 * 1024
+BYTE_IMPRONTA = 64 * 1024
+
+
+class SketchQuantili:
+    """
+    Sketch dei quantili con errore relativo 'accuratezza': ogni valore x > 0 finisce nel
+    contenitore ceil(log_gamma(x)), con gamma = (1 + a) / (1 - a). Due sketch con la stessa
+    accuratezza si uniscono sommando i conteggi dei contenitori.
+    """
+    def __init__(self, accuratezza=0.01):
+        self.accuratezza = accuratezza
+        self.gamma = (1 + accuratezza) / (1 - accuratezza)
+        self.log_gamma = np.log(self.gamma)
+        self.positivi = {}
+        self.negativi = {}
+        self.zeri = 0
+
+    def _aggiungi(self, contenitori, valori):
+        chiavi, conteggi = np.unique(np.ceil(np.log(valori) / self.log_gamma).astype(np.int64), return_counts=True)
+        for chiave, conteggio in zip(chiavi.tolist(), conteggi.tolist()):
+            contenitori[chiave] = contenitori.get(chiave, 0) + conteggio
+
+    def aggiorna(self, valori):
+        """Aggiunge un array di valori senza NaN"""
+        self._aggiungi(self.positivi, valori[valori > 0])
+        self._aggiungi(self.negativi, -valori[valori < 0])
+        self.zeri += int(np.count_nonzero(valori == 0))
+
+    def unisci(self, altro):
+        if altro.accuratezza != self.accuratezza:
+            raise ValueError("Impossibile unire sketch con accuratezza diversa")
+        for propri, altrui in ((self.positivi, altro.positivi), (self.negativi, altro.negativi)):
+            for chiave, conteggio in altrui.items():
+                propri[chiave] = propri.get(chiave, 0) + conteggio
+        self.zeri += altro.zeri
+
+    def quantile(self, q):
+        """Valore approssimato del quantile q (tra 0 e 1), None se lo sketch è vuoto"""
+        totale = self.zeri + sum(self.positivi.values()) + sum(self.negativi.values())
+        if totale == 0:
+            return None
+        rango = q * (totale - 1)
+        visti = 0
+        # Dal più negativo al più positivo: negativi per modulo decrescente, zeri, positivi
+        for segno, chiavi, contenitori in ((-1, sorted(self.negativi, reverse=True), self.negativi),
+                                           (0, [None], None),
+                                           (1, sorted(self.positivi), self.positivi)):
+            for chiave in chiavi:
+                visti += self.zeri if segno == 0 else contenitori[chiave]
+                if visti > rango:
+                    return 0.0 if segno == 0 else segno * 2 * self.gamma ** chiave / (self.gamma + 1)
+        return None
+
+    def a_dict(self):
+        return {'accuratezza': self.accuratezza, 'zeri': self.zeri,
+                'positivi': {str(k): v for k, v in self.positivi.items()},
+                'negativi': {str(k): v for k, v in self.negativi.items()}}
+
+    @classmethod
+    def da_dict(cls, dati):
+        sketch = cls(dati['accuratezza'])
+        sketch.zeri = dati['zeri']
+        sketch.positivi = {int(k): v for k, v in dati['positivi'].items()}
+        sketch.negativi = {int(k): v for k, v in dati['negativi'].items()}
+        return sketch
+
+
+class AggregatoColonna:
+    """Statistiche unibili di una colonna all'interno di un gruppo"""
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = None
+        self.massimo = None
+        self.istogramma = {}
+        self.solo_interi = True
+        self.sketch = SketchQuantili()
+
+    def _unisci_momenti(self, n, media, m2, minimo, massimo):
+        # Formula di Chan et al. per unire due stime di Welford
+        totale = self.n + n
+        delta = media - self.media
+        self.media += delta * n / totale
+        self.m2 += m2 + delta ** 2 * self.n * n / totale
+        self.n = totale
+        self.minimo = minimo if self.minimo is None else min(self.minimo, minimo)
+        self.massimo = massimo if self.massimo is None else max(self.massimo, massimo)
+
+    def aggiorna(self, valori):
+        """Aggiunge un array di valori (i NaN vengono ignorati)"""
+        valori = valori[~np.isnan(valori)]
+        if not len(valori):
+            return
+        media = float(valori.mean())
+        self._unisci_momenti(len(valori), media, float(((valori - media) ** 2).sum()),
+                             float(valori.min()), float(valori.max()))
+        arrotondati = np.rint(valori)
+        self.solo_interi = self.solo_interi and bool(np.all(arrotondati == valori))
+        chiavi, conteggi = np.unique(arrotondati.astype(np.int64), return_counts=True)
+        for chiave, conteggio in zip(chiavi.tolist(), conteggi.tolist()):
+            self.istogramma[chiave] = self.istogramma.get(chiave, 0) + conteggio
+        self.sketch.aggiorna(valori)
+
+    def unisci(self, altro):
+        if altro.n == 0:
+            return
+        self._unisci_momenti(altro.n, altro.media, altro.m2, altro.minimo, altro.massimo)
+        for chiave, conteggio in altro.istogramma.items():
+            self.istogramma[chiave] = self.istogramma.get(chiave, 0) + conteggio
+        self.solo_interi = self.solo_interi and altro.solo_interi
+        self.sketch.unisci(altro.sketch)
+
+    def quantile(self, q):
+        """Quantile esatto dall'istogramma se la colonna ha solo valori interi, altrimenti dallo sketch"""
+        if not self.solo_interi:
+            return self.sketch.quantile(q)
+        if self.n == 0:
+            return None
+        rango, visti = q * (self.n - 1), 0
+        for valore in sorted(self.istogramma):
+            visti += self.istogramma[valore]
+            if visti > rango:
+                return float(valore)
+        return None
+
+    @property
+    def dev_std(self):
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else None
+
+    def a_dict(self):
+        return {'n': self.n, 'media': self.media, 'm2': self.m2, 'minimo': self.minimo, 'massimo': self.massimo,
+                'istogramma': {str(k): v for k, v in sorted(self.istogramma.items())},
+                'solo_interi': self.solo_interi,
+                'sketch': self.sketch.a_dict()}
+
+    @classmethod
+    def da_dict(cls, dati):
+        aggregato = cls()
+        aggregato.n, aggregato.media, aggregato.m2 = dati['n'], dati['media'], dati['m2']
+        aggregato.minimo, aggregato.massimo = dati['minimo'], dati['massimo']
+        aggregato.istogramma = {int(k): v for k, v in dati['istogramma'].items()}
+        aggregato.solo_interi = dati['solo_interi']
+        aggregato.sketch = SketchQuantili.da_dict(dati['sketch'])
+        return aggregato
+
+
+def schema_da_blocco(blocco, gruppo):
+    """Decide dal primo blocco quali colonne sono numeriche e quali Sì/No"""
+    numeriche, si_no = [], []
+    risposte = RISPOSTE_SI | RISPOSTE_NO
+    for colonna in blocco.columns:
+        if colonna == gruppo:
+            continue
+        valori = blocco[colonna].dropna()
+        if not len(valori):
+            continue
+        if valori.str.strip().str.lower().isin(risposte).all():
+            si_no.append(colonna)
+        elif pd.to_numeric(valori, errors='coerce').notna().mean() >= SOGLIA_NUMERICA:
+            numeriche.append(colonna)
+    return {'gruppo': gruppo, 'numeriche': numeriche, 'si_no': si_no}
+
+
+def codifica_si_no(colonna):
+    """Sì -> 1, No -> 0, altro -> NaN; strip e lower si applicano solo ai valori distinti"""
+    codici, unici = pd.factorize(colonna)
+    risposte = [str(valore).strip().lower() for valore in unici]
+    mappa = np.array([1.0 if r in RISPOSTE_SI else 0.0 if r in RISPOSTE_NO else np.nan for r in risposte] + [np.nan])
+    return mappa[codici]  # il codice -1 dei mancanti punta all'ultimo elemento, NaN
+
+
+def aggrega_blocco(blocco, schema, aggregati=None):
+    """Aggiorna {gruppo: {colonna: AggregatoColonna}} con le righe di un blocco"""
+    aggregati = aggregati if aggregati is not None else {}
+    blocco = blocco.dropna(subset=[schema['gruppo']])
+    # Le colonne già lette come numeri dal parser non passano da to_numeric, che sulle stringhe è lento
+    valori = {colonna: (blocco[colonna] if pd.api.types.is_numeric_dtype(blocco[colonna])
+                        else pd.to_numeric(blocco[colonna], errors='coerce')).to_numpy(dtype=np.float64)
+              for colonna in schema['numeriche']}
+    for colonna in schema['si_no']:
+        valori[colonna] = codifica_si_no(blocco[colonna])
+
+    codici, unici = pd.factorize(blocco[schema['gruppo']])
+    nomi, inverso = np.unique([str(valore).strip() for valore in unici], return_inverse=True)
+    codici = inverso[codici]
+    for i, nome in enumerate(nomi):
+        righe = codici == i
+        per_gruppo = aggregati.setdefault(str(nome), {})
+        for colonna, array in valori.items():
+            per_gruppo.setdefault(colonna, AggregatoColonna()).aggiorna(array[righe])
+    return aggregati
+
+
+def unisci_aggregati(destinazione, sorgente):
+    """Unisce sul posto due dizionari {gruppo: {colonna: AggregatoColonna}}"""
+    for gruppo, colonne in sorgente.items():
+        per_gruppo = destinazione.setdefault(gruppo, {})
+        for colonna, aggregato in colonne.items():
+            per_gruppo.setdefault(colonna, AggregatoColonna()).unisci(aggregato)
+    return destinazione
+
+
+def leggi_intestazione(percorso):
+    """Restituisce la riga di intestazione (byte) e l'offset della prima riga di dati"""
+    with open(percorso, 'rb') as f:
+        intestazione = f.readline()
+        return intestazione, f.tell()
+
+
+def allinea_a_riga(f, posizione, fine):
+    """Sposta la posizione all'inizio della riga successiva (o alla fine dell'intervallo)"""
+    f.seek(posizione)
+    if posizione > 0:
+        f.readline()
+    return min(f.tell(), fine)
+
+
+def fine_ultima_riga(percorso, inizio, dimensione):
+    """
+    Offset subito dopo l'ultimo a capo del file: un'ultima riga ancora in scrittura
+    resta per l'aggiornamento successivo.
+    """
+    with open(percorso, 'rb') as f:
+        fine = dimensione
+        while fine > inizio:
+            partenza = max(inizio, fine - BYTE_IMPRONTA)
+            f.seek(partenza)
+            a_capo = f.read(fine - partenza).rfind(b'\n')
+            if a_capo >= 0:
+                return partenza + a_capo + 1
+            fine = partenza
+    return inizio
+
+
+def elabora_intervallo(percorso, inizio, fine, nomi_colonne, schema):
+    """
+    Aggrega le righe complete nei byte [inizio, fine), a blocchi di BYTE_PER_BLOCCO.
+    Usata anche come funzione dei processi paralleli.
+    """
+    aggregati = {}
+    with open(percorso, 'rb') as f:
+        f.seek(inizio)
+        posizione = inizio
+        while posizione < fine:
+            dati = f.read(min(BYTE_PER_BLOCCO, fine - posizione))
+            if posizione + len(dati) < fine:
+                # Il blocco si ferma all'ultima riga completa; il resto viene riletto dopo
+                dati = dati[:dati.rfind(b'\n') + 1]
+                f.seek(posizione + len(dati))
+            if not dati:
+                break
+            blocco = pd.read_csv(io.BytesIO(dati), header=None, names=nomi_colonne)
+            aggrega_blocco(blocco, schema, aggregati)
+            posizione += len(dati)
+    return aggregati
+
+
+def stato_vuoto():
+    return {'versione': VERSIONE_STATO, 'schema': None, 'sorgenti': {}, 'gruppi': {}}
+
+
+def carica_stato(percorso):
+    """Legge lo stato salvato, restituendo uno stato vuoto se il file non esiste"""
+    if not os.path.exists(percorso):
+        return stato_vuoto()
+    with open(percorso, 'r', encoding='utf-8') as f:
+        dati = json.load(f)
+    if dati.get('versione') != VERSIONE_STATO:
+        raise ValueError(f"Versione dello stato non supportata: {dati.get('versione')}")
+    dati['gruppi'] = {gruppo: {colonna: AggregatoColonna.da_dict(a) for colonna, a in colonne.items()}
+                      for gruppo, colonne in dati['gruppi'].items()}
+    return dati
+
+
+def salva_stato(stato, percorso):
+    """Scrive lo stato in JSON, passando da un file temporaneo"""
+    dati = dict(stato)
+    dati['gruppi'] = {gruppo: {colonna: a.a_dict() for colonna, a in colonne.items()}
+                      for gruppo, colonne in stato['gruppi'].items()}
+    os.makedirs(os.path.dirname(os.path.abspath(percorso)), exist_ok=True)
+    temporaneo = percorso + ".tmp"
+    with open(temporaneo, 'w', encoding='utf-8') as f:
+        json.dump(dati, f, ensure_ascii=False)
+    os.replace(temporaneo, percorso)
+
+
+def impronta(percorso, fine):
+    """Hash dei primi byte già elaborati: se cambia, il file è stato riscritto e non solo esteso"""
+    with open(percorso, 'rb') as f:
+        return hashlib.sha1(f.read(min(fine, BYTE_IMPRONTA))).hexdigest()
+
+
+def aggiorna_stato(stato, percorso_csv, gruppo="Personality", processi=1):
+    """
+    Aggiunge allo stato le righe del CSV successive all'ultimo offset elaborato.
+
+    Returns:
+        dict: byte e secondi dell'aggiornamento e se è stato necessario ripartire da zero
+    """
+    sorgente = os.path.abspath(percorso_csv)
+    intestazione, inizio_dati = leggi_intestazione(sorgente)
+    dimensione = os.path.getsize(sorgente)
+    info = stato['sorgenti'].get(sorgente)
+
+    ricalcolo = False
+    if info and (dimensione < info['offset'] or impronta(sorgente, info['offset']) != info['impronta']
+                 or info['intestazione'] != intestazione.decode('utf-8')):
+        if len(stato['sorgenti']) > 1:
+            raise ValueError(f"{sorgente} è stato riscritto: lo stato unisce più sorgenti e va ricalcolato da zero")
+        print(f"⚠️  {sorgente} è stato riscritto: ricalcolo completo")
+        stato.update(stato_vuoto())
+        info, ricalcolo = None, True
+
+    nomi_colonne = list(pd.read_csv(io.BytesIO(intestazione), nrows=0).columns)
+    if stato['schema'] is None:
+        primo = pd.read_csv(sorgente, nrows=10_000, dtype=str)
+        if gruppo not in primo.columns:
+            raise ValueError(f"Colonna '{gruppo}' non presente (colonne: {list(primo.columns)})")
+        stato['schema'] = schema_da_blocco(primo, gruppo)
+
+    inizio = info['offset'] if info else inizio_dati
+    fine = fine_ultima_riga(sorgente, inizio, dimensione)
+
+    avvio = time.perf_counter()
+    if fine > inizio:
+        with open(sorgente, 'rb') as f:
+            confini = sorted({allinea_a_riga(f, inizio + (fine - inizio) * i // processi, fine) if i else inizio
+                              for i in range(processi)} | {fine})
+        intervalli = list(zip(confini[:-1], confini[1:]))
+        if processi > 1 and len(intervalli) > 1:
+            with ProcessPoolExecutor(max_workers=processi) as pool:
+                parziali = list(pool.map(elabora_intervallo, [sorgente] * len(intervalli),
+                                         [a for a, _ in intervalli], [b for _, b in intervalli],
+                                         [nomi_colonne] * len(intervalli), [stato['schema']] * len(intervalli)))
+        else:
+            parziali = [elabora_intervallo(sorgente, a, b, nomi_colonne, stato['schema']) for a, b in intervalli]
+        for parziale in parziali:
+            unisci_aggregati(stato['gruppi'], parziale)
+
+    stato['sorgenti'][sorgente] = {
+        'offset': fine,
+        'intestazione': intestazione.decode('utf-8'),
+        'impronta': impronta(sorgente, fine),
+        'aggiornato': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return {'byte_nuovi': fine - inizio, 'secondi': time.perf_counter() - avvio, 'ricalcolo': ricalcolo}
+
+
+def rapporto(stato):
+    """Statistiche leggibili per gruppo e colonna ricavate dallo stato"""
+    risultato = {}
+    for gruppo, colonne in sorted(stato['gruppi'].items()):
+        risultato[gruppo] = {}
+        for colonna, a in colonne.items():
+            risultato[gruppo][colonna] = {
+                'conteggio': a.n, 'media': a.media, 'dev_std': a.dev_std,
+                'minimo': a.minimo, 'massimo': a.massimo,
+                'p25': a.quantile(0.25), 'mediana': a.quantile(0.5), 'p75': a.quantile(0.75),
+                'istogramma': dict(sorted(a.istogramma.items())),
+            }
+    return risultato
+
+
+def stampa_rapporto(stato):
+    """Stampa il rapporto in forma di tabelle, come analisi.py"""
+    dati = rapporto(stato)
+    si_no = set(stato['schema']['si_no']) if stato['schema'] else set()
+    colonne = list(dict.fromkeys(c for per_gruppo in dati.values() for c in per_gruppo))
+    print("=" * 70)
+    print("STATISTICHE INCREMENTALI")
+    print("=" * 70)
+    for sorgente, info in stato['sorgenti'].items():
+        print(f"Sorgente: {sorgente} (offset {info['offset']:,}, aggiornata il {info['aggiornato']})")
+    for colonna in colonne:
+        percentuale = colonna in si_no
+        print(f"\n=== {colonna}{' (% Sì)' if percentuale else ''} ===")
+        print(f"{'Gruppo':<12} {'n':>9} {'media':>9} {'dev std':>9} {'mediana':>9} {'p25':>7} {'p75':>7}")
+        for gruppo, per_gruppo in dati.items():
+            r = per_gruppo.get(colonna)
+            if not r or not r['conteggio']:
+                continue
+            media = f"{r['media'] * 100:8.1f}%" if percentuale else f"{r['media']:9.2f}"
+            dev_std = f"{r['dev_std']:9.2f}" if r['dev_std'] is not None else f"{'-':>9}"
+            print(f"{gruppo:<12} {r['conteggio']:>9} {media} {dev_std} "
+                  f"{r['mediana'] + 0.0:>9.1f} {r['p25'] + 0.0:>7.1f} {r['p75'] + 0.0:>7.1f}")
+
+
+def percorso_stato_predefinito(percorso_csv):
+    return cartella_cache_per(percorso_csv) + "_aggregati.json"
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Statistiche incrementali e unibili del dataset di personalità.")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True)
+
+    aggiorna = sottocomandi.add_parser("aggiorna", help="Aggiunge allo stato le righe nuove del CSV.")
+    aggiorna.add_argument("--csv", help="CSV da leggere. Predefinito: PERSO_DATASET o il percorso di dataset_cache.py.")
+    aggiorna.add_argument("--stato", help="File JSON dello stato. Predefinito: accanto alla cache del dataset.")
+    aggiorna.add_argument("--gruppo", default="Personality", help="Colonna per cui raggruppare. Predefinito: Personality.")
+    aggiorna.add_argument("--processi", "-j", type=int, default=1,
+                          help="Processi tra cui dividere le righe nuove. Predefinito: 1.")
+    aggiorna.add_argument("--silenzioso", action="store_true", help="Non stampare il rapporto dopo l'aggiornamento.")
+
+    mostra = sottocomandi.add_parser("rapporto", help="Stampa le statistiche dello stato.")
+    mostra.add_argument("--csv", help="CSV di cui mostrare lo stato predefinito.")
+    mostra.add_argument("--stato", help="File JSON dello stato.")
+    mostra.add_argument("--json", help="Salva il rapporto anche in questo file JSON.")
+
+    unisci = sottocomandi.add_parser("unisci", help="Unisce gli stati di più shard.")
+    unisci.add_argument("stati", nargs="+", help="File JSON degli stati da unire.")
+    unisci.add_argument("--output", "-o", required=True, help="File JSON dello stato unito.")
+
+    args = parser.parse_args()
+
+    try:
+        if args.comando == "aggiorna":
+            percorso_csv = args.csv or percorso_dataset()
+            percorso_stato = args.stato or percorso_stato_predefinito(percorso_csv)
+            stato = carica_stato(percorso_stato)
+            esito = aggiorna_stato(stato, percorso_csv, args.gruppo, max(1, args.processi))
+            salva_stato(stato, percorso_stato)
+            print(f"✅ {esito['byte_nuovi'] / 1e6:.1f} MB nuovi elaborati in {esito['secondi']:.2f} s "
+                  f"→ stato salvato in {percorso_stato}")
+            if not args.silenzioso:
+                stampa_rapporto(stato)
+
+        elif args.comando == "rapporto":
+            percorso_stato = args.stato or percorso_stato_predefinito(args.csv or percorso_dataset())
+            if not os.path.exists(percorso_stato):
+                print(f"[ERRORE] Lo stato '{percorso_stato}' non esiste: esegui prima 'aggiorna'.")
+                return 1
+            stato = carica_stato(percorso_stato)
+            stampa_rapporto(stato)
+            if args.json:
+                with open(args.json, 'w', encoding='utf-8') as f:
+                    json.dump(rapporto(stato), f, ensure_ascii=False, indent=4)
+                print(f"\n💾 Rapporto salvato in: {args.json}")
+
+        else:
+            totale = stato_vuoto()
+            for percorso in args.stati:
+                stato = carica_stato(percorso)
+                if totale['schema'] is None:
+                    totale['schema'] = stato['schema']
+                elif stato['schema'] != totale['schema']:
+                    raise ValueError(f"{percorso} ha colonne diverse dagli altri stati")
+                doppie = set(totale['sorgenti']) & set(stato['sorgenti'])
+                if doppie:
+                    raise ValueError(f"Sorgenti presenti in più stati: {', '.join(sorted(doppie))}")
+                totale['sorgenti'].update(stato['sorgenti'])
+                unisci_aggregati(totale['gruppi'], stato['gruppi'])
+            salva_stato(totale, args.output)
+            print(f"✅ {len(args.stati)} stati uniti in {args.output}")
+            stampa_rapporto(totale)
+    except (OSError, ValueError, pd.errors.ParserError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
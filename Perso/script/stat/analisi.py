@@ -0,0 +1,304 @@
+"""
+Profilo statistico completo del dataset di personalità in un'unica esecuzione.
+
+Raccoglie le analisi di 1.py-4.py: per ogni gruppo (predefinito: Personality) e per tutte
+le colonne numeriche calcola conteggio, media, deviazione standard, mediana, minimo e massimo
+con un solo groupby, le percentuali di risposte Sì delle colonne Sì/No, gli istogrammi dei
+valori arrotondati (un np.bincount per colonna sui soli valori presenti) e il test t di Welch tra i
+primi due gruppi. I risultati possono essere stampati, salvati in JSON e disegnati in PNG.
+
+    python analisi.py
+    python analisi.py --csv dataset.csv --formati testo json grafici --output-dir profilo
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import carica_dataset
+
+STATISTICHE = ['count', 'mean', 'std', 'median', 'min', 'max']
+NOMI_STATISTICHE = {'count': 'conteggio', 'mean': 'media', 'std': 'dev_std',
+                    'median': 'mediana', 'min': 'minimo', 'max': 'massimo'}
+RISPOSTE_SI = {'yes', 'sì', 'si', 'true', '1', '1.0'}
+RISPOSTE_NO = {'no', 'false', '0', '0.0'}
+FORMATI = ("testo", "json", "grafici")
+
+
+class Cronometro:
+    """Tempi delle fasi dell'analisi, per il report finale"""
+    def __init__(self):
+        self.tempi = {}
+
+    @contextmanager
+    def fase(self, nome):
+        inizio = time.perf_counter()
+        yield
+        self.tempi[nome] = self.tempi.get(nome, 0.0) + time.perf_counter() - inizio
+
+
+def colonne_si_no(df, gruppo):
+    """Colonne categoriche le cui categorie sono tutte risposte Sì/No"""
+    risposte = RISPOSTE_SI | RISPOSTE_NO
+    return [colonna for colonna in df.columns
+            if colonna != gruppo and isinstance(df[colonna].dtype, pd.CategoricalDtype)
+            and len(df[colonna].cat.categories)
+            and all(str(c).strip().lower() in risposte for c in df[colonna].cat.categories)]
+
+
+def prepara_colonne(df, gruppo):
+    """
+    Restituisce il DataFrame delle sole colonne analizzate: le numeriche così come sono e
+    le Sì/No convertite in 1/0 (la loro media è la frazione di Sì).
+    """
+    numeriche = [c for c in df.columns if c != gruppo and pd.api.types.is_numeric_dtype(df[c])]
+    si_no = colonne_si_no(df, gruppo)
+    colonne = {c: df[c] for c in numeriche}
+    for colonna in si_no:
+        codifica = {c: (1.0 if str(c).strip().lower() in RISPOSTE_SI else 0.0) for c in df[colonna].cat.categories}
+        colonne[colonna] = df[colonna].map(codifica).astype(np.float64)
+    return pd.DataFrame(colonne), numeriche, si_no
+
+
+def statistiche_per_gruppo(valori, gruppi):
+    """
+    Conteggio, media, deviazione standard, mediana, minimo e massimo di tutte le colonne,
+    per gruppo e sul totale, con un'unica aggregazione ciascuno.
+
+    Returns:
+        pd.DataFrame: indice (gruppo, colonna), una colonna per statistica
+    """
+    per_gruppo = valori.groupby(gruppi, observed=True).agg(STATISTICHE)
+    totale = valori.agg(STATISTICHE).T
+    per_gruppo = per_gruppo.stack(level=0, future_stack=True)
+    totale.index = pd.MultiIndex.from_product([['Totale'], totale.index])
+    tabella = pd.concat([per_gruppo, totale])
+    tabella.index.names = ['gruppo', 'colonna']
+    return tabella.rename(columns=NOMI_STATISTICHE)
+
+
+def istogrammi(valori, gruppi, colonne):
+    """
+    Conteggi dei valori arrotondati all'intero per gruppo e colonna. Per ogni colonna i valori
+    distinti vengono numerati con np.unique e ogni coppia (gruppo, valore) riceve un indice,
+    così i contenitori sono al più righe x gruppi anche con valori anomali. I valori mancanti
+    o infiniti sono ignorati.
+
+    Returns:
+        pd.Series: conteggi con indice (gruppo, colonna, valore)
+    """
+    codici_gruppo = gruppi.cat.codes.to_numpy()
+    nomi_gruppi = list(gruppi.cat.categories)
+    matrice = np.rint(valori[colonne].to_numpy(dtype=np.float64))
+    validi = np.isfinite(matrice) & (codici_gruppo >= 0)[:, None]
+
+    indice, numeri = [], []
+    for j, colonna in enumerate(colonne):
+        distinti, codici_valore = np.unique(matrice[validi[:, j], j], return_inverse=True)
+        chiavi = codici_gruppo[validi[:, j]] * len(distinti) + codici_valore
+        blocco = np.bincount(chiavi, minlength=len(nomi_gruppi) * len(distinti)).reshape(len(nomi_gruppi), len(distinti))
+        for g, v in zip(*np.nonzero(blocco)):
+            indice.append((nomi_gruppi[g], colonna, int(distinti[v])))
+            numeri.append(int(blocco[g, v]))
+    return pd.Series(numeri, index=pd.MultiIndex.from_tuples(indice, names=['gruppo', 'colonna', 'valore']),
+                     dtype=np.int64).sort_index()
+
+
+def test_welch(tabella, gruppo_a, gruppo_b):
+    """
+    Test t di Welch tra due gruppi per tutte le colonne, dalle sole statistiche aggregate.
+    Il p-value richiede scipy; senza scipy viene riportata solo la statistica t.
+    """
+    a, b = tabella.loc[gruppo_a], tabella.loc[gruppo_b]
+    varianza_a = a['dev_std'] ** 2 / a['conteggio']
+    varianza_b = b['dev_std'] ** 2 / b['conteggio']
+    t = (a['media'] - b['media']) / np.sqrt(varianza_a + varianza_b)
+    gradi = (varianza_a + varianza_b) ** 2 / (varianza_a ** 2 / (a['conteggio'] - 1) + varianza_b ** 2 / (b['conteggio'] - 1))
+    risultato = pd.DataFrame({'t': t, 'gradi_liberta': gradi})
+    try:
+        from scipy import stats
+        risultato['p_value'] = 2 * stats.t.sf(np.abs(t), gradi)
+    except ImportError:
+        risultato['p_value'] = np.nan
+    return risultato
+
+
+def stampa_testo(risultati):
+    """Stampa il profilo in forma di tabelle"""
+    print("=" * 70)
+    print("PROFILO DEL DATASET")
+    print("=" * 70)
+    print(f"Righe totali: {risultati['righe']}")
+    for gruppo, numero in risultati['gruppi'].items():
+        print(f"  {gruppo}: {numero} ({numero / risultati['righe'] * 100:.1f}%)")
+
+    tabella = risultati['tabella']
+    for colonna in tabella.index.get_level_values('colonna').unique():
+        percentuale = colonna in risultati['si_no']
+        print(f"\n=== {colonna}{' (% Sì)' if percentuale else ''} ===")
+        print(f"{'Gruppo':<12} {'n':>8} {'media':>9} {'dev std':>9} {'mediana':>9} {'min':>7} {'max':>7}")
+        for gruppo in tabella.index.get_level_values('gruppo').unique():
+            riga = tabella.loc[(gruppo, colonna)]
+            media = f"{riga['media'] * 100:8.1f}%" if percentuale else f"{riga['media']:9.2f}"
+            print(f"{gruppo:<12} {int(riga['conteggio']):>8} {media} {riga['dev_std']:>9.2f} "
+                  f"{riga['mediana'] + 0.0:>9.1f} {riga['minimo'] + 0.0:>7.1f} {riga['massimo'] + 0.0:>7.1f}")
+        if risultati['test'] is not None and colonna in risultati['test'].index:
+            test = risultati['test'].loc[colonna]
+            p = f", p = {test['p_value']:.3g}" if not np.isnan(test['p_value']) else " (p-value: serve scipy)"
+            print(f"Test t di Welch: t = {test['t']:.3f}{p}")
+
+    print("\n=== ISTOGRAMMI (valori arrotondati) ===")
+    conteggi = risultati['istogrammi'].unstack('gruppo', fill_value=0)
+    for colonna in conteggi.index.get_level_values('colonna').unique():
+        print(f"\n{colonna}:")
+        print(conteggi.loc[colonna].to_string())
+
+
+def salva_json(risultati, percorso):
+    """Salva statistiche, istogrammi, test e tempi in un file JSON"""
+    tabella = risultati['tabella']
+    statistiche = {}
+    for (gruppo, colonna), riga in tabella.iterrows():
+        statistiche.setdefault(str(gruppo), {})[colonna] = {k: (None if pd.isna(v) else float(v)) for k, v in riga.items()}
+    conteggi = {}
+    for (gruppo, colonna, valore), numero in risultati['istogrammi'].items():
+        conteggi.setdefault(str(gruppo), {}).setdefault(colonna, {})[int(valore)] = int(numero)
+    test = None
+    if risultati['test'] is not None:
+        test = {colonna: {k: (None if pd.isna(v) else float(v)) for k, v in riga.items()}
+                for colonna, riga in risultati['test'].iterrows()}
+
+    with open(percorso, 'w', encoding='utf-8') as f:
+        json.dump({
+            'righe': risultati['righe'],
+            'gruppi': risultati['gruppi'],
+            'colonne_si_no': risultati['si_no'],
+            'statistiche': statistiche,
+            'istogrammi': conteggi,
+            'test_welch': test,
+            'tempi_secondi': risultati['tempi'],
+        }, f, ensure_ascii=False, indent=4)
+
+
+def salva_grafici(risultati, cartella):
+    """Un PNG per colonna numerica: istogrammi per gruppo con le curve gaussiane, come 3.py"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    tabella = risultati['tabella']
+    conteggi = risultati['istogrammi']
+    gruppi = [g for g in tabella.index.get_level_values('gruppo').unique() if g != 'Totale']
+    file = []
+    for colonna in risultati['numeriche']:
+        plt.figure(figsize=(10, 6))
+        for gruppo in gruppi:
+            if (gruppo, colonna) not in tabella.index or (gruppo, colonna) not in conteggi.droplevel('valore').index:
+                continue
+            valori = conteggi.loc[(gruppo, colonna)]
+            statistiche = tabella.loc[(gruppo, colonna)]
+            plt.bar(valori.index, valori.to_numpy() / valori.sum(), alpha=0.5, edgecolor='black',
+                    label=f"{gruppo} (n={int(statistiche['conteggio'])})")
+            if statistiche['dev_std'] > 0:
+                x = np.linspace(valori.index.min(), valori.index.max(), 100)
+                mu, sigma = statistiche['media'], statistiche['dev_std']
+                plt.plot(x, np.exp(-0.5 * ((x - mu) / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi)), '--',
+                         linewidth=2, label=f"Gaussiana {gruppo} (μ={mu:.1f}, σ={sigma:.1f})")
+        plt.xlabel(colonna)
+        plt.ylabel('Densità')
+        plt.title(f'Distribuzione {colonna} per gruppo')
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        percorso = os.path.join(cartella, f"{colonna}.png")
+        plt.savefig(percorso, dpi=100)
+        plt.close()
+        file.append(percorso)
+    return file
+
+
+def analizza(df, gruppo="Personality", cronometro=None):
+    """
+    Calcola tutte le statistiche del profilo.
+
+    Returns:
+        dict: tabella delle statistiche, istogrammi, test, gruppi e colonne analizzate
+    """
+    cronometro = cronometro or Cronometro()
+    with cronometro.fase("preparazione"):
+        df = df.dropna(subset=[gruppo])
+        valori, numeriche, si_no = prepara_colonne(df, gruppo)
+        gruppi = df[gruppo] if isinstance(df[gruppo].dtype, pd.CategoricalDtype) else df[gruppo].astype(str)
+        gruppi = gruppi.astype('category').cat.remove_unused_categories()
+    with cronometro.fase("statistiche"):
+        tabella = statistiche_per_gruppo(valori, gruppi)
+    with cronometro.fase("istogrammi"):
+        conteggi = istogrammi(valori, gruppi, numeriche)
+    with cronometro.fase("test"):
+        nomi_gruppi = list(gruppi.value_counts().sort_index().index)
+        test = test_welch(tabella, nomi_gruppi[0], nomi_gruppi[1]) if len(nomi_gruppi) >= 2 else None
+    return {
+        'righe': len(df),
+        'gruppi': {str(g): int(n) for g, n in gruppi.value_counts().sort_index().items()},
+        'numeriche': numeriche,
+        'si_no': si_no,
+        'tabella': tabella,
+        'istogrammi': conteggi,
+        'test': test,
+        'tempi': cronometro.tempi,
+    }
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Profilo statistico del dataset di personalità in un'unica passata.")
+    parser.add_argument("--csv", help="CSV da analizzare. Predefinito: PERSO_DATASET o il percorso di dataset_cache.py.")
+    parser.add_argument("--gruppo", default="Personality", help="Colonna per cui raggruppare. Predefinito: Personality.")
+    parser.add_argument("--formati", nargs="+", choices=FORMATI, default=["testo"],
+                        help="Uscite da produrre: testo, json, grafici. Predefinito: testo.")
+    parser.add_argument("--output-dir", "-o", default=".",
+                        help="Cartella per analisi.json e i grafici PNG. Predefinito: cartella corrente.")
+    parser.add_argument("--rigenera-cache", action="store_true", help="Rilegge il CSV ignorando la cache.")
+    args = parser.parse_args()
+
+    cronometro = Cronometro()
+    try:
+        with cronometro.fase("caricamento"):
+            df = carica_dataset(args.csv, rigenera=args.rigenera_cache)
+    except (OSError, pd.errors.ParserError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+    if args.gruppo not in df.columns:
+        print(f"[ERRORE] Colonna '{args.gruppo}' non presente (colonne: {list(df.columns)})")
+        return 1
+
+    risultati = analizza(df, args.gruppo, cronometro)
+    os.makedirs(args.output_dir, exist_ok=True)
+    if "testo" in args.formati:
+        with cronometro.fase("uscita testo"):
+            stampa_testo(risultati)
+    if "grafici" in args.formati:
+        with cronometro.fase("uscita grafici"):
+            file = salva_grafici(risultati, args.output_dir)
+        print(f"\n📊 Grafici salvati: {len(file)} file in {args.output_dir}")
+    if "json" in args.formati:
+        with cronometro.fase("uscita json"):
+            percorso = os.path.join(args.output_dir, "analisi.json")
+            salva_json(risultati, percorso)
+        print(f"💾 Risultati salvati in: {percorso}")
+
+    print("\n⏱️  TEMPI")
+    for fase, secondi in cronometro.tempi.items():
+        print(f"  {fase:<16} {secondi * 1000:9.1f} ms")
+    print(f"  {'totale':<16} {sum(cronometro.tempi.values()) * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
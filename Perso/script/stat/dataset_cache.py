@@ -0,0 +1,145 @@
+"""
+Caricamento del dataset di personalità condiviso dagli script di statistica.
+
+Alla prima lettura il CSV viene analizzato e pulito una volta sola: le colonne numeriche
+diventano float64 (i valori non numerici diventano NaN, come con pd.to_numeric(errors='coerce'))
+e quelle testuali categorie. Ogni colonna viene salvata come file .npy in una cartella di
+cache, insieme a un metadati.json con dimensione e data di modifica del CSV. Le esecuzioni
+successive, se il CSV non è cambiato, mappano in memoria i file .npy senza rileggere il CSV.
+
+Il formato .npy è usato al posto di Feather/Parquet perché non richiede pyarrow e può
+essere aperto con np.load(mmap_mode='r'), cosa che un .npz compresso non permette.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+PERCORSO_DATASET = "/home/ema/Scrivania/archive/personality_datasert.csv"
+CARTELLA_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "perso_stat")
+VERSIONE_CACHE = 1
+
+# Una colonna testuale è considerata numerica se almeno questa frazione dei valori presenti è un numero
+SOGLIA_NUMERICA = 0.5
+
+
+def percorso_dataset():
+    """Percorso del CSV: variabile d'ambiente PERSO_DATASET oppure quello predefinito"""
+    return os.environ.get("PERSO_DATASET", PERCORSO_DATASET)
+
+
+def cartella_cache_per(percorso_csv, cartella_cache=CARTELLA_CACHE):
+    """Cartella di cache di un CSV, distinta per percorso assoluto"""
+    assoluto = os.path.abspath(percorso_csv)
+    impronta = hashlib.sha1(assoluto.encode("utf-8")).hexdigest()[:12]
+    nome = os.path.splitext(os.path.basename(assoluto))[0]
+    return os.path.join(cartella_cache, f"{nome}_{impronta}")
+
+
+def chiave_sorgente(percorso_csv):
+    """Dimensione e data di modifica del CSV, usate per capire se la cache è ancora valida"""
+    info = os.stat(percorso_csv)
+    return {'dimensione': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+
+def pulisci_dataset(df):
+    """
+    Converte le colonne numeriche in float64 (valori non validi -> NaN) e le altre in categorie.
+
+    Returns:
+        pd.DataFrame: dataset pulito, con lo stesso numero di righe
+    """
+    pulito = {}
+    for colonna in df.columns:
+        valori = df[colonna]
+        if pd.api.types.is_numeric_dtype(valori):
+            pulito[colonna] = valori.astype(np.float64)
+            continue
+        numerici = pd.to_numeric(valori, errors='coerce')
+        presenti = valori.notna().sum()
+        if presenti and numerici.notna().sum() / presenti >= SOGLIA_NUMERICA:
+            pulito[colonna] = numerici.astype(np.float64)
+        else:
+            pulito[colonna] = valori.astype('category')
+    return pd.DataFrame(pulito)
+
+
+def salva_cache(df, cartella, chiave):
+    """Scrive le colonne del DataFrame pulito come file .npy e i metadati, in modo atomico"""
+    os.makedirs(os.path.dirname(cartella), exist_ok=True)
+    temporanea = tempfile.mkdtemp(prefix=".tmp_", dir=os.path.dirname(cartella))
+    colonne = []
+    for i, colonna in enumerate(df.columns):
+        file = f"colonna_{i}.npy"
+        if isinstance(df[colonna].dtype, pd.CategoricalDtype):
+            # Le categorie vanno nei metadati, i codici (-1 = mancante) nel file
+            np.save(os.path.join(temporanea, file), df[colonna].cat.codes.to_numpy())
+            colonne.append({'nome': colonna, 'file': file, 'tipo': 'categoria',
+                            'categorie': [str(c) for c in df[colonna].cat.categories]})
+        else:
+            np.save(os.path.join(temporanea, file), df[colonna].to_numpy(dtype=np.float64))
+            colonne.append({'nome': colonna, 'file': file, 'tipo': 'numero'})
+
+    with open(os.path.join(temporanea, "metadati.json"), 'w', encoding='utf-8') as f:
+        json.dump({'versione': VERSIONE_CACHE, 'sorgente': chiave, 'righe': len(df), 'colonne': colonne},
+                  f, ensure_ascii=False, indent=4)
+
+    shutil.rmtree(cartella, ignore_errors=True)
+    os.replace(temporanea, cartella)
+
+
+def leggi_cache(cartella, chiave=None):
+    """
+    Apre la cache mappando le colonne in memoria.
+
+    Returns:
+        pd.DataFrame o None se la cache manca, è di un'altra versione o non corrisponde alla chiave
+    """
+    try:
+        with open(os.path.join(cartella, "metadati.json"), 'r', encoding='utf-8') as f:
+            metadati = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if metadati.get('versione') != VERSIONE_CACHE or (chiave is not None and metadati.get('sorgente') != chiave):
+        return None
+
+    colonne = {}
+    for colonna in metadati['colonne']:
+        valori = np.load(os.path.join(cartella, colonna['file']), mmap_mode='r')
+        if colonna['tipo'] == 'categoria':
+            colonne[colonna['nome']] = pd.Categorical.from_codes(valori, categories=colonna['categorie'])
+        else:
+            colonne[colonna['nome']] = valori
+    return pd.DataFrame(colonne, copy=False)
+
+
+def carica_dataset(percorso_csv=None, rigenera=False, cartella_cache=CARTELLA_CACHE):
+    """
+    Restituisce il dataset pulito, dalla cache se il CSV non è cambiato.
+
+    Args:
+        percorso_csv: CSV da leggere (predefinito: PERSO_DATASET o PERCORSO_DATASET)
+        rigenera: ignora la cache esistente e rilegge il CSV
+    """
+    percorso_csv = percorso_csv or percorso_dataset()
+    chiave = chiave_sorgente(percorso_csv)
+    cartella = cartella_cache_per(percorso_csv, cartella_cache)
+
+    if not rigenera:
+        df = leggi_cache(cartella, chiave)
+        if df is not None:
+            return df
+
+    df = pulisci_dataset(pd.read_csv(percorso_csv))
+    try:
+        salva_cache(df, cartella, chiave)
+    except OSError as e:
+        print(f"⚠️  Impossibile salvare la cache in {cartella}: {e}")
+        return df
+    # Si restituisce la versione mappata, identica a quella delle esecuzioni successive
+    return leggi_cache(cartella, chiave)
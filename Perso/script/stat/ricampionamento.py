@@ -0,0 +1,236 @@
+"""
+Test di permutazione e intervalli di confidenza bootstrap tra due gruppi (predefiniti:
+Introvert ed Extrovert) per tutte le colonne numeriche e Sì/No del dataset di personalità.
+
+La statistica è la differenza tra le medie dei due gruppi. I ricampionamenti sono
+vettorizzati a blocchi, con al più --max-elementi valori in memoria per blocco:
+- se una colonna ha pochi valori distinti (le risposte del questionario sono interi 0-11 o
+  Sì/No) si estraggono direttamente i conteggi di ogni valore, con la distribuzione
+  ipergeometrica multivariata per le permutazioni e la multinomiale per il bootstrap:
+  il costo non dipende dal numero di righe;
+- altrimenti si estraggono matrici di indici (una riga per ricampionamento).
+Ogni colonna ha un proprio generatore derivato da un SeedSequence, quindi i risultati non
+cambiano con il numero di processi (--processi) tra cui sono divise le colonne.
+
+    python ricampionamento.py
+    python ricampionamento.py --permutazioni 50000 --bootstrap 20000 --processi 4 --json
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import carica_dataset
+from analisi import Cronometro, prepara_colonne
+
+# Oltre questo numero di valori distinti si ricampionano gli indici invece dei conteggi
+MAX_LIVELLI = 256
+MAX_ELEMENTI = 2 ** 22
+
+
+def dimensione_blocco(totale, elementi_per_ricampionamento, max_elementi):
+    """Numero di ricampionamenti per blocco perché ogni matrice resti sotto max_elementi"""
+    return int(min(totale, max(1, max_elementi // max(1, elementi_per_ricampionamento))))
+
+
+def somme_permutazione(valori, n_a, ricampionamenti, rng, max_elementi=MAX_ELEMENTI):
+    """
+    Somma dei valori assegnati al primo gruppo in ogni permutazione delle etichette.
+
+    Returns:
+        tuple: (array delle somme, metodo usato: 'conteggi' o 'indici')
+    """
+    livelli, conteggi = np.unique(valori, return_counts=True)
+    somme = np.empty(ricampionamenti)
+    if len(livelli) <= MAX_LIVELLI:
+        # Quante volte ogni valore finisce nel primo gruppo: ipergeometrica multivariata
+        blocco = dimensione_blocco(ricampionamenti, len(livelli), max_elementi)
+        for inizio in range(0, ricampionamenti, blocco):
+            m = min(blocco, ricampionamenti - inizio)
+            estratti = rng.multivariate_hypergeometric(conteggi, n_a, size=m)
+            somme[inizio:inizio + m] = estratti @ livelli
+        return somme, 'conteggi'
+
+    blocco = dimensione_blocco(ricampionamenti, len(valori), max_elementi)
+    for inizio in range(0, ricampionamenti, blocco):
+        m = min(blocco, ricampionamenti - inizio)
+        # I primi n_a indici di una permutazione casuale: argpartition di chiavi uniformi
+        indici = rng.random((m, len(valori))).argpartition(n_a - 1, axis=1)[:, :n_a]
+        somme[inizio:inizio + m] = valori[indici].sum(axis=1)
+    return somme, 'indici'
+
+
+def medie_bootstrap(valori, ricampionamenti, rng, max_elementi=MAX_ELEMENTI):
+    """Media di ogni ricampionamento con reinserimento dei valori di un gruppo"""
+    livelli, conteggi = np.unique(valori, return_counts=True)
+    medie = np.empty(ricampionamenti)
+    if len(livelli) <= MAX_LIVELLI:
+        # Quante volte viene estratto ogni valore: multinomiale
+        blocco = dimensione_blocco(ricampionamenti, len(livelli), max_elementi)
+        for inizio in range(0, ricampionamenti, blocco):
+            m = min(blocco, ricampionamenti - inizio)
+            estratti = rng.multinomial(len(valori), conteggi / len(valori), size=m)
+            medie[inizio:inizio + m] = estratti @ livelli / len(valori)
+        return medie
+
+    blocco = dimensione_blocco(ricampionamenti, len(valori), max_elementi)
+    for inizio in range(0, ricampionamenti, blocco):
+        m = min(blocco, ricampionamenti - inizio)
+        medie[inizio:inizio + m] = valori[rng.integers(0, len(valori), size=(m, len(valori)))].mean(axis=1)
+    return medie
+
+
+def ricampiona_colonna(colonna, a, b, permutazioni, bootstrap, confidenza, seme, max_elementi=MAX_ELEMENTI):
+    """
+    Test di permutazione bilaterale e intervallo bootstrap percentile della differenza
+    tra le medie di a e b. Usata anche come funzione dei processi paralleli.
+    """
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    risultato = {'colonna': colonna, 'n_a': len(a), 'n_b': len(b)}
+    if not len(a) or not len(b):
+        return risultato
+
+    seme_permutazioni, seme_bootstrap = seme.spawn(2)
+    differenza = a.mean() - b.mean()
+    risultato.update({'media_a': a.mean(), 'media_b': b.mean(), 'differenza': differenza})
+
+    if permutazioni:
+        valori = np.concatenate([a, b])
+        somme_a, metodo = somme_permutazione(valori, len(a), permutazioni,
+                                             np.random.default_rng(seme_permutazioni), max_elementi)
+        differenze = somme_a / len(a) - (valori.sum() - somme_a) / len(b)
+        # Tolleranza relativa: una permutazione identica ai dati non deve risultare "meno estrema" per arrotondamento
+        estreme = np.count_nonzero(np.abs(differenze) >= abs(differenza) * (1 - 1e-9))
+        risultato.update({'p_value': (estreme + 1) / (permutazioni + 1), 'metodo': metodo})
+
+    if bootstrap:
+        rng = np.random.default_rng(seme_bootstrap)
+        differenze = medie_bootstrap(a, bootstrap, rng, max_elementi) - medie_bootstrap(b, bootstrap, rng, max_elementi)
+        alfa = (1 - confidenza) / 2
+        risultato['ic_basso'], risultato['ic_alto'] = np.quantile(differenze, [alfa, 1 - alfa])
+    return risultato
+
+
+def ricampiona(valori, gruppi, gruppo_a, gruppo_b, permutazioni=10_000, bootstrap=10_000,
+               confidenza=0.95, seme=42, processi=1, max_elementi=MAX_ELEMENTI):
+    """
+    Esegue i test per tutte le colonne di 'valori' tra le righe di gruppo_a e gruppo_b.
+
+    Returns:
+        pd.DataFrame: una riga per colonna con medie, differenza, p-value e intervallo
+    """
+    maschera_a = (gruppi == gruppo_a).to_numpy()
+    maschera_b = (gruppi == gruppo_b).to_numpy()
+    colonne = list(valori.columns)
+    semi = np.random.SeedSequence(seme).spawn(len(colonne))
+    argomenti = [(colonna, valori[colonna].to_numpy(dtype=np.float64)[maschera_a],
+                  valori[colonna].to_numpy(dtype=np.float64)[maschera_b],
+                  permutazioni, bootstrap, confidenza, seme_colonna, max_elementi)
+                 for colonna, seme_colonna in zip(colonne, semi)]
+
+    if processi > 1 and len(colonne) > 1:
+        with ProcessPoolExecutor(max_workers=min(processi, len(colonne))) as pool:
+            risultati = list(pool.map(ricampiona_colonna, *zip(*argomenti)))
+    else:
+        risultati = [ricampiona_colonna(*parametri) for parametri in argomenti]
+    return pd.DataFrame(risultati).set_index('colonna')
+
+
+def stampa_testo(tabella, gruppo_a, gruppo_b, confidenza, permutazioni, bootstrap):
+    """Stampa la tabella dei risultati"""
+    print("=" * 96)
+    print(f"TEST DI RICAMPIONAMENTO: {gruppo_a} vs {gruppo_b} "
+          f"({permutazioni:,} permutazioni, {bootstrap:,} bootstrap)")
+    print("=" * 96)
+    print(f"{'Colonna':<26} {gruppo_a[:10]:>10} {gruppo_b[:10]:>10} {'differenza':>11} "
+          f"{f'IC {confidenza:.0%}':>20} {'p-value':>10}")
+    for colonna, riga in tabella.iterrows():
+        if not riga['n_a'] or not riga['n_b']:
+            print(f"{colonna:<26} dati insufficienti")
+            continue
+        intervallo = f"[{riga['ic_basso']:.3f}, {riga['ic_alto']:.3f}]" if 'ic_basso' in riga and pd.notna(riga['ic_basso']) else "-"
+        p_value = f"{riga['p_value']:.2e}" if 'p_value' in riga and pd.notna(riga['p_value']) else "-"
+        print(f"{colonna:<26} {riga['media_a']:>10.3f} {riga['media_b']:>10.3f} {riga['differenza'] + 0.0:>11.3f} "
+              f"{intervallo:>20} {p_value:>10}")
+    if permutazioni:
+        print(f"\nIl p-value minimo ottenibile con {permutazioni:,} permutazioni è {1 / (permutazioni + 1):.2e}.")
+
+
+def main():
+    """Funzione principale"""
+    parser = argparse.ArgumentParser(description="Test di permutazione e intervalli bootstrap tra due gruppi.")
+    parser.add_argument("--csv", help="CSV da analizzare. Predefinito: PERSO_DATASET o il percorso di dataset_cache.py.")
+    parser.add_argument("--gruppo", default="Personality", help="Colonna dei gruppi. Predefinito: Personality.")
+    parser.add_argument("--confronto", nargs=2, default=["Introvert", "Extrovert"], metavar=("A", "B"),
+                        help="I due gruppi da confrontare. Predefinito: Introvert Extrovert.")
+    parser.add_argument("--permutazioni", type=int, default=10_000, help="Numero di permutazioni. Predefinito: 10000.")
+    parser.add_argument("--bootstrap", type=int, default=10_000, help="Numero di ricampionamenti bootstrap. Predefinito: 10000.")
+    parser.add_argument("--confidenza", type=float, default=0.95, help="Livello dell'intervallo bootstrap. Predefinito: 0.95.")
+    parser.add_argument("--seme", type=int, default=42, help="Seme dei generatori casuali. Predefinito: 42.")
+    parser.add_argument("--processi", "-j", type=int, default=1, help="Processi tra cui dividere le colonne. Predefinito: 1.")
+    parser.add_argument("--max-elementi", type=int, default=MAX_ELEMENTI,
+                        help=f"Valori massimi per matrice di ricampionamento (limita la memoria). Predefinito: {MAX_ELEMENTI}.")
+    parser.add_argument("--json", action="store_true", help="Salva i risultati in ricampionamento.json.")
+    parser.add_argument("--output-dir", "-o", default=".", help="Cartella per ricampionamento.json. Predefinito: cartella corrente.")
+    parser.add_argument("--rigenera-cache", action="store_true", help="Rilegge il CSV ignorando la cache.")
+    args = parser.parse_args()
+
+    if not 0 < args.confidenza < 1 or args.permutazioni < 0 or args.bootstrap < 0:
+        print("[ERRORE] Servono 0 < confidenza < 1 e un numero di ricampionamenti non negativo")
+        return 1
+
+    cronometro = Cronometro()
+    try:
+        with cronometro.fase("caricamento"):
+            df = carica_dataset(args.csv, rigenera=args.rigenera_cache)
+    except (OSError, pd.errors.ParserError) as e:
+        print(f"[ERRORE] {e}")
+        return 1
+    if args.gruppo not in df.columns:
+        print(f"[ERRORE] Colonna '{args.gruppo}' non presente (colonne: {list(df.columns)})")
+        return 1
+
+    gruppo_a, gruppo_b = args.confronto
+    with cronometro.fase("preparazione"):
+        df = df.dropna(subset=[args.gruppo])
+        valori, _, _ = prepara_colonne(df, args.gruppo)
+        gruppi = df[args.gruppo].astype(str).str.strip()
+    for nome in args.confronto:
+        if not (gruppi == nome).any():
+            print(f"[ERRORE] Gruppo '{nome}' non presente (gruppi: {sorted(gruppi.unique())})")
+            return 1
+
+    with cronometro.fase("ricampionamento"):
+        tabella = ricampiona(valori, gruppi, gruppo_a, gruppo_b, args.permutazioni, args.bootstrap,
+                             args.confidenza, args.seme, max(1, args.processi), args.max_elementi)
+    stampa_testo(tabella, gruppo_a, gruppo_b, args.confidenza, args.permutazioni, args.bootstrap)
+
+    if args.json:
+        os.makedirs(args.output_dir, exist_ok=True)
+        percorso = os.path.join(args.output_dir, "ricampionamento.json")
+        risultati = {
+            'gruppi': [gruppo_a, gruppo_b],
+            'permutazioni': args.permutazioni,
+            'bootstrap': args.bootstrap,
+            'confidenza': args.confidenza,
+            'seme': args.seme,
+            'colonne': {colonna: {k: (v.item() if isinstance(v, np.generic) else v) for k, v in riga.items() if pd.notna(v)}
+                        for colonna, riga in tabella.to_dict(orient='index').items()},
+        }
+        with open(percorso, 'w', encoding='utf-8') as f:
+            json.dump(risultati, f, ensure_ascii=False, indent=4)
+        print(f"💾 Risultati salvati in: {percorso}")
+
+    print("\n⏱️  TEMPI")
+    for fase, secondi in cronometro.tempi.items():
+        print(f"  {fase:<16} {secondi * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Benchmark della pipeline Youth su dati sintetici, eseguibile interamente offline.
+Genera trascrizioni in formato Whisper e audio simile al parlato, misura converter,
+reporter e transcriber e salva i risultati per confrontarli tra commit diversi.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import contextlib
+from pathlib import Path
+from datetime import datetime
+
+CARTELLA_SCRIPT = Path(__file__).resolve().parent
+CARTELLA_RISULTATI = CARTELLA_SCRIPT / "risultati_benchmark"
+
+BENCHMARK = ["converter", "reporter", "reporter_corpus", "transcriber", "avvio"]
+
+# Comandi usati per misurare l'avvio degli script: --help per quelli con argparse,
+# il solo import per quelli interattivi
+COMANDI_AVVIO = {
+    "transcriber": ["transcriber.py", "--help"],
+    "streamer": ["streamer.py", "--help"],
+    "fingerprint": ["fingerprint.py", "--help"],
+    "compactor": ["compactor.py", "--help"],
+    "converter": ["converter.py", "--help"],
+    "reporter": ["reporter.py", "--help"],
+    "downloader": ["-c", "import downloader"],
+    "extractor": ["-c", "import extractor"],
+}
+
+# Dipendenze lente da importare che non devono essere caricate all'avvio
+MODULI_PESANTI = {"whisper", "torch", "numpy", "scipy", "yt_dlp", "tiktoken", "numba"}
+
+# Parole usate per le trascrizioni sintetiche: concetti di probabilità e parlato di contorno
+PAROLE_TECNICHE = [
+    "probabilità", "evento", "spazio campionario", "variabile aleatoria", "distribuzione",
+    "binomiale", "poisson", "normale", "gaussiana", "esponenziale", "valore atteso", "varianza",
+    "covarianza", "bayes", "condizionata", "indipendenza", "limite centrale", "grandi numeri",
+    "convergenza", "densità", "ripartizione", "martingala", "catena markov", "P(A|B)", "E[X]"
+]
+PAROLE_COMUNI = [
+    "allora", "vediamo", "quindi", "questo", "esempio", "definizione", "teorema", "consideriamo",
+    "abbiamo", "calcoliamo", "la", "il", "di", "che", "un", "una", "per", "con", "se", "è",
+    "otteniamo", "risultato", "formula", "numero", "caso", "osservazione", "dimostrazione"
+]
+
+
+def genera_trascrizione(rng, minuti):
+    """Genera un dizionario con la stessa struttura del risultato di Whisper."""
+    segmenti = []
+    tempo = 0.0
+    while tempo < minuti * 60:
+        durata = rng.uniform(2.0, 8.0)
+        n_parole = max(3, int(durata * 2.5))
+        parole = [rng.choice(PAROLE_TECNICHE) if rng.random() < 0.15 else rng.choice(PAROLE_COMUNI)
+                  for _ in range(n_parole)]
+        passo = durata / n_parole
+        segmenti.append({
+            'id': len(segmenti),
+            'seek': int(tempo * 100),
+            'start': round(tempo, 2),
+            'end': round(tempo + durata, 2),
+            'text': " " + " ".join(parole),
+            'tokens': [rng.randrange(50000) for _ in range(n_parole * 2)],
+            'temperature': 0.0,
+            'avg_logprob': round(rng.uniform(-0.6, -0.1), 4),
+            'compression_ratio': round(rng.uniform(1.2, 2.0), 4),
+            'no_speech_prob': round(rng.uniform(0.0, 0.1), 4),
+            'words': [{'word': " " + p,
+                       'start': round(tempo + i * passo, 2),
+                       'end': round(tempo + (i + 1) * passo, 2),
+                       'probability': round(rng.uniform(0.5, 1.0), 4)}
+                      for i, p in enumerate(parole)]
+        })
+        tempo += durata + rng.uniform(0.0, 1.0)
+
+    return {'text': "".join(s['text'] for s in segmenti), 'segments': segmenti, 'language': 'it'}
+
+
+def genera_trascrizioni(cartella, numero, minuti, seme=42):
+    """Scrive nella cartella 'numero' trascrizioni JSON sintetiche da 'minuti' minuti."""
+    rng = random.Random(seme)
+    cartella = Path(cartella)
+    cartella.mkdir(parents=True, exist_ok=True)
+    for i in range(numero):
+        percorso = cartella / f"TRASCRIZIONE_lezione_{i:04d}_20240101_000000.json"
+        with open(percorso, 'w', encoding='utf-8') as f:
+            json.dump(genera_trascrizione(rng, minuti), f, ensure_ascii=False, indent=4)
+
+
+def genera_audio(percorso, secondi, seme=42, frequenza=16000):
+    """
+    Scrive un file WAV mono simile al parlato: impulsi glottali con intonazione variabile,
+    filtrati da formanti che cambiano a ogni sillaba (circa 4 al secondo) e separati da pause.
+    """
+    import wave
+    import numpy as np
+
+    rng = np.random.default_rng(seme)
+    n = int(secondi * frequenza)
+    t = np.arange(n) / frequenza
+
+    # Intonazione tra 100 e 220 Hz che varia lentamente
+    f0 = 160 + 60 * np.sin(2 * np.pi * 0.2 * t + rng.uniform(0, 2 * np.pi))
+    fase = np.cumsum(f0) / frequenza
+    segnale = np.zeros(n, dtype=np.float64)
+    for armonica in range(1, 25):
+        segnale += np.sin(2 * np.pi * armonica * fase) / armonica
+
+    # Formanti: ogni sillaba enfatizza bande diverse
+    durata_sillaba = int(0.25 * frequenza)
+    for inizio in range(0, n, durata_sillaba):
+        blocco = slice(inizio, min(inizio + durata_sillaba, n))
+        spettro = np.fft.rfft(segnale[blocco])
+        frequenze = np.fft.rfftfreq(blocco.stop - blocco.start, 1 / frequenza)
+        guadagno = np.zeros_like(frequenze)
+        for formante in (rng.uniform(300, 900), rng.uniform(900, 2500), rng.uniform(2500, 3500)):
+            guadagno += np.exp(-((frequenze - formante) / 150) ** 2)
+        segnale[blocco] = np.fft.irfft(spettro * guadagno, n=blocco.stop - blocco.start)
+
+    # Inviluppo sillabico con pause tra le frasi
+    inviluppo = 0.5 * (1 - np.cos(2 * np.pi * 4 * t))
+    inviluppo *= (np.sin(2 * np.pi * 0.15 * t) > -0.7)
+    segnale = segnale * inviluppo + 0.01 * rng.standard_normal(n)
+    segnale = (segnale / (np.abs(segnale).max() + 1e-9) * 0.8 * 32767).astype(np.int16)
+
+    with wave.open(str(percorso), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(frequenza)
+        f.writeframes(segnale.tobytes())
+
+
+def dimensione_cartella(cartella, pattern):
+    """Restituisce numero e byte totali dei file della cartella che corrispondono al pattern."""
+    file_trovati = list(Path(cartella).glob(pattern))
+    return len(file_trovati), sum(f.stat().st_size for f in file_trovati)
+
+
+def esegui_worker(nome, parametri):
+    """
+    Esegue un singolo benchmark nel processo corrente e restituisce le misure.
+    Viene lanciato in un sottoprocesso, così il picco di memoria riguarda solo questo benchmark.
+    """
+    sys.path.insert(0, str(CARTELLA_SCRIPT))
+    dati = Path(parametri['dati'])
+    uscita = Path(tempfile.mkdtemp(prefix="youth_bench_"))
+
+    with open(os.devnull, 'w') as nulla, contextlib.redirect_stdout(nulla):
+        if nome == "converter":
+            from converter import JsonToTextConverter
+            n_file, byte = dimensione_cartella(dati, "*.json")
+            converter = JsonToTextConverter(uscita)
+            inizio = time.perf_counter()
+            for json_path in sorted(dati.glob("*.json")):
+                converter.converti_json_in_testo(json_path, include_timestamps=True)
+            durata = time.perf_counter() - inizio
+
+        elif nome == "reporter":
+            from reporter import FolderReportGenerator
+            n_file, byte = dimensione_cartella(dati, "*.json")
+            reporter = FolderReportGenerator()
+            inizio = time.perf_counter()
+            reporter.processa_cartella(dati, uscita / "argomenti.txt")
+            durata = time.perf_counter() - inizio
+
+        elif nome == "reporter_corpus":
+            from reporter import CorpusAnalyzer
+            n_file, byte = dimensione_cartella(dati, "*.json")
+            inizio = time.perf_counter()
+            CorpusAnalyzer().processa_corpus(dati, uscita / "corpus.json")
+            durata = time.perf_counter() - inizio
+
+        elif nome == "transcriber":
+            from transcriber import Transcriber
+            n_file, byte = dimensione_cartella(dati, "*.wav")
+            transcriber = Transcriber("tiny", uscita)
+            if not transcriber.carica_modello():
+                return {'errore': "caricamento del modello tiny non riuscito"}
+            inizio = time.perf_counter()
+            for audio_path in sorted(dati.glob("*.wav")):
+                transcriber.processa_trascrizione(audio_path)
+            durata = time.perf_counter() - inizio
+
+        else:
+            return {'errore': f"benchmark sconosciuto: {nome}"}
+
+    shutil.rmtree(uscita, ignore_errors=True)
+    misure = {
+        'file': n_file,
+        'byte': byte,
+        'secondi': round(durata, 4),
+        'file_al_secondo': round(n_file / durata, 3) if durata else None,
+        'mb_al_secondo': round(byte / 1e6 / durata, 3) if durata else None,
+        # Su Linux ru_maxrss è espresso in KB
+        'picco_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if nome == "transcriber":
+        misure['secondi_audio_al_secondo'] = round(parametri['secondi_audio'] * n_file / durata, 3)
+    return misure
+
+
+def lancia_worker(nome, parametri):
+    """Esegue un benchmark in un processo Python separato."""
+    comando = [sys.executable, str(Path(__file__).resolve()), "_worker", nome, json.dumps(parametri)]
+    esito = subprocess.run(comando, capture_output=True, text=True)
+    if esito.returncode != 0:
+        return {'errore': esito.stderr.strip().splitlines()[-1] if esito.stderr.strip() else "errore sconosciuto"}
+    return json.loads(esito.stdout.strip().splitlines()[-1])
+
+
+def modello_tiny_disponibile():
+    """Verifica che il modello Whisper tiny sia già in cache, così il benchmark resta offline."""
+    cartella = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "whisper"
+    return any(cartella.glob("tiny*.pt"))
+
+
+def misura_avvio(script, ripetizioni):
+    """
+    Avvia lo script con python -X importtime e restituisce il tempo di avvio (mediana),
+    il tempo totale di import e le eventuali dipendenze pesanti caricate.
+    """
+    comando = [sys.executable, "-X", "importtime"] + COMANDI_AVVIO[script]
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        esito = subprocess.run(comando, cwd=CARTELLA_SCRIPT, capture_output=True, text=True)
+        tempi.append(time.perf_counter() - inizio)
+
+    # Righe nel formato "import time: self [us] | cumulative | modulo"
+    moduli = {}
+    for riga in esito.stderr.splitlines():
+        if not riga.startswith("import time:") or "cumulative" in riga:
+            continue
+        _, cumulativo, modulo = riga[len("import time:"):].split("|")
+        if not modulo.startswith("  "):
+            # Solo i moduli di primo livello, per non contare due volte i tempi
+            moduli[modulo.strip()] = int(cumulativo)
+
+    return {
+        'secondi': round(statistics.median(tempi), 4),
+        'import_ms': round(sum(moduli.values()) / 1000, 1),
+        'codice_uscita': esito.returncode,
+        'moduli_pesanti': sorted({m.split(".")[0] for m in moduli} & MODULI_PESANTI),
+    }
+
+
+def commit_corrente():
+    """Restituisce l'hash breve del commit corrente, se disponibile."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CARTELLA_SCRIPT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return "sconosciuto"
+
+
+def confronta_risultati(attuali, precedenti):
+    """Stampa la variazione dei tempi rispetto a un'esecuzione precedente."""
+    print(f"\n📈 Confronto con il commit {precedenti.get('commit')} ({precedenti.get('data')}):")
+    for nome, misure in attuali['benchmark'].items():
+        vecchie = precedenti.get('benchmark', {}).get(nome)
+        if not vecchie or 'secondi' not in vecchie or 'secondi' not in misure:
+            continue
+        variazione = (misure['secondi'] - vecchie['secondi']) / vecchie['secondi'] * 100
+        simbolo = "⚠️" if variazione > 10 else "✓"
+        print(f"  {simbolo} {nome:<16} {vecchie['secondi']:>9.3f}s → {misure['secondi']:>9.3f}s ({variazione:+.1f}%)")
+
+
+def main():
+    """Funzione principale per gestire gli argomenti della riga di comando."""
+    if len(sys.argv) > 1 and sys.argv[1] == "_worker":
+        print(json.dumps(esegui_worker(sys.argv[2], json.loads(sys.argv[3]))))
+        return
+
+    print("=" * 60)
+    print("          BENCHMARK PIPELINE YOUTH")
+    print("=" * 60 + "\n")
+
+    parser = argparse.ArgumentParser(description="Misura le prestazioni degli script Youth su dati sintetici.")
+    parser.add_argument("--solo", nargs="+", choices=BENCHMARK, default=BENCHMARK,
+                        help="Benchmark da eseguire. Predefinito: tutti.")
+    parser.add_argument("--trascrizioni", type=int, default=100,
+                        help="Numero di trascrizioni sintetiche. Predefinito: 100.")
+    parser.add_argument("--minuti", type=float, default=60,
+                        help="Durata in minuti di ogni trascrizione sintetica. Predefinito: 60.")
+    parser.add_argument("--audio", type=int, default=2,
+                        help="Numero di file audio sintetici per il transcriber. Predefinito: 2.")
+    parser.add_argument("--secondi-audio", type=float, default=60,
+                        help="Durata in secondi di ogni file audio sintetico. Predefinito: 60.")
+    parser.add_argument("--ripetizioni", type=int, default=3,
+                        help="Ripetizioni di ogni benchmark (si riporta la mediana). Predefinito: 3.")
+    parser.add_argument("--confronta", help="File di risultati con cui confrontarsi (predefinito: il più recente).")
+    args = parser.parse_args()
+
+    cartella_dati = Path(tempfile.mkdtemp(prefix="youth_bench_dati_"))
+    if set(args.solo) - {"avvio", "transcriber"}:
+        print(f"🧪 Generazione dati sintetici in: {cartella_dati}")
+        genera_trascrizioni(cartella_dati / "trascrizioni", args.trascrizioni, args.minuti)
+
+    parametri_audio = {'dati': str(cartella_dati / "audio"), 'secondi_audio': args.secondi_audio}
+    if "transcriber" in args.solo:
+        if modello_tiny_disponibile():
+            (cartella_dati / "audio").mkdir()
+            for i in range(args.audio):
+                genera_audio(cartella_dati / "audio" / f"lezione_{i:02d}.wav", args.secondi_audio, seme=i)
+        else:
+            print("⚠️ Modello Whisper tiny non presente in cache: benchmark del transcriber saltato.")
+            print("   Scaricalo una volta (con rete) eseguendo transcriber.py --model tiny su un file qualsiasi.")
+            args.solo = [b for b in args.solo if b != "transcriber"]
+
+    risultati = {
+        'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit_corrente(),
+        'python': platform.python_version(),
+        'sistema': platform.platform(),
+        'cpu': os.cpu_count(),
+        'parametri': vars(args),
+        'benchmark': {}
+    }
+
+    avvio_lento = []
+    if "avvio" in args.solo:
+        print("🚀 Tempi di avvio (python -X importtime):")
+        for script in COMANDI_AVVIO:
+            misure = misura_avvio(script, args.ripetizioni)
+            risultati['benchmark'][f"avvio_{script}"] = misure
+            if misure['moduli_pesanti'] or misure['codice_uscita'] != 0:
+                avvio_lento.append(script)
+            simbolo = "❌" if script in avvio_lento else "✓"
+            if misure['moduli_pesanti']:
+                pesanti = f"  moduli pesanti: {', '.join(misure['moduli_pesanti'])}"
+            elif misure['codice_uscita'] != 0:
+                pesanti = f"  uscita con codice {misure['codice_uscita']}"
+            else:
+                pesanti = ""
+            print(f"{simbolo} {script:<16} {misure['secondi']:>9.3f}s  import {misure['import_ms']:>8.1f} ms{pesanti}")
+
+    for nome in (b for b in args.solo if b != "avvio"):
+        parametri = parametri_audio if nome == "transcriber" else {'dati': str(cartella_dati / "trascrizioni")}
+        misure = [lancia_worker(nome, parametri) for _ in range(args.ripetizioni)]
+        riuscite = [m for m in misure if 'errore' not in m]
+        if not riuscite:
+            risultati['benchmark'][nome] = misure[0]
+            print(f"❌ {nome}: {misure[0]['errore']}")
+            continue
+
+        mediana = sorted(riuscite, key=lambda m: m['secondi'])[len(riuscite) // 2]
+        mediana = dict(mediana, secondi_tutte=[m['secondi'] for m in riuscite],
+                       deviazione=round(statistics.pstdev(m['secondi'] for m in riuscite), 4))
+        risultati['benchmark'][nome] = mediana
+        print(f"✓ {nome:<16} {mediana['secondi']:>9.3f}s  {mediana['file_al_secondo']:>8.2f} file/s  "
+              f"{mediana['mb_al_secondo']:>8.2f} MB/s  picco RSS {mediana['picco_rss_mb']:.0f} MB")
+
+    shutil.rmtree(cartella_dati, ignore_errors=True)
+
+    precedenti = None
+    if args.confronta:
+        with open(args.confronta, 'r', encoding='utf-8') as f:
+            precedenti = json.load(f)
+    elif CARTELLA_RISULTATI.exists():
+        file_precedenti = sorted(CARTELLA_RISULTATI.glob("benchmark_*.json"))
+        if file_precedenti:
+            with open(file_precedenti[-1], 'r', encoding='utf-8') as f:
+                precedenti = json.load(f)
+
+    CARTELLA_RISULTATI.mkdir(exist_ok=True)
+    nome_file = f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{risultati['commit']}.json"
+    with open(CARTELLA_RISULTATI / nome_file, 'w', encoding='utf-8') as f:
+        json.dump(risultati, f, ensure_ascii=False, indent=4)
+    print(f"\n💾 Risultati salvati in: {CARTELLA_RISULTATI / nome_file}")
+
+    if precedenti:
+        confronta_risultati(risultati, precedenti)
+
+    if avvio_lento:
+        print(f"\n❌ Avvio non riuscito o con dipendenze pesanti: {', '.join(avvio_lento)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
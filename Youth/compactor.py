@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Script per compattare i file audio/video già trascritti: li converte in audio Opus
+a basso bitrate ottimizzato per il parlato oppure li sposta in una cartella di archivio.
+"""
+
+import os
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from transcriber import SUPPORTED_EXTENSIONS, trova_trascrizione, durata_audio
+
+
+def formatta_byte(n):
+    """Formatta un numero di byte in forma leggibile."""
+    for unita in ["B", "KB", "MB", "GB"]:
+        if abs(n) < 1024:
+            return f"{n:.1f} {unita}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+class MediaCompactor:
+    """
+    Classe per compattare i file multimediali che hanno già una trascrizione.
+    """
+    def __init__(self, cartella_trascrizioni, modalita="opus", cartella_fredda=None,
+                 bitrate="24k", processi=None, dry_run=False):
+        self.cartella_trascrizioni = Path(cartella_trascrizioni)
+        self.modalita = modalita
+        self.cartella_fredda = Path(cartella_fredda) if cartella_fredda else None
+        self.bitrate = bitrate
+        self.processi = processi or os.cpu_count()
+        self.dry_run = dry_run
+
+    def trova_candidati(self, cartella_media):
+        """Restituisce i file multimediali della cartella che hanno già una trascrizione."""
+        candidati = []
+        for file_path in sorted(Path(cartella_media).iterdir()):
+            if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            if self.modalita == "opus" and file_path.suffix.lower() == ".opus":
+                continue
+            if trova_trascrizione(self.cartella_trascrizioni, file_path):
+                candidati.append(file_path)
+        return candidati
+
+    def separa_omonimi(self, candidati):
+        """
+        In modalità Opus due file con lo stesso nome e estensioni diverse (talk.mp4 e talk.webm)
+        produrrebbero lo stesso talk.opus: vengono esclusi e segnalati come errore.
+        """
+        if self.modalita != "opus":
+            return candidati, []
+        per_nome = {}
+        for file_path in candidati:
+            per_nome.setdefault(file_path.stem, []).append(file_path)
+        validi = [file_path for file_path in candidati if len(per_nome[file_path.stem]) == 1]
+        esiti = [{'file': file_path.name, 'byte_prima': file_path.stat().st_size,
+                  'byte_dopo': file_path.stat().st_size,
+                  'errore': f"stesso nome di {', '.join(f.name for f in per_nome[file_path.stem] if f != file_path)}"}
+                 for file_path in candidati if len(per_nome[file_path.stem]) > 1]
+        return validi, esiti
+
+    def converti_in_opus(self, file_path):
+        """Converte il file in audio Opus mono e rimuove l'originale dopo la verifica."""
+        destinazione = file_path.with_suffix(".opus")
+        if destinazione.exists():
+            raise RuntimeError(f"{destinazione.name} esiste già")
+        # Il file temporaneo conserva l'estensione originale, così non coincide con quello di un omonimo
+        temporaneo = file_path.with_name(file_path.name + ".opus.tmp")
+        command = [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-i", str(file_path),
+            "-vn", "-ac", "1",
+            "-c:a", "libopus", "-b:a", self.bitrate, "-application", "voip",
+            "-f", "ogg", str(temporaneo)
+        ]
+        try:
+            subprocess.run(command, check=True)
+
+            # Verifica che la durata sia stata conservata prima di eliminare l'originale
+            durata_originale = durata_audio(file_path)
+            durata_compattata = durata_audio(temporaneo)
+            if durata_originale is None or durata_compattata is None:
+                raise RuntimeError("impossibile verificare la durata, originale conservato")
+            if abs(durata_originale - durata_compattata) > 2:
+                raise RuntimeError(f"durata non corrispondente ({durata_originale:.0f}s → {durata_compattata:.0f}s)")
+
+            os.replace(temporaneo, destinazione)
+        finally:
+            # In caso di errore (anche di ffmpeg) il file parziale non resta nella cartella
+            temporaneo.unlink(missing_ok=True)
+        file_path.unlink()
+        return destinazione
+
+    def stima_opus(self, file_path):
+        """Stima la dimensione del file Opus in base a durata e bitrate."""
+        durata = durata_audio(file_path)
+        if durata is None:
+            return None
+        bitrate = float(self.bitrate.lower().rstrip("k")) * (1000 if self.bitrate.lower().endswith("k") else 1)
+        return int(durata * bitrate / 8)
+
+    def compatta_file(self, file_path):
+        """Compatta un singolo file e restituisce l'esito con i byte liberati."""
+        byte_prima = file_path.stat().st_size
+        esito = {'file': file_path.name, 'byte_prima': byte_prima, 'byte_dopo': byte_prima, 'errore': None}
+
+        try:
+            if self.modalita == "opus":
+                if self.dry_run:
+                    stima = self.stima_opus(file_path)
+                    esito['byte_dopo'] = stima if stima is not None else byte_prima
+                else:
+                    esito['byte_dopo'] = self.converti_in_opus(file_path).stat().st_size
+            else:
+                # I file spostati non occupano più spazio sul disco di lavoro
+                destinazione = self.cartella_fredda / file_path.name
+                if destinazione.exists():
+                    raise RuntimeError(f"{destinazione} esiste già")
+                if not self.dry_run:
+                    self.cartella_fredda.mkdir(parents=True, exist_ok=True)
+                    shutil.move(str(file_path), str(destinazione))
+                esito['byte_dopo'] = 0
+        except FileNotFoundError:
+            esito['errore'] = "ffmpeg non trovato"
+        except (subprocess.CalledProcessError, RuntimeError, OSError) as e:
+            esito['errore'] = str(e)
+
+        return esito
+
+    def compatta_cartella(self, cartella_media):
+        """Compatta in parallelo tutti i file già trascritti della cartella e scrive un riepilogo."""
+        cartella_media = Path(cartella_media)
+        candidati = self.trova_candidati(cartella_media)
+        if not candidati:
+            print(f"⚠️ Nessun file già trascritto da compattare in: {cartella_media}")
+            return []
+
+        azione = "conversione in Opus" if self.modalita == "opus" else f"spostamento in {self.cartella_fredda}"
+        prefisso = "[SIMULAZIONE] " if self.dry_run else ""
+        print(f"🗜️ {prefisso}{azione} di {len(candidati)} file con {self.processi} processi")
+
+        spazio_iniziale = shutil.disk_usage(cartella_media).free
+        candidati, esiti = self.separa_omonimi(candidati)
+        for esito in esiti:
+            print(f"❌ {esito['file']}: {esito['errore']}")
+        with ThreadPoolExecutor(max_workers=self.processi) as executor:
+            futures = [executor.submit(self.compatta_file, file_path) for file_path in candidati]
+            for future in as_completed(futures):
+                esito = future.result()
+                esiti.append(esito)
+                if esito['errore']:
+                    print(f"❌ {esito['file']}: {esito['errore']}")
+                else:
+                    print(f"✓ {esito['file']}: {formatta_byte(esito['byte_prima'])} → {formatta_byte(esito['byte_dopo'])}")
+
+        self.scrivi_riepilogo(cartella_media, esiti, spazio_iniziale)
+        return esiti
+
+    def scrivi_riepilogo(self, cartella_media, esiti, spazio_iniziale):
+        """Stampa e salva il riepilogo dello spazio liberato."""
+        riusciti = [e for e in esiti if not e['errore']]
+        byte_prima = sum(e['byte_prima'] for e in riusciti)
+        byte_dopo = sum(e['byte_dopo'] for e in riusciti)
+        spazio_finale = shutil.disk_usage(cartella_media).free
+
+        righe = [
+            "RIEPILOGO COMPATTAZIONE" + (" (SIMULAZIONE)" if self.dry_run else ""),
+            f"Cartella: {cartella_media}",
+            f"Data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Modalità: {self.modalita}",
+            f"File compattati: {len(riusciti)}",
+            f"Errori: {len(esiti) - len(riusciti)}",
+            f"Occupazione prima: {formatta_byte(byte_prima)}",
+            f"Occupazione dopo: {formatta_byte(byte_dopo)}",
+            f"Spazio liberato: {formatta_byte(byte_prima - byte_dopo)}",
+            f"Spazio libero sul disco: {formatta_byte(spazio_iniziale)} → {formatta_byte(spazio_finale)}",
+        ]
+        for esito in sorted(esiti, key=lambda e: e['file']):
+            stato = f"ERRORE: {esito['errore']}" if esito['errore'] else \
+                f"{formatta_byte(esito['byte_prima'])} → {formatta_byte(esito['byte_dopo'])}"
+            righe.append(f"  {esito['file']}: {stato}")
+
+        print("\n" + "=" * 60)
+        print("\n".join(righe[:10]))
+
+        nome = "riepilogo_compattazione_simulazione.txt" if self.dry_run else "riepilogo_compattazione.txt"
+        try:
+            with open(cartella_media / nome, "w", encoding="utf-8") as f:
+                f.write("\n".join(righe) + "\n")
+        except OSError as e:
+            print(f"❌ Errore nella scrittura del riepilogo: {e}")
+
+
+def main():
+    """Funzione principale per gestire gli argomenti della riga di comando."""
+    print("=" * 60)
+    print("          MEDIA COMPACTOR")
+    print("=" * 60 + "\n")
+
+    parser = argparse.ArgumentParser(description="Compatta i file audio/video che hanno già una trascrizione.")
+    parser.add_argument("cartella", help="Cartella con i file scaricati.")
+    parser.add_argument("--trascrizioni", "-t", default="/mnt/backup_usb/Youth/",
+                        help="Cartella delle trascrizioni JSON.")
+    parser.add_argument("--sposta-in", help="Sposta i file in questa cartella di archivio invece di convertirli.")
+    parser.add_argument("--bitrate", "-b", default="24k",
+                        help="Bitrate dell'audio Opus. Predefinito: 24k.")
+    parser.add_argument("--processi", "-p", type=int, help="Numero di conversioni in parallelo.")
+    parser.add_argument("--dry-run", "-n", action="store_true",
+                        help="Mostra lo spazio che verrebbe liberato senza modificare i file.")
+
+    args = parser.parse_args()
+
+    if not Path(args.cartella).is_dir():
+        print(f"❌ Percorso non valido: {args.cartella}. Fornisci un percorso a una cartella.")
+        return
+
+    modalita = "sposta" if args.sposta_in else "opus"
+    compactor = MediaCompactor(args.trascrizioni, modalita, args.sposta_in,
+                               args.bitrate, args.processi, args.dry_run)
+    compactor.compatta_cartella(args.cartella)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ from datetime import datetime
 import sys
 import argparse
 
+from metrics import RegistroMetriche
+
+metriche = RegistroMetriche("converter")
+
 
 class JsonToTextConverter:
     """
@@ -123,20 +127,24 @@ class JsonToTextConverter:
     def converti_json_in_testo(self, json_path, include_timestamps=False):
         """Processo completo: legge JSON e salva come testo."""
         print(f"▶️ Conversione in corso per: {json_path}")
+        misura = metriche.avvia("conversione", file=json_path.name, timestamp=include_timestamps)
         
         # Verifica che il file esista
         if not json_path.exists():
             print(f"❌ File JSON non trovato: {json_path}")
+            misura.fallisce("file non trovato")
             return False
         
         # Leggi il JSON
         data = self.leggi_json_trascrizione(json_path)
         if not data:
+            misura.fallisce("JSON non leggibile")
             return False
         
         # Estrai il testo
         testo_completo, segmenti = self.estrai_testo(data)
         if not testo_completo:
+            misura.fallisce("testo assente")
             return False
         
         # Formatta il testo
@@ -146,9 +154,11 @@ class JsonToTextConverter:
         file_salvato = self.salva_testo(testo_formattato, json_path.name, include_timestamps)
         
         if file_salvato:
+            misura.termina(byte=json_path.stat().st_size, byte_output=file_salvato.stat().st_size)
             print("🎉 Conversione completata con successo!")
             return True
         
+        misura.fallisce("salvataggio non riuscito")
         return False
 
 
@@ -4,13 +4,16 @@ Scaricatore Video da File Playlist
 Legge i file di playlist generati e scarica tutti i video in una cartella dedicata
 """
 
-import yt_dlp
 import os
 import glob
 import re
 from datetime import datetime
 import sys
 
+from metrics import RegistroMetriche
+
+metriche = RegistroMetriche("downloader")
+
 def trova_file_playlist():
     """
     Trova tutti i file playlist nella directory corrente
@@ -159,6 +162,14 @@ def scarica_video(link_list, cartella_download, info_playlist):
         cartella_download (str): Cartella di destinazione
         info_playlist (dict): Informazioni playlist per log
     """
+    import yt_dlp
+    
+    # Byte dei file completati, letti dall'hook di avanzamento di yt-dlp
+    byte_scaricati = []
+    
+    def hook_avanzamento(stato):
+        if stato.get('status') == 'finished':
+            byte_scaricati.append(stato.get('total_bytes') or stato.get('downloaded_bytes') or 0)
     
     # Configurazione yt-dlp per download
     ydl_opts = {
@@ -168,6 +179,7 @@ def scarica_video(link_list, cartella_download, info_playlist):
         'writesubtitles': False,  # Non scarica sottotitoli
         'writeautomaticsub': False,
         'ignoreerrors': True,  # Continua anche se un video fallisce
+        'progress_hooks': [hook_avanzamento],
     }
     
     print(f"\n🚀 INIZIO DOWNLOAD")
@@ -182,14 +194,21 @@ def scarica_video(link_list, cartella_download, info_playlist):
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             for i, link in enumerate(link_list, 1):
+                misura = metriche.avvia("download", url=link)
                 try:
                     print(f"\n[{i:03d}/{len(link_list):03d}] Scaricando: {link}")
-                    ydl.download([link])
+                    byte_scaricati.clear()
+                    codice = ydl.download([link])
                     successi += 1
                     print(f"✓ Download completato ({i}/{len(link_list)})")
+                    if codice:
+                        misura.fallisce(f"yt-dlp ha restituito il codice {codice}")
+                    else:
+                        misura.termina(byte=sum(byte_scaricati))
                     
                 except Exception as e:
                     errori += 1
+                    misura.fallisce(e)
                     print(f"❌ Errore download: {str(e)}")
                     
                     # Salva errori in un file log
@@ -4,10 +4,230 @@ Estrattore di link da playlist YouTube
 Salva tutti i link dei video di una playlist in un file di testo
 """
 
-import yt_dlp
 import sys
+import json
+import re
+from bisect import bisect_left
+from pathlib import Path
 from datetime import datetime
 
+from metrics import RegistroMetriche
+
+metriche = RegistroMetriche("extractor")
+
+# Cartella con l'ultimo stato noto di ogni playlist sincronizzata, accanto allo script
+# così lo stato non dipende dalla cartella da cui viene lanciato
+CARTELLA_STATO = Path(__file__).resolve().parent / ".stato_playlist"
+
+def estrai_video_info(info):
+    """
+    Estrae URL, titolo, durata e ID dei video dalle informazioni della playlist
+    
+    Args:
+        info (dict): Informazioni della playlist restituite da yt-dlp
+    
+    Returns:
+        list: Lista di dizionari con le informazioni dei video
+    """
+    video_info = []
+    for entry in info['entries']:
+        if entry:  # Verifica che l'entry non sia None
+            video_id = entry.get('id', 'N/A')
+            titolo = entry.get('title', 'Titolo non disponibile')
+            url = f"https://www.youtube.com/watch?v={video_id}"
+            durata = entry.get('duration_string', 'N/A')
+            
+            video_info.append({
+                'url': url,
+                'titolo': titolo,
+                'durata': durata,
+                'id': video_id
+            })
+    return video_info
+
+def scrivi_file_playlist(nome_file_output, titolo_playlist, url_playlist, video_info, note=None):
+    """
+    Scrive il file playlist nel formato letto da downloader.py
+    
+    Args:
+        nome_file_output (str): Nome del file di output
+        titolo_playlist (str): Titolo della playlist
+        url_playlist (str): URL della playlist YouTube
+        video_info (list): Video da elencare nel file
+        note (list): Righe aggiuntive da scrivere prima dell'elenco (opzionale)
+    """
+    with open(nome_file_output, 'w', encoding='utf-8') as f:
+        f.write(f"PLAYLIST: {titolo_playlist}\n")
+        f.write(f"URL PLAYLIST: {url_playlist}\n")
+        f.write(f"NUMERO TOTALE VIDEO: {len(video_info)}\n")
+        f.write(f"DATA ESTRAZIONE: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        for riga in note or []:
+            f.write(f"{riga}\n")
+        if note:
+            f.write("=" * 80 + "\n\n")
+        
+        for i, video in enumerate(video_info, 1):
+            f.write(f"{i:03d}. {video['titolo']}\n")
+            f.write(f"     URL: {video['url']}\n")
+            f.write(f"     Durata: {video['durata']}\n")
+            f.write(f"     ID: {video['id']}\n")
+            f.write("-" * 50 + "\n")
+        
+        # Sezione solo link (per copia-incolla facile)
+        f.write("\n" + "=" * 80 + "\n")
+        f.write("SOLO LINK (per copia-incolla):\n")
+        f.write("=" * 80 + "\n")
+        for video in video_info:
+            f.write(f"{video['url']}\n")
+
+def sottosequenza_crescente(valori):
+    """
+    Indici di una sottosequenza strettamente crescente di lunghezza massima (O(n log n))
+    
+    Args:
+        valori (list): Valori distinti
+    
+    Returns:
+        set: Indici degli elementi della sottosequenza
+    """
+    finali = []          # valore finale minimo di ogni lunghezza
+    indici_finali = []   # indice dell'elemento che chiude ogni lunghezza
+    precedente = [-1] * len(valori)
+    for i, valore in enumerate(valori):
+        k = bisect_left(finali, valore)
+        if k == len(finali):
+            finali.append(valore)
+            indici_finali.append(i)
+        else:
+            finali[k] = valore
+            indici_finali[k] = i
+        precedente[i] = indici_finali[k - 1] if k else -1
+    
+    sequenza = set()
+    i = indici_finali[-1] if indici_finali else -1
+    while i >= 0:
+        sequenza.add(i)
+        i = precedente[i]
+    return sequenza
+
+def confronta_playlist(video_precedenti, video_attuali):
+    """
+    Confronta due stati di una playlist
+    
+    Args:
+        video_precedenti (list): Video dell'ultimo stato salvato
+        video_attuali (list): Video appena estratti
+    
+    Returns:
+        dict: Video aggiunti, rimossi e spostati
+    """
+    id_precedenti = [video['id'] for video in video_precedenti]
+    insieme_precedenti = set(id_precedenti)
+    insieme_attuali = {video['id'] for video in video_attuali}
+    
+    # I video comuni che mantengono l'ordine relativo sono la sottosequenza crescente più
+    # lunga delle loro posizioni precedenti: gli altri sono quelli spostati, così un solo
+    # video spostato (o un inserimento) non fa risultare spostati anche tutti i successivi
+    posizione_precedente = {v: i for i, v in enumerate(id_precedenti)}
+    comuni = [video for video in video_attuali if video['id'] in insieme_precedenti]
+    fermi = sottosequenza_crescente([posizione_precedente[video['id']] for video in comuni])
+    
+    return {
+        'aggiunti': [video for video in video_attuali if video['id'] not in insieme_precedenti],
+        'rimossi': [video for video in video_precedenti if video['id'] not in insieme_attuali],
+        'spostati': [video for i, video in enumerate(comuni) if i not in fermi]
+    }
+
+def sincronizza_playlist(url_playlist, nome_file_output=None, cartella_stato=CARTELLA_STATO):
+    """
+    Confronta la playlist con l'ultimo stato salvato e scrive un file playlist
+    con i soli video aggiunti, così downloader e transcriber elaborano solo le novità
+    
+    Args:
+        url_playlist (str): URL della playlist YouTube
+        nome_file_output (str): Nome del file con i video nuovi (opzionale)
+        cartella_stato (Path): Cartella in cui salvare lo stato delle playlist
+    
+    Returns:
+        dict: Video aggiunti, rimossi e spostati (None in caso di errore)
+    """
+    import yt_dlp
+    
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': True,
+        'dump_single_json': False,
+    }
+    
+    misura = metriche.avvia("sincronizzazione_playlist", url=url_playlist)
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            print("Sincronizzazione playlist in corso...")
+            info = ydl.extract_info(url_playlist, download=False)
+    except Exception as e:
+        print(f"Errore durante l'estrazione: {str(e)}")
+        misura.fallisce(e)
+        return None
+    
+    if 'entries' not in info:
+        print("Errore: Impossibile trovare video nella playlist")
+        misura.fallisce("nessun video nella playlist")
+        return None
+    
+    video_attuali = estrai_video_info(info)
+    titolo_playlist = info.get('title', 'Titolo non disponibile')
+    
+    # Lo stato è salvato per ID della playlist
+    id_playlist = info.get('id') or re.sub(r'\W', '_', url_playlist)
+    file_stato = Path(cartella_stato) / f"{id_playlist}.json"
+    
+    video_precedenti = []
+    prima_sincronizzazione = not file_stato.exists()
+    if not prima_sincronizzazione:
+        with open(file_stato, 'r', encoding='utf-8') as f:
+            video_precedenti = json.load(f).get('video', [])
+    
+    differenze = confronta_playlist(video_precedenti, video_attuali)
+    
+    if prima_sincronizzazione:
+        print("✓ Prima sincronizzazione: tutti i video sono considerati nuovi")
+    print(f"✓ Video aggiunti: {len(differenze['aggiunti'])}")
+    print(f"✓ Video rimossi: {len(differenze['rimossi'])}")
+    print(f"✓ Video spostati: {len(differenze['spostati'])}")
+    
+    if differenze['aggiunti']:
+        if not nome_file_output:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            nome_file_output = f"playlist_links_{timestamp}_nuovi.txt"
+        
+        # I video rimossi sono indicati solo per ID, così downloader.py non li scarica
+        note = [f"VIDEO RIMOSSI DALLA PLAYLIST: {len(differenze['rimossi'])}"]
+        note += [f"     - {video['id']} ({video['titolo']})" for video in differenze['rimossi']]
+        note.append(f"VIDEO SPOSTATI NELLA PLAYLIST: {len(differenze['spostati'])}")
+        
+        scrivi_file_playlist(nome_file_output, titolo_playlist, url_playlist,
+                             differenze['aggiunti'], note)
+        print(f"✓ Video nuovi salvati in: {nome_file_output}")
+    else:
+        print("✓ Nessun video nuovo da scaricare")
+    
+    # Aggiorna lo stato salvato
+    Path(cartella_stato).mkdir(parents=True, exist_ok=True)
+    with open(file_stato, 'w', encoding='utf-8') as f:
+        json.dump({
+            'titolo': titolo_playlist,
+            'url': url_playlist,
+            'data_sincronizzazione': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'video': video_attuali
+        }, f, ensure_ascii=False, indent=4)
+    
+    misura.termina(video=len(video_attuali), aggiunti=len(differenze['aggiunti']),
+                   rimossi=len(differenze['rimossi']), spostati=len(differenze['spostati']))
+    return differenze
+
 def estrai_link_playlist(url_playlist, nome_file_output=None):
     """
     Estrae tutti i link video da una playlist YouTube e li salva in un file
@@ -16,6 +236,7 @@ def estrai_link_playlist(url_playlist, nome_file_output=None):
         url_playlist (str): URL della playlist YouTube
         nome_file_output (str): Nome del file di output (opzionale)
     """
+    import yt_dlp
     
     # Configurazione per yt-dlp
     ydl_opts = {
@@ -25,6 +246,7 @@ def estrai_link_playlist(url_playlist, nome_file_output=None):
         'dump_single_json': False,
     }
     
+    misura = metriche.avvia("estrazione_playlist", url=url_playlist)
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             print("Estrazione informazioni playlist in corso...")
@@ -34,6 +256,7 @@ def estrai_link_playlist(url_playlist, nome_file_output=None):
             
             if 'entries' not in info:
                 print("Errore: Impossibile trovare video nella playlist")
+                misura.fallisce("nessun video nella playlist")
                 return
             
             # Nome del file di output
@@ -42,51 +265,22 @@ def estrai_link_playlist(url_playlist, nome_file_output=None):
                 nome_file_output = f"playlist_links_{timestamp}.txt"
             
             # Estrae i link e le informazioni
-            video_info = []
-            for entry in info['entries']:
-                if entry:  # Verifica che l'entry non sia None
-                    video_id = entry.get('id', 'N/A')
-                    titolo = entry.get('title', 'Titolo non disponibile')
-                    url = f"https://www.youtube.com/watch?v={video_id}"
-                    durata = entry.get('duration_string', 'N/A')
-                    
-                    video_info.append({
-                        'url': url,
-                        'titolo': titolo,
-                        'durata': durata,
-                        'id': video_id
-                    })
+            video_info = estrai_video_info(info)
             
             # Salva nel file
-            with open(nome_file_output, 'w', encoding='utf-8') as f:
-                f.write(f"PLAYLIST: {info.get('title', 'Titolo non disponibile')}\n")
-                f.write(f"URL PLAYLIST: {url_playlist}\n")
-                f.write(f"NUMERO TOTALE VIDEO: {len(video_info)}\n")
-                f.write(f"DATA ESTRAZIONE: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("=" * 80 + "\n\n")
-                
-                for i, video in enumerate(video_info, 1):
-                    f.write(f"{i:03d}. {video['titolo']}\n")
-                    f.write(f"     URL: {video['url']}\n")
-                    f.write(f"     Durata: {video['durata']}\n")
-                    f.write(f"     ID: {video['id']}\n")
-                    f.write("-" * 50 + "\n")
-                
-                # Sezione solo link (per copia-incolla facile)
-                f.write("\n" + "=" * 80 + "\n")
-                f.write("SOLO LINK (per copia-incolla):\n")
-                f.write("=" * 80 + "\n")
-                for video in video_info:
-                    f.write(f"{video['url']}\n")
+            scrivi_file_playlist(nome_file_output, info.get('title', 'Titolo non disponibile'),
+                                 url_playlist, video_info)
             
             print(f"✓ Estrazione completata!")
             print(f"✓ Trovati {len(video_info)} video")
             print(f"✓ Link salvati in: {nome_file_output}")
             
+            misura.termina(video=len(video_info))
             return video_info
             
     except Exception as e:
         print(f"Errore durante l'estrazione: {str(e)}")
+        misura.fallisce(e)
         return None
 
 def main():
@@ -130,14 +324,30 @@ def estrai_da_url_personalizzato():
     
     return estrai_link_playlist(url, nome_file)
 
+def sincronizza_da_url():
+    """Sincronizza una playlist inserita dall'utente"""
+    url = input("Inserisci l'URL della playlist YouTube (invio per la predefinita): ").strip()
+    if not url:
+        url = "https://www.youtube.com/playlist?list=PLhEwqlL10MqMSHePf3Kn4T8AaR0ItUUer"
+    
+    return sincronizza_playlist(url)
+
 if __name__ == "__main__":
+    # Uso non interattivo: python extractor.py --sync URL_PLAYLIST
+    if len(sys.argv) > 2 and sys.argv[1] == "--sync":
+        sincronizza_playlist(sys.argv[2])
+        sys.exit(0)
+    
     print("Scegli un'opzione:")
     print("1. Usa la playlist predefinita")
     print("2. Inserisci URL playlist personalizzato")
+    print("3. Sincronizza una playlist (solo video nuovi)")
     
-    scelta = input("Scelta (1 o 2): ").strip()
+    scelta = input("Scelta (1, 2 o 3): ").strip()
     
     if scelta == "2":
         estrai_da_url_personalizzato()
+    elif scelta == "3":
+        sincronizza_da_url()
     else:
         main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Script per calcolare le impronte acustiche dei file audio e riconoscere
+le registrazioni duplicate prima della trascrizione.
+"""
+
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+# Parametri dell'impronta: audio mono a 8 kHz, frame da 256 ms con passo di 16 ms.
+# Con un passo pari a 1/16 del frame (come in Haitsma-Kalker) due copie che iniziano in punti
+# diversi restano allineate a meno di mezzo passo, e l'impronta cambia poco
+FREQUENZA_CAMPIONAMENTO = 8000
+DIM_FRAME = 2048
+PASSO_FRAME = 128
+FRAME_PER_BLOCCO = 4096
+
+# 17 bande logaritmiche tra 300 e 2000 Hz danno 16 bit per frame
+FREQUENZA_MINIMA = 300
+FREQUENZA_MASSIMA = 2000
+NUMERO_BANDE = 17
+
+# Due registrazioni sono uguali se differiscono per meno di un quarto dei bit
+SOGLIA_BIT_DIVERSI = 0.25
+MAX_SCARTO_SECONDI = 30
+TOLLERANZA_DURATA = 0.05
+# Frame (circa 64 s) usati per cercare lo scostamento; il confronto finale usa tutta la sovrapposizione
+FRAME_CONFRONTO = 4000
+
+_POPCOUNT = None
+
+
+def decodifica_audio(percorso, secondi=None):
+    """Decodifica il file con ffmpeg in un array float32 mono a 8 kHz."""
+    import numpy as np
+
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(percorso)]
+    if secondi:
+        command.extend(["-t", str(secondi)])
+    command.extend(["-f", "s16le", "-ac", "1", "-ar", str(FREQUENZA_CAMPIONAMENTO), "-"])
+
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        print("❌ Errore: ffmpeg non trovato. Assicurati che sia installato e nel tuo PATH.")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Errore durante la decodifica di {percorso}: {e}")
+        return None
+
+    output = output[:len(output) - len(output) % 2]
+    return np.frombuffer(output, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def calcola_impronta(percorso, secondi=None):
+    """
+    Calcola l'impronta acustica di un file: per ogni frame, 16 bit che indicano
+    come varia nel tempo la differenza di energia tra bande adiacenti.
+
+    Returns:
+        np.ndarray: array uint16 con un valore per frame (None in caso di errore)
+    """
+    import numpy as np
+
+    audio = decodifica_audio(percorso, secondi)
+    if audio is None or len(audio) < DIM_FRAME * 2:
+        return None
+
+    bordi_bande = np.geomspace(FREQUENZA_MINIMA, FREQUENZA_MASSIMA, NUMERO_BANDE + 1)
+    frequenze = np.fft.rfftfreq(DIM_FRAME, 1 / FREQUENZA_CAMPIONAMENTO)
+    indici_bande = np.searchsorted(frequenze, bordi_bande)
+    finestra = np.hanning(DIM_FRAME).astype(np.float32)
+    frame = np.lib.stride_tricks.sliding_window_view(audio, DIM_FRAME)[::PASSO_FRAME]
+
+    # Energia per banda, calcolata a blocchi di frame per limitare la memoria
+    energie = np.empty((len(frame), NUMERO_BANDE), dtype=np.float32)
+    for inizio in range(0, len(frame), FRAME_PER_BLOCCO):
+        blocco = frame[inizio:inizio + FRAME_PER_BLOCCO] * finestra
+        spettro = np.abs(np.fft.rfft(blocco, axis=1)) ** 2
+        # Lo spettro si taglia all'ultimo bordo, così anche l'ultima banda finisce a FREQUENZA_MASSIMA
+        energie[inizio:inizio + len(blocco)] = np.add.reduceat(spettro[:, :indici_bande[-1]], indici_bande[:-1], axis=1)
+
+    differenze = energie[:, :-1] - energie[:, 1:]
+    bit = (differenze[1:] - differenze[:-1]) > 0
+    pesi = (1 << np.arange(bit.shape[1])).astype(np.uint16)
+    return (bit * pesi).sum(axis=1).astype(np.uint16)
+
+
+def frazione_bit_diversi(impronta_a, impronta_b, max_scarto_frame):
+    """
+    Confronta due impronte: cerca lo scostamento migliore (fino a max_scarto_frame) sui
+    primi FRAME_CONFRONTO frame e restituisce la frazione di bit diversi su tutta la
+    sovrapposizione con quello scostamento.
+    """
+    import numpy as np
+
+    global _POPCOUNT
+    if _POPCOUNT is None:
+        _POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+    def allinea(scarto):
+        a = impronta_a[max(scarto, 0):]
+        b = impronta_b[max(-scarto, 0):]
+        n = min(len(a), len(b))
+        return a[:n], b[:n]
+
+    migliore, scarto_migliore = 1.0, None
+    sovrapposizione_minima = min(len(impronta_a), len(impronta_b)) // 2
+    for scarto in range(-max_scarto_frame, max_scarto_frame + 1):
+        a, b = allinea(scarto)
+        n = min(len(a), FRAME_CONFRONTO)
+        if n == 0 or (n < sovrapposizione_minima and n < FRAME_CONFRONTO):
+            continue
+        diversi = _POPCOUNT[a[:n] ^ b[:n]].sum(dtype=np.int64)
+        if diversi / (16 * n) < migliore:
+            migliore, scarto_migliore = diversi / (16 * n), scarto
+
+    if scarto_migliore is None:
+        return 1.0
+    a, b = allinea(scarto_migliore)
+    return _POPCOUNT[a ^ b].sum(dtype=np.int64) / (16 * len(a))
+
+
+class IndiceImpronte:
+    """
+    Classe per gestire l'indice delle impronte delle registrazioni già trascritte.
+    Ogni impronta è salvata in un file .npy; indice.json associa le impronte
+    al file sorgente e alla trascrizione.
+    """
+    def __init__(self, cartella):
+        self.cartella = Path(cartella)
+        self.cartella.mkdir(parents=True, exist_ok=True)
+        self.file_indice = self.cartella / "indice.json"
+        self.voci = []
+        self.impronte = {}
+
+        if self.file_indice.exists():
+            try:
+                with open(self.file_indice, 'r', encoding='utf-8') as f:
+                    self.voci = json.load(f)
+            except json.JSONDecodeError:
+                print(f"⚠️ Indice delle impronte non leggibile, verrà ricreato: {self.file_indice}")
+
+    def carica_impronta(self, voce):
+        """Carica (una sola volta) l'impronta di una voce dell'indice."""
+        if voce['impronta'] not in self.impronte:
+            import numpy as np
+            self.impronte[voce['impronta']] = np.load(self.cartella / voce['impronta'])
+        return self.impronte[voce['impronta']]
+
+    def cerca(self, impronta):
+        """Restituisce la voce dell'indice che corrisponde all'impronta, se esiste."""
+        max_scarto = int(MAX_SCARTO_SECONDI * FREQUENZA_CAMPIONAMENTO / PASSO_FRAME)
+
+        for voce in self.voci:
+            differenza = abs(voce['frame'] - len(impronta))
+            if differenza > max(TOLLERANZA_DURATA * max(voce['frame'], len(impronta)), max_scarto):
+                continue
+            if not Path(voce['trascrizione']).exists():
+                continue
+
+            bit_diversi = frazione_bit_diversi(impronta, self.carica_impronta(voce), max_scarto)
+            if bit_diversi < SOGLIA_BIT_DIVERSI:
+                return voce
+        return None
+
+    def aggiungi(self, impronta, trascrizione, sorgente):
+        """Aggiunge all'indice l'impronta di una registrazione trascritta."""
+        import numpy as np
+
+        nome_impronta = f"{Path(trascrizione).stem}.npy"
+        np.save(self.cartella / nome_impronta, impronta)
+        self.impronte[nome_impronta] = impronta
+
+        self.voci.append({
+            'impronta': nome_impronta,
+            'frame': int(len(impronta)),
+            'sorgente': str(sorgente),
+            'trascrizione': str(trascrizione),
+            'data': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        with open(self.file_indice, 'w', encoding='utf-8') as f:
+            json.dump(self.voci, f, ensure_ascii=False, indent=4)
+
+
+def main():
+    """
+    Funzione principale: indicizza i file già trascritti o confronta due file.
+    """
+    print("=" * 60)
+    print("          AUDIO FINGERPRINT")
+    print("=" * 60 + "\n")
+
+    parser = argparse.ArgumentParser(description="Gestisce le impronte acustiche usate per evitare trascrizioni duplicate.")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True)
+
+    indicizza = sottocomandi.add_parser("indicizza", help="Aggiunge all'indice i file di una cartella già trascritti.")
+    indicizza.add_argument("cartella", help="Cartella con i file audio/video.")
+    indicizza.add_argument("--output-dir", "-o", default="/mnt/backup_usb/Youth/",
+                           help="Cartella delle trascrizioni (l'indice è nella sottocartella 'impronte').")
+
+    confronta = sottocomandi.add_parser("confronta", help="Confronta le impronte di due file.")
+    confronta.add_argument("file_a")
+    confronta.add_argument("file_b")
+
+    args = parser.parse_args()
+
+    if args.comando == "confronta":
+        impronta_a = calcola_impronta(args.file_a)
+        impronta_b = calcola_impronta(args.file_b)
+        if impronta_a is None or impronta_b is None:
+            print("❌ Impossibile calcolare le impronte.")
+            return
+        max_scarto = int(MAX_SCARTO_SECONDI * FREQUENZA_CAMPIONAMENTO / PASSO_FRAME)
+        bit_diversi = frazione_bit_diversi(impronta_a, impronta_b, max_scarto)
+        esito = "DUPLICATI" if bit_diversi < SOGLIA_BIT_DIVERSI else "DIVERSI"
+        print(f"🔍 Bit diversi: {bit_diversi:.1%} → {esito}")
+        return
+
+    from transcriber import SUPPORTED_EXTENSIONS, trova_trascrizione
+
+    output_dir = Path(args.output_dir)
+    indice = IndiceImpronte(output_dir / "impronte")
+    gia_indicizzati = {voce['trascrizione'] for voce in indice.voci}
+
+    aggiunti = 0
+    for file_path in sorted(Path(args.cartella).iterdir()):
+        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        trascrizione = trova_trascrizione(output_dir, file_path)
+        if not trascrizione or str(trascrizione) in gia_indicizzati:
+            continue
+
+        print(f"🔍 Impronta di: {file_path.name}")
+        impronta = calcola_impronta(file_path)
+        if impronta is not None:
+            indice.aggiungi(impronta, trascrizione, file_path)
+            aggiunti += 1
+
+    print(f"\n✅ Impronte aggiunte all'indice: {aggiunti}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Modulo condiviso per registrare eventi strutturati e metriche delle fasi degli script Youth.
+
+Gli eventi (inizio, fine, errore) sono scritti come righe JSON nel file indicato dalla
+variabile d'ambiente YOUTH_EVENT_LOG. Se è impostata YOUTH_PROMETHEUS_DIR, alla fine del
+processo viene scritto il file youth_<script>.prom per il textfile collector di node_exporter.
+Senza queste variabili le chiamate non hanno effetto.
+"""
+
+import os
+import json
+import time
+import atexit
+import socket
+import threading
+from datetime import datetime
+
+
+class Misura:
+    """
+    Misura di una singola esecuzione di una fase: registra l'evento di inizio
+    alla creazione e quello di fine (o di errore) quando viene chiusa.
+    """
+    def __init__(self, registro, fase, campi):
+        self.registro = registro
+        self.fase = fase
+        self.campi = campi
+        self.inizio = time.perf_counter()
+        self.chiusa = False
+        registro.scrivi_evento(fase, "inizio", **campi)
+
+    def termina(self, **campi):
+        """Chiude la misura con esito positivo."""
+        self._chiudi("fine", campi)
+
+    def fallisce(self, errore, **campi):
+        """Chiude la misura con un errore."""
+        self._chiudi("errore", dict(campi, errore=str(errore)))
+
+    def _chiudi(self, tipo, campi):
+        if self.chiusa:
+            return
+        self.chiusa = True
+
+        durata = time.perf_counter() - self.inizio
+        campi = dict(self.campi, **campi, durata_s=round(durata, 4))
+        if campi.get("secondi_audio"):
+            campi["fattore_tempo_reale"] = round(durata / campi["secondi_audio"], 4)
+
+        self.registro.scrivi_evento(self.fase, tipo, **campi)
+        self.registro.aggiorna_aggregati(self.fase, tipo, campi)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_eccezione, eccezione, traceback):
+        if eccezione is not None:
+            self.fallisce(repr(eccezione))
+        else:
+            self.termina()
+        return False
+
+
+class RegistroMetriche:
+    """
+    Classe che raccoglie gli eventi di uno script e ne aggrega le metriche per fase.
+    """
+    def __init__(self, script):
+        self.script = script
+        self.file_eventi = os.environ.get("YOUTH_EVENT_LOG")
+        self.cartella_prometheus = os.environ.get("YOUTH_PROMETHEUS_DIR")
+        self.host = socket.gethostname()
+        self.aggregati = {}
+        self.lock = threading.Lock()
+
+        if self.cartella_prometheus:
+            atexit.register(self.scrivi_prometheus)
+
+    def avvia(self, fase, **campi):
+        """Inizia la misura di una fase; usabile anche come context manager."""
+        return Misura(self, fase, campi)
+
+    def scrivi_evento(self, fase, tipo, **campi):
+        """Aggiunge un evento al file JSON Lines, se configurato."""
+        if not self.file_eventi:
+            return
+
+        evento = {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'host': self.host,
+            'pid': os.getpid(),
+            'script': self.script,
+            'fase': fase,
+            'evento': tipo,
+        }
+        evento.update(campi)
+        riga = json.dumps(evento, ensure_ascii=False, default=str) + "\n"
+
+        with self.lock:
+            try:
+                with open(self.file_eventi, 'a', encoding='utf-8') as f:
+                    f.write(riga)
+            except OSError:
+                # Le metriche non devono mai interrompere il lavoro dello script
+                pass
+
+    def aggiorna_aggregati(self, fase, tipo, campi):
+        """Aggiorna i totali per fase usati dall'esportazione Prometheus."""
+        with self.lock:
+            totali = self.aggregati.setdefault(fase, {
+                'esecuzioni': 0, 'errori': 0, 'durata_s': 0.0, 'byte': 0, 'secondi_audio': 0.0
+            })
+            totali['esecuzioni'] += 1
+            totali['errori'] += tipo == "errore"
+            totali['durata_s'] += campi.get('durata_s', 0.0)
+            totali['byte'] += campi.get('byte') or 0
+            totali['secondi_audio'] += campi.get('secondi_audio') or 0.0
+
+    def scrivi_prometheus(self):
+        """Scrive in modo atomico il file .prom con i totali dell'ultima esecuzione dello script."""
+        metriche = [
+            ('youth_stage_runs', 'esecuzioni', "Esecuzioni della fase nell'ultima esecuzione dello script"),
+            ('youth_stage_errors', 'errori', "Esecuzioni della fase terminate con errore"),
+            ('youth_stage_duration_seconds', 'durata_s', "Tempo totale speso nella fase"),
+            ('youth_stage_bytes', 'byte', "Byte elaborati nella fase"),
+            ('youth_stage_audio_seconds', 'secondi_audio', "Secondi di audio elaborati nella fase"),
+        ]
+
+        righe = []
+        for nome, chiave, descrizione in metriche:
+            righe.append(f"# HELP {nome} {descrizione}")
+            righe.append(f"# TYPE {nome} gauge")
+            for fase, totali in sorted(self.aggregati.items()):
+                righe.append(f'{nome}{{script="{self.script}",stage="{fase}"}} {totali[chiave]}')
+        righe.append("# HELP youth_last_run_timestamp_seconds Fine dell'ultima esecuzione dello script")
+        righe.append("# TYPE youth_last_run_timestamp_seconds gauge")
+        righe.append(f'youth_last_run_timestamp_seconds{{script="{self.script}"}} {time.time():.0f}')
+
+        percorso = os.path.join(self.cartella_prometheus, f"youth_{self.script}.prom")
+        temporaneo = f"{percorso}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cartella_prometheus, exist_ok=True)
+            with open(temporaneo, 'w', encoding='utf-8') as f:
+                f.write("\n".join(righe) + "\n")
+            os.replace(temporaneo, percorso)
+        except OSError:
+            pass
@@ -3,12 +3,31 @@
 Script per analizzare una cartella di file di trascrizione e generare un file con gli argomenti delle lezioni.
 """
 
-import sys
 import json
 import re
-from collections import Counter, defaultdict
+import time
+import argparse
+import string
+from collections import Counter, defaultdict, deque
 from pathlib import Path
 
+from metrics import RegistroMetriche
+
+metriche = RegistroMetriche("reporter")
+
+# Parole frequenti escluse dall'analisi del corpus
+STOPWORDS = {
+    'che', 'non', 'per', 'una', 'con', 'del', 'della', 'delle', 'dei', 'degli', 'dello',
+    'nel', 'nella', 'nelle', 'nei', 'negli', 'sul', 'sulla', 'sui', 'alla', 'alle', 'allo',
+    'agli', 'dal', 'dalla', 'dai', 'dalle', 'gli', 'come', 'anche', 'questo', 'questa',
+    'questi', 'queste', 'quello', 'quella', 'quelli', 'quelle', 'sono', 'essere', 'stato',
+    'abbiamo', 'avete', 'hanno', 'ho', 'hai', 'cosa', 'quindi', 'però', 'poi', 'più', 'molto',
+    'tutto', 'tutti', 'tutte', 'ancora', 'allora', 'dove', 'quando', 'perché', 'quanto',
+    'qui', 'già', 'solo', 'ogni', 'fare', 'fatto', 'dire', 'detto', 'vediamo', 'diciamo',
+    'adesso', 'ora', 'cioè', 'ecco', 'okay', 'bene', 'siamo', 'sia', 'suo', 'sua', 'loro',
+    'mio', 'mia', 'noi', 'voi', 'lui', 'lei', 'era', 'così', 'fra', 'tra', 'senza', 'mentre'
+}
+
 class FolderReportGenerator:
     def __init__(self):
         # Dizionario specializzato per Probabilità 
@@ -62,14 +81,34 @@ class FolderReportGenerator:
             'osservazione', 'nota bene', 'attenzione', 'ricorda'
         ]
 
-    def analizza_file_singolo(self, file_path):
-        """Analizza un singolo file di trascrizione e restituisce l'argomento."""
+        # Matcher compilati una sola volta e riutilizzati per tutti i file della cartella
+        self.regex_formule = re.compile('|'.join(f'(?:{p})' for p in self.pattern_formule))
+        self.regex_marcatori = self.compila_alternative(self.marcatori_sezione)
+        self.regex_concetti = self.compila_alternative(self.concetti_probabilita)
+
+    @staticmethod
+    def compila_alternative(termini):
+        """Compila un'unica regex che riconosce uno qualsiasi dei termini (prima i più lunghi)."""
+        alternative = '|'.join(re.escape(t) for t in sorted(termini, key=len, reverse=True))
+        return re.compile(r'\b(' + alternative + r')\b')
+
+    def leggi_trascrizione(self, file_path):
+        """Legge un file JSON di trascrizione."""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                result = json.load(f)
+                return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
             return None
 
+    def analizza_file_singolo(self, file_path):
+        """Analizza un singolo file di trascrizione e restituisce l'argomento."""
+        result = self.leggi_trascrizione(file_path)
+        if result is None:
+            return None
+        return self.analizza_trascrizione(result)
+
+    def analizza_trascrizione(self, result):
+        """Restituisce l'argomento principale di una trascrizione già caricata."""
         testo_completo = result.get('text', '')
         if not testo_completo:
             return None
@@ -162,8 +201,53 @@ class FolderReportGenerator:
         
         return "Contenuti Vari di Probabilità"
 
-    def processa_cartella(self, cartella_path, output_file="argomenti_lezioni.txt"):
-        """Processa tutti i file JSON in una cartella e crea il file output."""
+    def analizza_timeline(self, segmenti, finestra=120.0, passo=60.0):
+        """
+        Scorre una sola volta i segmenti di Whisper e costruisce la timeline della lezione:
+        marcatori di sezione e formule con il loro istante, e la densità di concetti
+        di probabilità in una finestra scorrevole, campionata ogni 'passo' secondi.
+        """
+        sezioni, formule, densita = [], [], []
+        in_finestra = deque()
+        concetti_finestra = Counter()
+        prossimo_campione = passo
+
+        for segmento in segmenti:
+            testo = segmento.get('text', '').strip()
+            inizio = segmento.get('start', 0.0)
+            fine = segmento.get('end', inizio)
+            testo_lower = testo.lower()
+
+            for match in self.regex_marcatori.finditer(testo_lower):
+                sezioni.append({'tempo': round(inizio, 1), 'marcatore': match.group(1), 'testo': testo})
+            for match in self.regex_formule.finditer(testo):
+                formule.append({'tempo': round(inizio, 1), 'formula': match.group(0)})
+
+            concetti = Counter(match.group(1) for match in self.regex_concetti.finditer(testo_lower))
+            in_finestra.append((fine, concetti))
+            concetti_finestra.update(concetti)
+
+            # Rimuove i segmenti usciti dalla finestra
+            while in_finestra and in_finestra[0][0] < fine - finestra:
+                concetti_finestra.subtract(in_finestra.popleft()[1])
+
+            while fine >= prossimo_campione:
+                durata_finestra = min(finestra, prossimo_campione)
+                dominanti = [(c, n) for c, n in concetti_finestra.most_common(3) if n > 0]
+                densita.append({
+                    'tempo': prossimo_campione,
+                    'concetti_al_minuto': round(sum(concetti_finestra.values()) * 60 / durata_finestra, 2),
+                    'concetti_dominanti': [c for c, _ in dominanti]
+                })
+                prossimo_campione += passo
+
+        return {'sezioni': sezioni, 'formule': formule, 'densita': densita}
+
+    def processa_cartella(self, cartella_path, output_file="argomenti_lezioni.txt", output_timeline=None):
+        """
+        Processa tutti i file JSON in una cartella e crea il file output.
+        Se output_timeline è indicato, scrive anche la timeline di ogni lezione in formato JSON.
+        """
         cartella = Path(cartella_path)
         
         if not cartella.exists() or not cartella.is_dir():
@@ -180,16 +264,24 @@ class FolderReportGenerator:
         print(f"📁 Trovati {len(file_json)} file JSON da processare...")
         
         risultati = []
+        timeline = {}
         
         for file_path in sorted(file_json):
             print(f"🔍 Analizzando: {file_path.name}")
             
-            argomento = self.analizza_file_singolo(file_path)
+            misura = metriche.avvia("analisi", file=file_path.name)
+            result = self.leggi_trascrizione(file_path)
+            argomento = self.analizza_trascrizione(result) if result else None
+            
+            if output_timeline and result:
+                timeline[file_path.stem] = self.analizza_timeline(result.get('segments', []))
             
             if argomento:
                 risultati.append(f"{file_path.stem}: {argomento}")
+                misura.termina(byte=file_path.stat().st_size)
             else:
                 risultati.append(f"{file_path.stem}: Errore nel processamento del file")
+                misura.fallisce("trascrizione non analizzabile")
         
         # Scrivi il file di output
         output_path = Path(output_file)
@@ -208,27 +300,280 @@ class FolderReportGenerator:
             
         except Exception as e:
             print(f"❌ Errore nella scrittura del file: {e}")
+        
+        if output_timeline:
+            try:
+                with open(output_timeline, 'w', encoding='utf-8') as f:
+                    json.dump(timeline, f, ensure_ascii=False, indent=4)
+                print(f"🕒 Timeline delle lezioni salvata in: {Path(output_timeline).absolute()}")
+            except Exception as e:
+                print(f"❌ Errore nella scrittura della timeline: {e}")
+
+class CorpusAnalyzer:
+    """
+    Analisi dell'intero corpus di trascrizioni con una matrice documenti-termini sparsa:
+    TF-IDF, similarità tra lezioni, quasi-duplicati e raggruppamento per argomento.
+    """
+    def __init__(self, soglia_duplicati=0.9, numero_cluster=None, min_df=2, max_df=0.8,
+                 simili_per_lezione=3, termini_per_lezione=300):
+        self.soglia_duplicati = soglia_duplicati
+        self.numero_cluster = numero_cluster
+        self.min_df = min_df
+        self.max_df = max_df
+        self.simili_per_lezione = simili_per_lezione
+        self.termini_per_lezione = termini_per_lezione
+        # Punteggiatura e cifre diventano spazi: la tokenizzazione è un semplice split
+        self.tabella_separatori = str.maketrans({c: ' ' for c in string.punctuation + string.digits + '«»“”’‘…–—'})
+
+    def leggi_corpus(self, cartella):
+        """Legge il testo di tutte le trascrizioni JSON della cartella."""
+        nomi, testi = [], []
+        for file_path in sorted(Path(cartella).glob("*.json")):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    testo = json.load(f).get('text', '')
+            except (OSError, json.JSONDecodeError, AttributeError):
+                continue
+            if testo:
+                nomi.append(file_path.stem)
+                testi.append(testo)
+        return nomi, testi
+
+    def costruisci_matrice(self, testi):
+        """Costruisce la matrice sparsa dei conteggi (documenti x termini)."""
+        import numpy as np
+        from scipy import sparse
+
+        # Ogni parola nuova riceve come indice la dimensione attuale del vocabolario
+        vocabolario = defaultdict()
+        vocabolario.default_factory = vocabolario.__len__
+        colonne, dati, lunghezze = [], [], []
+        for testo in testi:
+            frequenze = Counter(testo.lower().translate(self.tabella_separatori).split())
+            colonne.extend(map(vocabolario.__getitem__, frequenze))
+            dati.extend(frequenze.values())
+            lunghezze.append(len(frequenze))
+
+        indptr = np.concatenate([[0], np.cumsum(lunghezze)])
+        conteggi = sparse.csr_matrix((np.array(dati, dtype=np.float32), np.array(colonne, dtype=np.int64), indptr),
+                                     shape=(len(testi), len(vocabolario)))
+        termini = np.empty(len(vocabolario), dtype=object)
+        termini[list(vocabolario.values())] = list(vocabolario.keys())
+        return conteggi, termini
+
+    def calcola_tfidf(self, conteggi, termini):
+        """Filtra parole brevi, stopword e termini troppo rari o comuni, poi calcola la TF-IDF normalizzata."""
+        import numpy as np
+        from scipy import sparse
+
+        n_documenti = conteggi.shape[0]
+        df = np.diff(conteggi.tocsc().indptr)
+        max_df = max(self.max_df * n_documenti, 1)
+        min_df = min(self.min_df, n_documenti)
+        parole_utili = np.array([len(t) >= 3 and t not in STOPWORDS for t in termini], dtype=bool)
+        mantieni = np.flatnonzero((df >= min_df) & (df <= max_df) & parole_utili)
+        if len(mantieni) == 0:
+            mantieni = np.arange(len(termini))
+
+        tfidf = conteggi[:, mantieni].astype(np.float32)
+        tfidf.data = 1 + np.log(tfidf.data)
+        idf = np.log((1 + n_documenti) / (1 + df[mantieni])) + 1
+        tfidf = tfidf @ sparse.diags(idf.astype(np.float32))
+
+        norme = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        norme[norme == 0] = 1
+        tfidf = sparse.diags(1 / norme) @ tfidf
+        return tfidf.tocsr(), termini[mantieni]
+
+    def riduci_termini(self, tfidf):
+        """
+        Mantiene per ogni lezione solo i termini con peso TF-IDF più alto
+        (rinormalizzando), così similarità e cluster restano veloci anche su corpus grandi.
+        """
+        import numpy as np
+        from scipy import sparse
+
+        righe = np.repeat(np.arange(tfidf.shape[0]), np.diff(tfidf.indptr))
+        ordine = np.lexsort((-tfidf.data, righe))
+        rango = np.arange(len(ordine)) - tfidf.indptr[righe[ordine]]
+        tenuti = ordine[rango < self.termini_per_lezione]
+
+        ridotta = sparse.csr_matrix((tfidf.data[tenuti], (righe[tenuti], tfidf.indices[tenuti])),
+                                    shape=tfidf.shape)
+        norme = np.sqrt(np.asarray(ridotta.multiply(ridotta).sum(axis=1)).ravel())
+        norme[norme == 0] = 1
+        return (sparse.diags(1 / norme) @ ridotta).tocsr()
+
+    def similarita_e_duplicati(self, tfidf, blocco=512):
+        """
+        Calcola a blocchi di righe la similarità coseno tra lezioni,
+        restituendo le lezioni più simili a ciascuna e le coppie quasi duplicate.
+        """
+        import numpy as np
+
+        n = tfidf.shape[0]
+        k = min(self.simili_per_lezione, n - 1)
+        simili = np.zeros((n, max(k, 0)), dtype=np.int64)
+        valori_simili = np.zeros((n, max(k, 0)), dtype=np.float32)
+        duplicati = []
+
+        trasposta = tfidf.T.tocsc()
+        for inizio in range(0, n, blocco):
+            fine = min(inizio + blocco, n)
+            sim = (tfidf[inizio:fine] @ trasposta).toarray()
+            righe = np.arange(fine - inizio)
+            sim[righe, righe + inizio] = -1  # esclude la lezione stessa
+
+            if k > 0:
+                migliori = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+                ordine = np.argsort(-np.take_along_axis(sim, migliori, axis=1), axis=1)
+                simili[inizio:fine] = np.take_along_axis(migliori, ordine, axis=1)
+                valori_simili[inizio:fine] = np.take_along_axis(sim, simili[inizio:fine], axis=1)
+
+            i, j = np.nonzero(np.triu(sim >= self.soglia_duplicati, k=inizio + 1))
+            duplicati.extend(zip((i + inizio).tolist(), j.tolist(), sim[i, j].tolist()))
+
+        return simili, valori_simili, duplicati
+
+    def raggruppa(self, tfidf, numero_cluster, iterazioni=50, seme=42):
+        """K-means sferico sulla matrice TF-IDF normalizzata."""
+        import numpy as np
+        from scipy import sparse
+
+        n = tfidf.shape[0]
+        rng = np.random.default_rng(seme)
+
+        # Inizializzazione k-means++ sulla distanza coseno
+        centri = [rng.integers(n)]
+        distanze = 1 - (tfidf @ tfidf[centri[0]].T).toarray().ravel()
+        for _ in range(1, numero_cluster):
+            pesi = np.clip(distanze, 0, None) ** 2
+            if pesi.sum() == 0:
+                break
+            centri.append(rng.choice(n, p=pesi / pesi.sum()))
+            distanze = np.minimum(distanze, 1 - (tfidf @ tfidf[centri[-1]].T).toarray().ravel())
+        centroidi = tfidf[centri].toarray()
+
+        etichette = np.full(n, -1)
+        for _ in range(iterazioni):
+            nuove = np.asarray(tfidf @ centroidi.T).argmax(axis=1)
+            if np.array_equal(nuove, etichette):
+                break
+            etichette = nuove
+            appartenenza = sparse.csr_matrix((np.ones(n, dtype=np.float32), (etichette, np.arange(n))),
+                                             shape=(len(centroidi), n))
+            somme = np.asarray((appartenenza @ tfidf).todense())
+            norme = np.linalg.norm(somme, axis=1, keepdims=True)
+            norme[norme == 0] = 1
+            centroidi = somme / norme
+        return etichette, centroidi
+
+    def processa_corpus(self, cartella_path, output_file="corpus_lezioni.json"):
+        """Analizza tutto il corpus e scrive un report JSON."""
+        import numpy as np
+
+        inizio = time.perf_counter()
+        misura = metriche.avvia("analisi_corpus", cartella=str(cartella_path))
+        nomi, testi = self.leggi_corpus(cartella_path)
+        if len(testi) < 2:
+            print(f"❌ Servono almeno due trascrizioni valide nella cartella '{cartella_path}'.")
+            misura.fallisce("meno di due trascrizioni")
+            return None
+        print(f"📁 Trovate {len(testi)} trascrizioni da analizzare...")
+
+        conteggi, termini = self.costruisci_matrice(testi)
+        tfidf, termini = self.calcola_tfidf(conteggi, termini)
+        print(f"🔢 Matrice TF-IDF: {tfidf.shape[0]} lezioni x {tfidf.shape[1]} termini")
+
+        ridotta = self.riduci_termini(tfidf)
+        simili, valori_simili, duplicati = self.similarita_e_duplicati(ridotta)
+
+        numero_cluster = self.numero_cluster or int(np.clip(round(np.sqrt(len(testi) / 2)), 1, 20))
+        numero_cluster = min(numero_cluster, len(testi))
+        etichette, centroidi = self.raggruppa(ridotta, numero_cluster)
+
+        termini_cluster = [termini[np.argsort(-c)[:10]].tolist() for c in centroidi]
+
+        lezioni = []
+        for i, nome in enumerate(nomi):
+            riga = slice(tfidf.indptr[i], tfidf.indptr[i + 1])
+            principali = tfidf.indices[riga][np.argsort(-tfidf.data[riga])[:5]]
+            lezioni.append({
+                'file': nome,
+                'cluster': int(etichette[i]),
+                'termini_principali': termini[principali].tolist(),
+                'simili': [{'file': nomi[j], 'similarita': round(float(v), 4)}
+                           for j, v in zip(simili[i], valori_simili[i])]
+            })
+
+        report = {
+            'cartella': str(Path(cartella_path).absolute()),
+            'lezioni_analizzate': len(testi),
+            'termini': int(tfidf.shape[1]),
+            'soglia_duplicati': self.soglia_duplicati,
+            'quasi_duplicati': [{'file_a': nomi[i], 'file_b': nomi[j], 'similarita': round(v, 4)}
+                                for i, j, v in sorted(duplicati, key=lambda d: -d[2])],
+            'cluster': [{'id': c,
+                         'lezioni': [nomi[i] for i in np.flatnonzero(etichette == c)],
+                         'termini_principali': termini_cluster[c]}
+                        for c in range(len(centroidi))],
+            'lezioni': lezioni,
+        }
+        report['tempo_secondi'] = round(time.perf_counter() - inizio, 3)
+        misura.termina(lezioni=len(testi), byte=sum(len(t.encode('utf-8')) for t in testi))
+
+        output_path = Path(output_file)
+        try:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=4)
+            print(f"\n✅ Report del corpus creato: {output_path.absolute()}")
+            print(f"📊 {len(duplicati)} coppie quasi duplicate, {len(centroidi)} gruppi di argomenti, "
+                  f"{report['tempo_secondi']:.2f} s")
+        except Exception as e:
+            print(f"❌ Errore nella scrittura del file: {e}")
+
+        return report
+
 
 def main():
     print("=" * 60)
     print("     GENERATORE ARGOMENTI LEZIONI DI PROBABILITÀ")
     print("=" * 60 + "\n")
 
-    if len(sys.argv) > 1:
-        cartella_path = sys.argv[1]
-        output_file = sys.argv[2] if len(sys.argv) > 2 else "argomenti_lezioni.txt"
+    parser = argparse.ArgumentParser(description="Genera il report degli argomenti delle lezioni.")
+    parser.add_argument("cartella", nargs="?", help="Cartella con i file JSON delle trascrizioni.")
+    parser.add_argument("output", nargs="?", help="File di output.")
+    parser.add_argument("--corpus", action="store_true",
+                        help="Analisi vettoriale dell'intero corpus (TF-IDF, similarità, duplicati, cluster) in JSON.")
+    parser.add_argument("--cluster", type=int, help="Numero di gruppi di argomenti per --corpus.")
+    parser.add_argument("--soglia-duplicati", type=float, default=0.9,
+                        help="Similarità oltre la quale due lezioni sono quasi duplicate. Predefinito: 0.9.")
+    parser.add_argument("--timeline", nargs="?", const="timeline_lezioni.json",
+                        help="Scrive anche la timeline per segmento di ogni lezione (predefinito: timeline_lezioni.json).")
+    args = parser.parse_args()
+
+    output_predefinito = "corpus_lezioni.json" if args.corpus else "argomenti_lezioni.txt"
+
+    if args.cartella:
+        cartella_path = args.cartella
+        output_file = args.output or output_predefinito
     else:
         cartella_path = input("📁 Inserisci il percorso della cartella con i file JSON: ").strip()
-        output_file = input("📄 Nome del file di output (default: argomenti_lezioni.txt): ").strip()
+        output_file = input(f"📄 Nome del file di output (default: {output_predefinito}): ").strip()
         if not output_file:
-            output_file = "argomenti_lezioni.txt"
+            output_file = output_predefinito
 
     if not cartella_path:
         print("❌ Il percorso della cartella è obbligatorio!")
         return
 
+    if args.corpus:
+        analyzer = CorpusAnalyzer(args.soglia_duplicati, args.cluster)
+        analyzer.processa_corpus(cartella_path, output_file)
+        return
+
     reporter = FolderReportGenerator()
-    reporter.processa_cartella(cartella_path, output_file)
+    reporter.processa_cartella(cartella_path, output_file, args.timeline)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
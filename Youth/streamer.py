@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Script per trascrivere in tempo quasi reale una sorgente audio in crescita
+(un file ancora in scrittura o uno stream leggibile da ffmpeg) utilizzando Whisper.
+"""
+
+import json
+import argparse
+import subprocess
+import time
+from pathlib import Path
+from datetime import datetime
+
+from transcriber import Transcriber
+
+# Frequenza di campionamento attesa da Whisper
+FREQUENZA_CAMPIONAMENTO = 16000
+
+# Whisper elabora al massimo 30 secondi di audio per volta
+FINESTRA_MASSIMA = 30.0
+
+
+class StreamingTranscriber:
+    """
+    Classe per trascrivere una sorgente audio a finestre scorrevoli.
+    Ogni passo trascrive l'audio non ancora confermato; i segmenti che terminano
+    prima della zona di sovrapposizione vengono confermati e scritti subito,
+    gli altri vengono ritrascritti al passo successivo con più contesto.
+    """
+    def __init__(self, transcriber, passo=3.0, sovrapposizione=2.0):
+        self.transcriber = transcriber
+        self.passo = passo
+        self.sovrapposizione = sovrapposizione
+        self.segmenti = []
+        self.latenze = []
+
+    def avvia_ffmpeg(self, sorgente, segui_file=False, tempo_reale=False):
+        """Avvia ffmpeg per decodificare la sorgente in PCM mono a 16 kHz."""
+        command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+        if tempo_reale:
+            # Legge la sorgente alla sua velocità naturale (simulazione di una diretta)
+            command.append("-re")
+        if segui_file:
+            # Continua a leggere il file mentre viene scritto
+            command.extend(["-follow", "1"])
+        command.extend([
+            "-i", str(sorgente),
+            "-f", "s16le",
+            "-ac", "1",
+            "-ar", str(FREQUENZA_CAMPIONAMENTO),
+            "-"
+        ])
+        return subprocess.Popen(command, stdout=subprocess.PIPE)
+
+    def trascrivi_finestra(self, audio, inizio, prompt=None):
+        """Trascrive una finestra di audio e riporta i tempi dei segmenti sulla sorgente."""
+        result = self.transcriber.model.transcribe(audio,
+                                                   task="transcribe",
+                                                   word_timestamps=True,
+                                                   condition_on_previous_text=False,
+                                                   initial_prompt=prompt,
+                                                   verbose=None)
+        segmenti = []
+        for segmento in result.get('segments', []):
+            segmento['start'] += inizio
+            segmento['end'] += inizio
+            segmento['seek'] = segmento.get('seek', 0) + int(inizio * 100)
+            for parola in segmento.get('words', []):
+                parola['start'] += inizio
+                parola['end'] += inizio
+            segmenti.append(segmento)
+        return segmenti, result.get('language')
+
+    def conferma_segmenti(self, segmenti, limite, file_jsonl, inizio_stream):
+        """Scrive i segmenti che terminano entro il limite e restituisce l'ultimo tempo confermato."""
+        confermato = None
+        for segmento in segmenti:
+            if segmento['end'] > limite:
+                break
+            segmento['id'] = len(self.segmenti)
+            self.segmenti.append(segmento)
+            file_jsonl.write(json.dumps(segmento, ensure_ascii=False) + "\n")
+            file_jsonl.flush()
+
+            if inizio_stream is not None:
+                self.latenze.append(time.monotonic() - inizio_stream - segmento['end'])
+            print(f"[{segmento['start']:7.1f} - {segmento['end']:7.1f}] {segmento['text'].strip()}")
+            confermato = segmento['end']
+        return confermato
+
+    def trascrivi_stream(self, sorgente, segui_file=False, tempo_reale=False):
+        """
+        Trascrive la sorgente fino alla sua chiusura, aggiungendo i segmenti
+        confermati a un file JSON Lines e salvando alla fine la trascrizione completa.
+        """
+        if not self.transcriber.model and not self.transcriber.carica_modello():
+            return None
+
+        import numpy as np
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        nome_base = Path(str(sorgente)).stem or "stream"
+        percorso_jsonl = self.transcriber.output_dir / f"TRASCRIZIONE_LIVE_{nome_base}_{timestamp}.jsonl"
+
+        try:
+            processo = self.avvia_ffmpeg(sorgente, segui_file, tempo_reale)
+        except FileNotFoundError:
+            print("❌ Errore: ffmpeg non trovato. Assicurati che sia installato e nel tuo PATH.")
+            return None
+
+        print(f"🎙️ Trascrizione in diretta di: {sorgente}")
+        print(f"📝 Segmenti confermati in: {percorso_jsonl}")
+
+        byte_passo = int(self.passo * FREQUENZA_CAMPIONAMENTO) * 2
+        buffer = np.zeros(0, dtype=np.float32)
+        inizio_buffer = 0.0
+        lingua = None
+        prompt = None
+        inizio_stream = time.monotonic() if tempo_reale else None
+
+        try:
+            with open(percorso_jsonl, 'w', encoding='utf-8') as file_jsonl:
+                fine_stream = False
+                while not fine_stream:
+                    dati = processo.stdout.read(byte_passo)
+                    fine_stream = len(dati) < byte_passo
+                    dati = dati[:len(dati) - len(dati) % 2]
+                    nuovo = np.frombuffer(dati, dtype=np.int16).astype(np.float32) / 32768.0
+                    buffer = np.concatenate([buffer, nuovo])
+
+                    if len(buffer) == 0:
+                        continue
+
+                    fine_buffer = inizio_buffer + len(buffer) / FREQUENZA_CAMPIONAMENTO
+                    segmenti, lingua_finestra = self.trascrivi_finestra(buffer, inizio_buffer, prompt)
+                    lingua = lingua or lingua_finestra
+
+                    # A fine stream, o se la finestra è piena, si conferma tutto
+                    if fine_stream or fine_buffer - inizio_buffer >= FINESTRA_MASSIMA:
+                        limite = fine_buffer
+                    else:
+                        limite = fine_buffer - self.sovrapposizione
+
+                    confermato = self.conferma_segmenti(segmenti, limite, file_jsonl, inizio_stream)
+                    if confermato is None:
+                        # Nessun segmento concluso: scarta l'audio senza parlato oltre la sovrapposizione
+                        confermato = limite if not segmenti else max(inizio_buffer, min(limite, segmenti[0]['start']))
+                    else:
+                        prompt = self.segmenti[-1]['text']
+
+                    taglio = int((confermato - inizio_buffer) * FREQUENZA_CAMPIONAMENTO)
+                    buffer = buffer[max(taglio, 0):]
+                    inizio_buffer = confermato
+        except KeyboardInterrupt:
+            print("\n⏹️ Trascrizione interrotta dall'utente")
+        finally:
+            processo.terminate()
+            processo.wait()
+
+        if not self.segmenti:
+            print("⚠️ Nessun segmento trascritto.")
+            return None
+
+        if self.latenze:
+            print(f"⏱️ Ritardo medio rispetto alla diretta: {sum(self.latenze) / len(self.latenze):.1f} s "
+                  f"(massimo {max(self.latenze):.1f} s)")
+
+        result = {
+            'text': "".join(segmento['text'] for segmento in self.segmenti),
+            'segments': self.segmenti,
+            'language': lingua
+        }
+        return self.transcriber.salva_trascrizione(result, f"LIVE_{nome_base}")
+
+
+def main():
+    """
+    Funzione principale per gestire gli argomenti della riga di comando.
+    """
+    print("=" * 60)
+    print("          LIVE AUDIO TRANSCRIBER")
+    print("=" * 60 + "\n")
+
+    parser = argparse.ArgumentParser(description="Trascrive in tempo quasi reale un file in crescita o uno stream.")
+    parser.add_argument("sorgente", help="File in scrittura o URL di uno stream leggibile da ffmpeg.")
+    parser.add_argument("--model", "-m", choices=["tiny", "base", "small"], default="base",
+                        help="Scegli la precisione della trascrizione (tiny, base, small). Predefinito: base.")
+    parser.add_argument("--passo", "-p", type=float, default=3.0,
+                        help="Secondi di nuovo audio tra due trascrizioni. Predefinito: 3.")
+    parser.add_argument("--sovrapposizione", "-s", type=float, default=2.0,
+                        help="Secondi finali di ogni finestra ritrascritti al passo successivo. Predefinito: 2.")
+    parser.add_argument("--segui", action="store_true",
+                        help="Continua a leggere il file mentre viene scritto (interrompi con Ctrl+C).")
+    parser.add_argument("--tempo-reale", action="store_true",
+                        help="Legge un file locale alla velocità di riproduzione, per simulare una diretta.")
+    parser.add_argument("--output-dir", "-o", default="/mnt/backup_usb/Youth/",
+                        help="Cartella di output personalizzata.")
+
+    args = parser.parse_args()
+
+    if args.sovrapposizione < 0 or args.passo <= 0:
+        print("❌ Il passo deve essere positivo e la sovrapposizione non negativa.")
+        return
+
+    transcriber = Transcriber(args.model, args.output_dir)
+    streamer = StreamingTranscriber(transcriber, args.passo, args.sovrapposizione)
+    streamer.trascrivi_stream(args.sorgente, args.segui, args.tempo_reale)
+
+
+if __name__ == "__main__":
+    main()
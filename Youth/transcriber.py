@@ -3,7 +3,6 @@
 Script per trascrivere un file audio o una cartella di file audio utilizzando Whisper.
 """
 
-import whisper
 import json
 from pathlib import Path
 from datetime import datetime
@@ -13,18 +12,35 @@ import glob
 import subprocess
 import tempfile
 import os
+import re
+import shutil
+import time
+import platform
+from collections import Counter
+
+from metrics import RegistroMetriche
 
 # Definisci le estensioni di file audio/video supportate
-SUPPORTED_EXTENSIONS = [".mp3", ".wav", ".m4a", ".flac", ".mp4", ".mov", ".avi"]
+SUPPORTED_EXTENSIONS = [".mp3", ".wav", ".m4a", ".flac", ".opus", ".mp4", ".mov", ".avi"]
+
+# Modelli selezionabili automaticamente, dal più veloce al più preciso
+MODELLI_AUTO = ["tiny", "base", "small"]
+
+# File con le velocità misurate dei modelli su questa macchina
+FILE_CALIBRAZIONE = Path.home() / ".cache" / "youth" / "calibrazione_whisper.json"
+
+metriche = RegistroMetriche("transcriber")
 
 
 class Transcriber:
     """
     Classe per gestire la trascrizione di un file audio.
     """
-    def __init__(self, model_size="base", output_dir=None):
+    def __init__(self, model_size="base", output_dir=None, deduplica=False):
         self.model_size = model_size
         self.model = None
+        self.modelli = {}
+        self.indice_impronte = None
 
         if output_dir:
             self.output_dir = Path(output_dir)
@@ -35,13 +51,31 @@ class Transcriber:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         print(f"📁 Cartella di output: {self.output_dir}")
 
-    def carica_modello(self):
-        """Carica il modello Whisper."""
+        if deduplica:
+            from fingerprint import IndiceImpronte
+            self.indice_impronte = IndiceImpronte(self.output_dir / "impronte")
+            print(f"🔍 Controllo duplicati attivo ({len(self.indice_impronte.voci)} registrazioni indicizzate)")
+
+    def carica_modello(self, model_size=None):
+        """Carica il modello Whisper, riutilizzando quelli già caricati."""
+        if model_size:
+            self.model_size = model_size
+
+        if self.model_size in self.modelli:
+            self.model = self.modelli[self.model_size]
+            return True
+
         print(f"🔄 Caricamento del modello Whisper ({self.model_size})...")
+        misura = metriche.avvia("caricamento_modello", modello=self.model_size)
         try:
+            # Import ritardato: whisper e torch richiedono secondi e servono solo qui
+            import whisper
             self.model = whisper.load_model(self.model_size)
+            self.modelli[self.model_size] = self.model
+            misura.termina()
             print("✅ Modello caricato con successo!")
         except Exception as e:
+            misura.fallisce(e)
             print(f"❌ Errore durante il caricamento del modello: {e}")
             return False
         return True
@@ -123,6 +157,21 @@ class Transcriber:
         print(f"💾 Trascrizione salvata in: {file_path}")
         return file_path
 
+    def collega_trascrizione(self, trascrizione_esistente, audio_file_name):
+        """Per un file duplicato crea un collegamento alla trascrizione già esistente."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        nome_base = Path(audio_file_name).stem
+        file_path = self.output_dir / f"TRASCRIZIONE_{nome_base}_{timestamp}.json"
+
+        try:
+            file_path.symlink_to(os.path.relpath(trascrizione_esistente, self.output_dir))
+        except OSError:
+            # Filesystem senza collegamenti simbolici (es. FAT su USB): copia il file
+            shutil.copyfile(trascrizione_esistente, file_path)
+
+        print(f"🔗 Trascrizione collegata: {file_path} → {Path(trascrizione_esistente).name}")
+        return file_path
+
     def processa_trascrizione(self, audio_path, duration_minutes=None):
         """Processo completo: trascrive e salva."""
         print(f"▶️ Inizio processo per: {audio_path}")
@@ -130,20 +179,220 @@ class Transcriber:
         if not self.model and not self.carica_modello():
             return False
 
+        misura = metriche.avvia("trascrizione", file=audio_path.name, modello=self.model_size)
+
         if not audio_path.exists():
             print(f"❌ File audio non trovato: {audio_path}")
+            misura.fallisce("file non trovato")
             return False
+
+        impronta = None
+        if self.indice_impronte is not None:
+            from fingerprint import calcola_impronta
+            impronta = calcola_impronta(audio_path, duration_minutes * 60 if duration_minutes else None)
+            voce = self.indice_impronte.cerca(impronta) if impronta is not None else None
+            if voce:
+                print(f"♻️ Registrazione già trascritta: {voce['sorgente']}")
+                self.collega_trascrizione(voce['trascrizione'], audio_path.name)
+                misura.termina(duplicato=True)
+                return True
             
         result = self.trascrivi_audio(audio_path, duration_minutes)
         if not result:
+            misura.fallisce("trascrizione non riuscita")
             return False
 
-        self.salva_trascrizione(result, audio_path.name)
+        file_path = self.salva_trascrizione(result, audio_path.name)
+        if impronta is not None:
+            self.indice_impronte.aggiungi(impronta, file_path, audio_path)
+
+        segmenti = result.get('segments') or []
+        misura.termina(byte=audio_path.stat().st_size,
+                       secondi_audio=segmenti[-1]['end'] if segmenti else None)
 
         print("🎉 Processo di trascrizione completato!")
         return True
 
 
+def trova_trascrizione(output_dir, audio_path):
+    """Restituisce la trascrizione più recente del file audio nella cartella di output, se esiste."""
+    nome_base = Path(audio_path).stem
+    pattern = re.compile(rf"TRASCRIZIONE_{re.escape(nome_base)}_\d{{8}}_\d{{6}}\.json")
+    candidati = [p for p in Path(output_dir).glob(f"TRASCRIZIONE_{glob.escape(nome_base)}_*.json")
+                 if pattern.fullmatch(p.name)]
+    return max(candidati, key=lambda p: p.name) if candidati else None
+
+
+def durata_audio(audio_path):
+    """Restituisce la durata del file in secondi usando ffprobe (None se non disponibile)."""
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        str(audio_path)
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        return float(output.strip())
+    except (FileNotFoundError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def carica_calibrazione():
+    """Legge le velocità dei modelli misurate su questa macchina."""
+    try:
+        with open(FILE_CALIBRAZIONE, 'r', encoding='utf-8') as f:
+            return json.load(f).get(platform.node(), {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def salva_calibrazione(calibrazione):
+    """Salva le velocità dei modelli per questa macchina."""
+    dati = {}
+    try:
+        with open(FILE_CALIBRAZIONE, 'r', encoding='utf-8') as f:
+            dati = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    dati[platform.node()] = calibrazione
+    FILE_CALIBRAZIONE.parent.mkdir(parents=True, exist_ok=True)
+    with open(FILE_CALIBRAZIONE, 'w', encoding='utf-8') as f:
+        json.dump(dati, f, indent=4)
+
+
+def calibra_modelli(transcriber, file_campione, secondi_campione=60):
+    """
+    Misura per ogni modello il tempo di caricamento e il rapporto
+    tempo di trascrizione / durata audio su un campione del file indicato.
+    """
+    print(f"📏 Calibrazione dei modelli su {secondi_campione} secondi di: {file_campione.name}")
+    durata = durata_audio(file_campione)
+    secondi_audio = min(secondi_campione, durata) if durata else secondi_campione
+
+    calibrazione = {}
+    for modello in MODELLI_AUTO:
+        inizio = time.monotonic()
+        if not transcriber.carica_modello(modello):
+            continue
+        caricamento = time.monotonic() - inizio
+
+        inizio = time.monotonic()
+        if not transcriber.trascrivi_audio(file_campione, secondi_campione / 60):
+            continue
+        rtf = (time.monotonic() - inizio) / secondi_audio
+
+        calibrazione[modello] = {"rtf": rtf, "caricamento": caricamento}
+        print(f"   {modello}: {rtf:.3f} s per secondo di audio, caricamento {caricamento:.1f} s")
+
+    if calibrazione:
+        salva_calibrazione(calibrazione)
+    return calibrazione
+
+
+def pianifica_modelli(durate, calibrazione, budget_secondi, modelli_caricati=()):
+    """
+    Assegna un modello a ogni file restando entro il budget di tempo.
+    Tutti i file partono dal modello più veloce; finché c'è margine
+    vengono migliorati, a partire dai più brevi, prima a 'base' e poi a 'small'.
+    I file con durata sconosciuta (None) restano sul modello più veloce e il loro
+    costo viene stimato con la durata più lunga tra quelle note.
+
+    Returns:
+        tuple: (dizionario file -> modello, tempo stimato in secondi)
+    """
+    livelli = [m for m in MODELLI_AUTO if m in calibrazione]
+    if not livelli or not durate:
+        return {}, 0.0
+
+    usati = set(modelli_caricati)
+
+    def costo_caricamento(modello):
+        return 0.0 if modello in usati else calibrazione[modello]["caricamento"]
+
+    note = {f: d for f, d in durate.items() if d is not None}
+    pessimistica = max(note.values(), default=0.0)
+
+    piano = {f: livelli[0] for f in durate}
+    stima = costo_caricamento(livelli[0])
+    stima += sum((pessimistica if d is None else d) * calibrazione[livelli[0]]["rtf"] for d in durate.values())
+    usati.add(livelli[0])
+
+    for livello in livelli[1:]:
+        for f in sorted(note, key=note.get):
+            attuale = piano[f]
+            delta = durate[f] * (calibrazione[livello]["rtf"] - calibrazione[attuale]["rtf"])
+            delta += costo_caricamento(livello)
+            if stima + delta <= budget_secondi:
+                piano[f] = livello
+                stima += delta
+                usati.add(livello)
+
+    return piano, stima
+
+
+def trascrivi_con_budget(transcriber, file_audio, budget_minuti, duration_minutes=None,
+                         margine=0.1, ricalibra=False):
+    """
+    Trascrive una lista di file entro un tempo massimo, scegliendo il modello
+    per ogni file. Il piano viene ricalcolato prima di ogni file con il tempo rimasto.
+    """
+    inizio = time.monotonic()
+    budget = budget_minuti * 60 * (1 - margine)
+
+    durate = {}
+    for file_path in file_audio:
+        durata = durata_audio(file_path)
+        if duration_minutes:
+            # Con --duration si conosce comunque un limite superiore della durata
+            durata = duration_minutes * 60 if durata is None else min(durata, duration_minutes * 60)
+        elif durata is None:
+            print(f"⚠️ Durata non disponibile per {file_path.name}: userò il modello più veloce.")
+        durate[file_path] = durata
+
+    print(f"⏱️ Audio totale: {sum(d for d in durate.values() if d) / 60:.1f} minuti, budget: {budget_minuti:.1f} minuti")
+
+    calibrazione = carica_calibrazione()
+    if ricalibra or any(m not in calibrazione for m in MODELLI_AUTO):
+        campione = max(durate, key=lambda f: durate[f] or 0.0)
+        calibrazione = calibra_modelli(transcriber, campione)
+        if not calibrazione:
+            print("❌ Calibrazione fallita: impossibile pianificare la trascrizione.")
+            return False
+
+    modelli_usati = Counter()
+    for i, file_path in enumerate(file_audio):
+        residuo = budget - (time.monotonic() - inizio)
+        rimanenti = {f: durate[f] for f in file_audio[i:]}
+        piano, stima = pianifica_modelli(rimanenti, calibrazione, residuo, transcriber.modelli.keys())
+        modello = piano[file_path]
+
+        print(f"\n🧭 [{i + 1}/{len(file_audio)}] {file_path.name}: modello {modello} "
+              f"(stima {stima / 60:.1f} min per i file rimanenti, budget residuo {residuo / 60:.1f} min)")
+
+        if not transcriber.carica_modello(modello):
+            continue
+
+        inizio_file = time.monotonic()
+        if not transcriber.processa_trascrizione(file_path, duration_minutes):
+            continue
+        modelli_usati[modello] += 1
+
+        # Aggiorna la velocità misurata con una media mobile
+        if durate[file_path]:
+            rtf = (time.monotonic() - inizio_file) / durate[file_path]
+            calibrazione[modello]["rtf"] = 0.7 * calibrazione[modello]["rtf"] + 0.3 * rtf
+            salva_calibrazione(calibrazione)
+
+    totale = (time.monotonic() - inizio) / 60
+    print(f"\n📊 Tempo impiegato: {totale:.1f} minuti su {budget_minuti:.1f} di budget")
+    for modello, conteggio in modelli_usati.items():
+        print(f"   {modello}: {conteggio} file")
+    return True
+
+
 def main():
     """
     Funzione principale per gestire gli argomenti della riga di comando.
@@ -162,6 +411,13 @@ def main():
     parser.add_argument("--duration", "-d", type=int,
                         help="Specifica il numero di minuti dall'inizio che devono essere trascritti.")
 
+    parser.add_argument("--budget", "-b", type=float,
+                        help="Tempo massimo in minuti per la cartella: il modello viene scelto per ogni file.")
+    parser.add_argument("--ricalibra", action="store_true",
+                        help="Ripete la misura della velocità dei modelli prima di usare --budget.")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Salta i file la cui impronta acustica corrisponde a una registrazione già trascritta.")
+
     args = parser.parse_args()
 
     input_path = Path(args.path)
@@ -171,7 +427,7 @@ def main():
     # Imposta la cartella di output
     output_directory = Path("/mnt/backup_usb/Youth/")
     
-    transcriber = Transcriber(model_size, output_directory)
+    transcriber = Transcriber(model_size, output_directory, deduplica=args.dedup)
 
     if input_path.is_file():
         # Trascrizione di un singolo file
@@ -188,6 +444,9 @@ def main():
         
         if not found_files:
             print(f"⚠️ Nessun file supportato trovato nella cartella: {input_path}")
+        elif args.budget:
+            trascrivi_con_budget(transcriber, found_files, args.budget, duration_minutes,
+                                 ricalibra=args.ricalibra)
         else:
             for file_path in found_files:
                 transcriber.processa_trascrizione(file_path, duration_minutes)